@@ -0,0 +1,239 @@
+"""
+Before/after timings of the analytics and listing endpoints around the performance indexes
+
+Usage: python -m app.benchmark [--database-url sqlite:///benchmark.db] [--transactions 200000] [--products 5000] [--members 20000] [--repeat 5]
+Seeds the database when it has no transactions, then times every endpoint with the index
+pack dropped and again with it created. Point it at a scratch database: the indexes are
+dropped and recreated in place.
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, text
+from sqlmodel import SQLModel, Session, create_engine, select
+from . import db
+from .main import app
+from .models.cashier import Cashier
+from .models.member import Member
+from .models.member_tier_change import MemberTierChange
+from .models.membership_tier import MembershipTier
+from .models.product import Product
+from .models.promotion import Promotion
+from .models.stock_movement import StockMovement
+from .models.transaction import Transaction
+from .models.transaction_item import TransactionItem
+from .models.user import User
+from .utils.jwt import create_access_token
+
+
+# Indexes added by the performance migration, as declared on the models.
+INDEX_PACK = [
+    ("transaction", "ix_transaction_date"),
+    ("transaction", "ix_transaction_employee_id"),
+    ("transaction", "ix_transaction_member_date"),
+    ("transactionitem", "ix_transactionitem_product_id"),
+    ("product", "ix_product_promotion_id"),
+    ("product", "ix_product_category"),
+]
+
+BATCH = 5000
+# Prices are whole quarters so the line_total CHECK constraint holds under SQLite's float arithmetic.
+QUARTER = Decimal("0.25")
+
+
+def _pack():
+    tables = SQLModel.metadata.tables
+    return [next(i for i in tables[table].indexes if i.name == name) for table, name in INDEX_PACK]
+
+
+def _insert(session: Session, model, rows: list[dict]) -> None:
+    for i in range(0, len(rows), BATCH):
+        session.execute(insert(model), rows[i:i + BATCH])
+
+
+def seed(session: Session, transactions: int, products: int, members: int) -> str:
+    """Insert a synthetic store history; returns the manager's uid."""
+    rng = random.Random(42)
+    manager = User(email="bench-manager@example.com", username="bench-manager", name="Bench Manager", hashed_password="-", role="manager")
+    cashiers = [User(email=f"bench-cashier{i}@example.com", username=f"bench-cashier{i}", name=f"Cashier {i}", hashed_password="-") for i in range(20)]
+    session.add_all([manager, *cashiers])
+    session.flush()
+    _insert(session, Cashier, [{"employee_id": c.uid} for c in cashiers])
+    if session.get(MembershipTier, "Bronze") is None:
+        session.add(MembershipTier(rank_name="Bronze", min_spent=Decimal("0.00"), max_spent=None, discount_rate=Decimal("3.00")))
+        session.flush()
+    today = date.today()
+    _insert(session, Promotion, [
+        {"promotion_id": i, "promotion_name": f"Promo {i}", "discount_type": "PERCENTAGE", "discount_value": Decimal("10.00"), "start_date": today - timedelta(days=30), "end_date": today + timedelta(days=30), "is_active": True}
+        for i in range(1, 51)
+    ])
+    prices = {}
+    product_rows = []
+    for pid in range(1, products + 1):
+        cost = rng.randint(4, 800) * QUARTER
+        prices[pid] = cost + rng.randint(1, 200) * QUARTER
+        product_rows.append({
+            "product_id": pid, "barcode": f"{pid:013d}", "name": f"Product {pid}", "brand": f"Brand {pid % 100}", "category": f"Category {pid % 40}",
+            "cost_price": cost, "selling_price": prices[pid], "stock_quantity": rng.randint(0, 200), "min_stock": 10,
+            "promotion_id": rng.randint(1, 50) if rng.random() < 0.1 else None,
+        })
+    _insert(session, Product, product_rows)
+    _insert(session, Member, [
+        {"member_id": mid, "name": f"Member {mid}", "phone": f"08{mid:08d}", "membership_rank": "Bronze", "discount_rate": Decimal("3.00"), "registration_date": today - timedelta(days=rng.randint(0, 700))}
+        for mid in range(1, members + 1)
+    ])
+
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    step = timedelta(days=365) / transactions
+    # Members who dropped back to Bronze as last year's spending aged out.
+    _insert(session, MemberTierChange, [
+        {"member_id": mid, "old_rank": "Silver", "new_rank": "Bronze", "old_discount_rate": Decimal("5.00"), "new_discount_rate": Decimal("3.00"),
+         "rolling_year_spent": Decimal(rng.randint(0, 4999)), "reason": "NIGHTLY", "changed_at": start + timedelta(days=rng.randint(0, 364))}
+        for mid in rng.sample(range(1, members + 1), members // 20)
+    ])
+
+    # The ledger opens each product with enough stock to cover its sales and end where
+    # stock_quantity says; sales are booked as they happen.
+    sales = [rng.sample(range(1, products + 1), rng.randint(1, 5)) for _ in range(transactions)]
+    quantities = [[rng.randint(1, 4) for _ in lines] for lines in sales]
+    sold: dict[int, int] = {}
+    for lines, qtys in zip(sales, quantities):
+        for pid, qty in zip(lines, qtys):
+            sold[pid] = sold.get(pid, 0) + qty
+    _insert(session, StockMovement, [
+        {"product_id": row["product_id"], "quantity_change": row["stock_quantity"] + sold.get(row["product_id"], 0), "movement_type": "ADJUSTMENT", "reference": "Opening stock", "created_at": start}
+        for row in product_rows if row["stock_quantity"] + sold.get(row["product_id"], 0)
+    ])
+
+    cashier_ids = [c.uid for c in cashiers]
+    tx_rows, item_rows, movement_rows = [], [], []
+    for tid, lines, qtys in zip(range(1, transactions + 1), sales, quantities):
+        subtotal = Decimal("0.00")
+        for pid, qty in zip(lines, qtys):
+            line_total = prices[pid] * qty
+            subtotal += line_total
+            item_rows.append({"transaction_id": tid, "product_id": pid, "quantity": qty, "unit_price": prices[pid], "discount_amount": Decimal("0.00"), "line_total": line_total})
+            movement_rows.append({"product_id": pid, "quantity_change": -qty, "movement_type": "SALE", "reference": f"Transaction {tid}", "created_at": start + step * tid})
+        # Rows are inserted in date order, as they are in production.
+        tx_rows.append({
+            "transaction_id": tid, "transaction_date": start + step * tid, "employee_id": rng.choice(cashier_ids),
+            "member_id": rng.randint(1, members) if rng.random() < 0.4 else None,
+            "subtotal": subtotal, "product_discount": Decimal("0.00"), "membership_discount": Decimal("0.00"), "total_amount": subtotal,
+            "payment_method": rng.choice(("Cash", "Card", "QR Code")),
+        })
+        if len(item_rows) >= BATCH:
+            _insert(session, Transaction, tx_rows)
+            _insert(session, TransactionItem, item_rows)
+            _insert(session, StockMovement, movement_rows)
+            tx_rows, item_rows, movement_rows = [], [], []
+            print(f"\rSeeding transactions: {tid / transactions:6.1%}", end="", file=sys.stderr)
+    _insert(session, Transaction, tx_rows)
+    _insert(session, TransactionItem, item_rows)
+    _insert(session, StockMovement, movement_rows)
+    print(file=sys.stderr)
+    session.commit()
+    return manager.uid
+
+
+def endpoints(session: Session) -> list[str]:
+    busiest = session.exec(select(Transaction.member_id).where(Transaction.member_id.is_not(None)).group_by(Transaction.member_id).order_by(func.count().desc()).limit(1)).first()
+    best_seller = session.exec(select(TransactionItem.product_id).group_by(TransactionItem.product_id).order_by(func.count().desc()).limit(1)).first()
+    recent = session.exec(select(Transaction.transaction_id).order_by(Transaction.transaction_id.desc()).limit(50)).all()
+    products = session.exec(select(Product.product_id).order_by(Product.product_id).limit(100)).all()
+    half_year_ago = (datetime.now(timezone.utc) - timedelta(days=180)).strftime("%Y-%m-%dT%H:%M:%S")
+    return [
+        "/api/transactions?limit=50",
+        "/api/transactions/details?" + "&".join(f"ids={tid}" for tid in recent),
+        "/api/transactions/analytics/product-sales",
+        "/api/transactions/analytics/daily-sales?days=30",
+        "/api/transactions/analytics/payment-methods",
+        "/api/transactions/analytics/category-sales",
+        "/api/transactions/analytics/profit",
+        "/api/products?limit=100",
+        "/api/products/low-stock",
+        "/api/products/suggest?q=Product%2042",
+        "/api/promotions",
+        "/api/promotion-rules",
+        "/api/catalog/snapshot",
+        "/api/inventory/movements?limit=100",
+        f"/api/inventory/movements?product_id={best_seller}&limit=100",
+        f"/api/inventory/stock-at?at={half_year_ago}&" + "&".join(f"product_ids={pid}" for pid in products),
+        "/api/members?limit=100",
+        f"/api/members/{busiest}",
+        f"/api/members/{busiest}/transactions?limit=20",
+        f"/api/members/{busiest}/transactions?limit=20&expand=items",
+        "/api/members/tier-changes?limit=100",
+        "/api/users/employees",
+    ]
+
+
+def time_endpoints(client: TestClient, token: str, paths: list[str], repeat: int) -> dict[str, float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    out = {}
+    for path in paths:
+        r = client.get(path, headers=headers)
+        if r.status_code != 200:
+            raise SystemExit(f"{path} returned {r.status_code}: {r.text[:200]}")
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(path, headers=headers)
+            samples.append((time.perf_counter() - started) * 1000)
+        out[path] = statistics.median(samples)
+    return out
+
+
+def analyze(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time analytics and listing endpoints with and without the performance indexes")
+    parser.add_argument("--database-url", default="sqlite:///benchmark.db", help="Scratch database (default: sqlite:///benchmark.db)")
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed requests per endpoint; the median is reported (default: 5)")
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False} if args.database_url.startswith("sqlite") else {}
+    db.engine = create_engine(args.database_url, echo=False, connect_args=connect_args)
+    SQLModel.metadata.create_all(db.engine)
+    with Session(db.engine) as session:
+        manager = session.exec(select(User).where(User.username == "bench-manager")).first()
+        if manager is None:
+            started = time.perf_counter()
+            uid = seed(session, args.transactions, args.products, args.members)
+            print(f"Seeded {args.transactions} transactions in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        else:
+            uid = manager.uid
+        paths = endpoints(session)
+    token = create_access_token(uid, "manager")
+    client = TestClient(app)
+    pack = _pack()
+
+    for index in pack:
+        index.drop(db.engine, checkfirst=True)
+    analyze(db.engine)
+    before = time_endpoints(client, token, paths, args.repeat)
+
+    started = time.perf_counter()
+    for index in pack:
+        index.create(db.engine, checkfirst=True)
+    analyze(db.engine)
+    print(f"Created {len(pack)} indexes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    after = time_endpoints(client, token, paths, args.repeat)
+
+    # Id lists make some paths long; the table shows their start.
+    labels = {p: p if len(p) <= 72 else p[:69] + "..." for p in paths}
+    width = max(len(label) for label in labels.values())
+    print(f"{'endpoint':<{width}}  {'before ms':>10}  {'after ms':>10}  {'speedup':>8}")
+    for path in paths:
+        print(f"{labels[path]:<{width}}  {before[path]:>10.1f}  {after[path]:>10.1f}  {before[path] / after[path]:>7.1f}x")
@@ -1,11 +1,125 @@
+from time import perf_counter
+import anyio
+import anyio.to_thread
+from anyio.lowlevel import RunVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
 from sqlmodel import create_engine, Session
 from .config.settings import settings
+from .utils import metrics
 
 
-engine = create_engine(settings.database_url, echo=False)
+_pool_wait = metrics.histogram("db_pool_wait_seconds")
+_pool_timeouts = metrics.counter("db_pool_timeouts")
+_query_time = metrics.histogram("db_query_duration_seconds", help="Statement execution time", labelnames=("statement",))
+_query_errors = metrics.counter("db_query_errors", help="Statements that raised", labelnames=("statement",))
+_QUERY_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
 
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+def _query_kind(statement: str | None) -> str:
+    words = (statement or "").split(None, 1)
+    kind = words[0].upper() if words else ""
+    return kind if kind in _QUERY_KINDS else "OTHER"
 
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    _query_time.labels(_query_kind(statement)).observe(perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _record_query_error(context):
+    # A failed statement never reaches after_cursor_execute, so drop its start time here.
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+    _query_errors.labels(_query_kind(context.statement)).inc()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            _pool_timeouts.inc()
+            raise
+        finally:
+            _pool_wait.observe(perf_counter() - started)
+
+
+def create_db_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_engine(url, echo=False)
+    return create_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+    )
+
+
+def pool_capacity(engine) -> int | None:
+    """Most connections the engine's pool will hand out at once; ``None`` when unbounded."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return None
+    return pool.size() + pool._max_overflow
+
+
+def _pool_stat(name: str):
+    def read():
+        # Read through the module so a replaced ``engine`` (tests) is reported.
+        pool = engine.pool
+        return getattr(pool, name)() if isinstance(pool, QueuePool) else None
+    return read
+
+
+engine = create_db_engine(settings.database_url)
+metrics.gauge("db_pool_checked_out", _pool_stat("checkedout"))
+metrics.gauge("db_pool_checked_in", _pool_stat("checkedin"))
+metrics.gauge("db_pool_overflow", _pool_stat("overflow"))
+metrics.gauge("db_pool_capacity", lambda: pool_capacity(engine))
+
+
+# Request sessions keep their connection from the first query until they close, including
+# while the request waits for a thread to run its endpoint or close the session. Bounding
+# open sessions by the connections left for requests, rather than bounding threads, means a
+# request that holds a thread never waits on the pool behind requests that are waiting for
+# one. Per event loop, like anyio's thread limiter; unset, sessions are not limited.
+_session_slots: RunVar[anyio.CapacityLimiter] = RunVar("session_slots")
+
+
+def limit_sessions(total: int) -> None:
+    """Allow at most ``total`` open request sessions on the running event loop."""
+    _session_slots.set(anyio.CapacityLimiter(total))
+
+
+async def get_session():
+    slots = _session_slots.get(None)
+    borrower = object()
+    if slots is not None:
+        await slots.acquire_on_behalf_of(borrower)
+    try:
+        session = Session(engine)
+        try:
+            yield session
+        finally:
+            await anyio.to_thread.run_sync(session.close)
+    finally:
+        if slots is not None:
+            slots.release_on_behalf_of(borrower)
@@ -0,0 +1,147 @@
+from decimal import Decimal
+from typing import Literal
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field, condecimal, model_validator
+from sqlalchemy import Integer, and_, case, cast, func, literal, update
+from sqlmodel import Session, select
+from ..models.product import Product
+from ..models.promotion import Promotion
+from ..utils.catalog import catalog_changed
+
+
+MAX_SELECTOR_IDS = 10000
+SAMPLE_SIZE = 20
+
+
+class ProductSelector(BaseModel):
+    category: str | None = None
+    brand: str | None = None
+    product_ids: list[int] | None = Field(default=None, max_length=MAX_SELECTOR_IDS)
+
+    @model_validator(mode="after")
+    def require_criteria(self):
+        if self.category is None and self.brand is None and not self.product_ids:
+            raise ValueError("Select products by category, brand or product_ids")
+        return self
+
+
+class RepriceInput(BaseModel):
+    selector: ProductSelector
+    mode: Literal["absolute", "percent"]
+    # New price for "absolute"; percent change (e.g. 10 or -15) for "percent".
+    value: condecimal(max_digits=10, decimal_places=2)
+    rounding: Literal["none", "nearest", "up", "down"] = "none"
+    step: condecimal(gt=Decimal("0"), max_digits=10, decimal_places=2) = Decimal("0.01")
+    # Optional price ending applied after rounding, e.g. 0.99 turns 12.40 into 12.99.
+    ending: condecimal(ge=Decimal("0"), lt=Decimal("1"), decimal_places=2) | None = None
+    dry_run: bool = False
+
+    @model_validator(mode="after")
+    def check_value(self):
+        if self.mode == "absolute" and self.value < 0:
+            raise ValueError("Price cannot be negative")
+        if self.mode == "percent" and self.value <= Decimal("-100"):
+            raise ValueError("Percent change must be greater than -100")
+        return self
+
+
+class PromotionAssignInput(BaseModel):
+    selector: ProductSelector
+    # None detaches the selected products from their promotion.
+    promotion_id: int | None = None
+
+
+class BulkResult(BaseModel):
+    matched: int
+    updated: int
+    violations: int = 0
+    violating_product_ids: list[int] = []
+
+
+def selector_clause(sel: ProductSelector):
+    conds = []
+    if sel.category is not None:
+        conds.append(Product.category == sel.category)
+    if sel.brand is not None:
+        conds.append(Product.brand == sel.brand)
+    if sel.product_ids:
+        conds.append(Product.product_id.in_(sel.product_ids))
+    return and_(*conds)
+
+
+def _floor(expr, dialect: str):
+    if dialect == "postgresql":
+        return func.floor(expr)
+    # Prices are non-negative, so truncation toward zero is floor.
+    return cast(expr, Integer)
+
+
+def _ceil(expr, dialect: str):
+    if dialect == "postgresql":
+        return func.ceil(expr)
+    truncated = cast(expr, Integer)
+    return case((expr > truncated, truncated + 1), else_=truncated)
+
+
+def price_expression(data: RepriceInput, dialect: str):
+    """SQL expression for the new selling price of each selected row."""
+    if data.mode == "absolute":
+        price = literal(data.value)
+    else:
+        price = Product.selling_price * (literal(Decimal("100")) + literal(data.value)) / literal(Decimal("100"))
+    if data.rounding != "none":
+        steps = price / literal(data.step)
+        if data.rounding == "nearest":
+            steps = func.round(steps)
+        elif data.rounding == "up":
+            steps = _ceil(steps, dialect)
+        else:
+            steps = _floor(steps, dialect)
+        price = steps * literal(data.step)
+    if data.ending is not None:
+        price = _floor(price, dialect) + literal(data.ending)
+    return func.round(price, 2)
+
+
+def reprice_products(session: Session, data: RepriceInput) -> BulkResult:
+    """Reprice all selected products with one UPDATE, refusing if any would sell below cost."""
+    where = selector_clause(data.selector)
+    new_price = price_expression(data, session.get_bind().dialect.name)
+    matched = session.exec(select(func.count()).select_from(Product).where(where)).one()
+    violating = session.exec(
+        select(Product.product_id).where(where, new_price < Product.cost_price).order_by(Product.product_id)
+    ).all()
+    if violating:
+        return BulkResult(matched=matched, updated=0, violations=len(violating), violating_product_ids=violating[:SAMPLE_SIZE])
+    if data.dry_run:
+        return BulkResult(matched=matched, updated=0)
+    table = Product.__table__
+    updated_ids = session.execute(
+        update(table).where(where).values(selling_price=new_price).returning(table.c.product_id)
+    ).scalars().all()
+    catalog_changed(session, products=updated_ids)
+    session.commit()
+    return BulkResult(matched=matched, updated=len(updated_ids))
+
+
+def assign_promotion(session: Session, data: PromotionAssignInput) -> BulkResult:
+    """Attach (or detach, with ``promotion_id`` None) a promotion for all selected products."""
+    if data.promotion_id is not None:
+        promo = session.exec(select(Promotion.promotion_id).where(Promotion.promotion_id == data.promotion_id)).first()
+        if promo is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Promotion ID not found")
+    table = Product.__table__
+    updated_ids = session.execute(
+        update(table).where(selector_clause(data.selector)).values(promotion_id=data.promotion_id).returning(table.c.product_id)
+    ).scalars().all()
+    catalog_changed(session, products=updated_ids)
+    session.commit()
+    return BulkResult(matched=len(updated_ids), updated=len(updated_ids))
+
+
+def unlink_promotion(session: Session, promotion_id: int) -> list[int]:
+    """Clear ``promotion_id`` on every product carrying it in one UPDATE; returns their ids."""
+    table = Product.__table__
+    return session.execute(
+        update(table).where(table.c.promotion_id == promotion_id).values(promotion_id=None).returning(table.c.product_id)
+    ).scalars().all()
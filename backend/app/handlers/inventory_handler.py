@@ -0,0 +1,143 @@
+from datetime import datetime, timezone
+from typing import Sequence
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, func, insert, update
+from sqlmodel import Session, select
+from ..models.product import Product
+from ..models.stock_movement import StockMovement
+from ..models.stock_snapshot import StockSnapshot
+from ..utils.sql import chunked
+
+
+def resolve_product_ids(session: Session, product_ids: Sequence[int | None], barcodes: Sequence[str | None]) -> list[int]:
+    """Map parallel (product_id, barcode) inputs to product ids, rejecting unknown products."""
+    wanted_ids = sorted({pid for pid in product_ids if pid is not None})
+    wanted_barcodes = sorted({bc for pid, bc in zip(product_ids, barcodes) if pid is None and bc})
+    if any(pid is None and not bc for pid, bc in zip(product_ids, barcodes)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each line needs a product_id or barcode")
+    known: set[int] = set()
+    for chunk in chunked(wanted_ids):
+        known.update(session.exec(select(Product.product_id).where(Product.product_id.in_(chunk))).all())
+    by_barcode: dict[str, int] = {}
+    for chunk in chunked(wanted_barcodes):
+        by_barcode.update(session.exec(select(Product.barcode, Product.product_id).where(Product.barcode.in_(chunk))).all())
+    unknown = [str(pid) for pid in wanted_ids if pid not in known] + [bc for bc in wanted_barcodes if bc not in by_barcode]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown products: {', '.join(unknown[:20])}")
+    return [pid if pid is not None else by_barcode[bc] for pid, bc in zip(product_ids, barcodes)]
+
+
+def current_stock(session: Session, product_ids: Sequence[int], lock: bool = False) -> dict[int, int]:
+    stock: dict[int, int] = {}
+    for chunk in chunked(list(product_ids)):
+        stmt = select(Product.product_id, Product.stock_quantity).where(Product.product_id.in_(chunk))
+        if lock:
+            stmt = stmt.with_for_update()
+        stock.update(session.exec(stmt).all())
+    return stock
+
+
+def apply_stock_deltas(session: Session, deltas: dict[int, int], movement_type: str, reference: str | None = None, employee_id: str | None = None) -> None:
+    """Apply relative stock changes and record one movement per product, without committing.
+
+    Updates are ``stock_quantity = stock_quantity + delta``, so sales committed concurrently
+    are never overwritten.
+    """
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = Product.__table__
+    stmt = (
+        update(table)
+        .where(table.c.product_id == bindparam("b_pid"))
+        .values(stock_quantity=table.c.stock_quantity + bindparam("b_delta"))
+    )
+    session.execute(stmt, [{"b_pid": pid, "b_delta": delta} for pid, delta in deltas.items()])
+    record_movements(session, deltas, movement_type, reference, employee_id)
+
+
+def record_movements(session: Session, deltas: dict[int, int], movement_type: str, reference: str | None = None, employee_id: str | None = None) -> None:
+    """Append ledger entries for stock changes already applied to the products."""
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = datetime.now(timezone.utc)
+    session.execute(insert(StockMovement.__table__), [
+        {"product_id": pid, "quantity_change": delta, "movement_type": movement_type, "reference": reference, "employee_id": employee_id, "created_at": now}
+        for pid, delta in deltas.items()
+    ])
+
+
+def take_stock_snapshot(session: Session) -> int:
+    """Snapshot stock for every product with ledger activity since the previous snapshot.
+
+    Each product's row is locked before its quantity and newest movement id are read.
+    Writers update the product before booking the movement and keep the lock until they
+    commit, so the snapshot holds exactly the movements up to its ``last_movement_id``.
+    A movement that commits after a higher id was snapshotted only delays that product's
+    next snapshot; ``stock_at`` still replays it from the older one.
+    """
+    previous = session.exec(select(func.coalesce(func.max(StockSnapshot.last_movement_id), 0))).one()
+    moved = session.exec(select(StockMovement.product_id).where(StockMovement.movement_id > previous, StockMovement.product_id.is_not(None)).distinct()).all()
+    taken = 0
+    for chunk in chunked(sorted(moved)):
+        stock = current_stock(session, chunk, lock=True)
+        last = dict(session.exec(
+            select(StockMovement.product_id, func.max(StockMovement.movement_id))
+            .where(StockMovement.product_id.in_(list(stock)))
+            .group_by(StockMovement.product_id)
+        ).all())
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"product_id": pid, "snapshot_at": now, "stock_quantity": qty, "last_movement_id": last[pid]}
+            for pid, qty in stock.items() if pid in last
+        ]
+        if rows:
+            session.execute(insert(StockSnapshot.__table__), rows)
+        taken += len(rows)
+    session.commit()
+    return taken
+
+
+def stock_at(session: Session, product_ids: Sequence[int], at: datetime) -> dict[int, int]:
+    """Stock on hand per product at ``at``.
+
+    Starts from the newest snapshot taken at or before ``at`` and adds the ledger entries
+    booked after it; products with no such snapshot are walked back from current stock.
+    """
+    result: dict[int, int] = {}
+    for chunk in chunked(list(product_ids)):
+        newest = (
+            select(StockSnapshot.product_id, func.max(StockSnapshot.snapshot_at).label("snapshot_at"))
+            .where(StockSnapshot.product_id.in_(chunk), StockSnapshot.snapshot_at <= at)
+            .group_by(StockSnapshot.product_id)
+            .subquery()
+        )
+        snapshots = (
+            select(StockSnapshot.product_id, StockSnapshot.stock_quantity, StockSnapshot.last_movement_id)
+            .join(newest, (StockSnapshot.product_id == newest.c.product_id) & (StockSnapshot.snapshot_at == newest.c.snapshot_at))
+            .subquery()
+        )
+        for pid, qty in session.exec(select(snapshots.c.product_id, snapshots.c.stock_quantity)).all():
+            result[pid] = qty
+        forward = session.exec(
+            select(StockMovement.product_id, func.sum(StockMovement.quantity_change))
+            .join(snapshots, StockMovement.product_id == snapshots.c.product_id)
+            .where(StockMovement.movement_id > snapshots.c.last_movement_id, StockMovement.created_at <= at)
+            .group_by(StockMovement.product_id)
+        ).all()
+        for pid, change in forward:
+            result[pid] += change
+
+        rest = [pid for pid in chunk if pid not in result]
+        if not rest:
+            continue
+        result.update(current_stock(session, rest))
+        backward = session.exec(
+            select(StockMovement.product_id, func.sum(StockMovement.quantity_change))
+            .where(StockMovement.product_id.in_(rest), StockMovement.created_at > at)
+            .group_by(StockMovement.product_id)
+        ).all()
+        for pid, change in backward:
+            result[pid] -= change
+    return result
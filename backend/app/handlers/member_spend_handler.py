@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Sequence
+from sqlalchemy import case, event, func, literal, true, update
+from sqlmodel import Session, select
+from ..models.member_spend import MemberSpend
+from ..models.transaction import Transaction
+from ..utils.sql import chunked, dialect_insert
+
+
+ROLLING_DAYS = 365
+EXPIRE_BATCH = 1000
+
+
+def window_start(now: datetime | None = None) -> datetime:
+    return (now or datetime.now(timezone.utc)) - timedelta(days=ROLLING_DAYS)
+
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@event.listens_for(Transaction, "after_insert")
+def _count_transaction(mapper, connection, target: Transaction) -> None:
+    """Add each member transaction to its member's rolling-year spend as it is inserted."""
+    if target.member_id is None or not target.total_amount:
+        return
+    tx_date = as_utc(target.transaction_date)
+    if tx_date < window_start():
+        return
+    table = MemberSpend.__table__
+    insert = dialect_insert(connection)
+    stmt = insert(table).values(
+        member_id=target.member_id,
+        rolling_year_spent=target.total_amount,
+        oldest_counted=tx_date,
+        updated_at=datetime.now(timezone.utc),
+    )
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.member_id],
+        set_={
+            "rolling_year_spent": table.c.rolling_year_spent + stmt.excluded.rolling_year_spent,
+            "oldest_counted": case(
+                (table.c.oldest_counted.is_(None), stmt.excluded.oldest_counted),
+                (stmt.excluded.oldest_counted < table.c.oldest_counted, stmt.excluded.oldest_counted),
+                else_=table.c.oldest_counted,
+            ),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+
+def _window_totals(cutoff: datetime):
+    return (
+        select(Transaction.member_id, func.sum(Transaction.total_amount).label("spent"), func.min(Transaction.transaction_date).label("oldest"))
+        .where(Transaction.member_id.is_not(None), Transaction.transaction_date >= cutoff)
+        .group_by(Transaction.member_id)
+    )
+
+
+def recompute_member_spend(session: Session, member_ids: Sequence[int]) -> None:
+    """Recompute rolling-year spend for ``member_ids`` from transactions, without committing."""
+    cutoff = window_start()
+    table = MemberSpend.__table__
+    for chunk in chunked(list(member_ids)):
+        in_window = (Transaction.member_id == table.c.member_id) & (Transaction.transaction_date >= cutoff)
+        session.execute(
+            update(table)
+            .where(table.c.member_id.in_(chunk))
+            .values(
+                rolling_year_spent=func.coalesce(select(func.sum(Transaction.total_amount)).where(in_window).scalar_subquery(), literal(Decimal("0.00"))),
+                oldest_counted=select(func.min(Transaction.transaction_date)).where(in_window).scalar_subquery(),
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
+
+
+def window_spend(session: Session, member_ids: Sequence[int]) -> dict[int, Decimal]:
+    """Rolling-year spend for ``member_ids`` summed from transactions, read-only."""
+    spent = {mid: Decimal("0.00") for mid in member_ids}
+    for chunk in chunked(list(member_ids)):
+        totals = _window_totals(window_start()).where(Transaction.member_id.in_(chunk))
+        spent.update((mid, Decimal(str(total))) for mid, total, _ in session.exec(totals).all())
+    return spent
+
+
+def expire_member_spend(session: Session) -> int:
+    """Nightly: recompute members whose oldest counted transaction has left the window.
+
+    Works in member-id batches with a commit after each, so no batch holds locks for long.
+    """
+    cutoff = window_start()
+    after = 0
+    expired = 0
+    while True:
+        ids = session.exec(
+            select(MemberSpend.member_id)
+            .where(MemberSpend.oldest_counted < cutoff, MemberSpend.member_id > after)
+            .order_by(MemberSpend.member_id)
+            .limit(EXPIRE_BATCH)
+        ).all()
+        if not ids:
+            return expired
+        recompute_member_spend(session, ids)
+        session.commit()
+        expired += len(ids)
+        after = ids[-1]
+
+
+def backfill_member_spend(session: Session) -> int:
+    """Rebuild every member's rolling-year spend in one INSERT ... SELECT upsert."""
+    table = MemberSpend.__table__
+    totals = _window_totals(window_start()).subquery()
+    insert = dialect_insert(session)
+    stmt = insert(table).from_select(
+        ["member_id", "rolling_year_spent", "oldest_counted", "updated_at"],
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT.
+        select(totals.c.member_id, totals.c.spent, totals.c.oldest, literal(datetime.now(timezone.utc))).where(true()),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.member_id],
+        set_={"rolling_year_spent": stmt.excluded.rolling_year_spent, "oldest_counted": stmt.excluded.oldest_counted, "updated_at": stmt.excluded.updated_at},
+    )
+    result = session.execute(stmt)
+    stale = select(totals.c.member_id)
+    session.execute(
+        update(table)
+        .where(table.c.member_id.not_in(stale))
+        .values(rolling_year_spent=Decimal("0.00"), oldest_counted=None, updated_at=datetime.now(timezone.utc))
+    )
+    session.commit()
+    return result.rowcount or 0
+
+
+def ensure_member_spend(session: Session) -> None:
+    """Backfill on first start after the table is introduced."""
+    if session.exec(select(MemberSpend.member_id).limit(1)).first() is None:
+        backfill_member_spend(session)
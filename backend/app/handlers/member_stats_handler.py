@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from sqlalchemy import case, event, func, literal, true
+from sqlmodel import Session, select
+from ..models.member_stats import MemberStats
+from ..models.transaction import Transaction
+from ..utils.sql import dialect_insert
+from .member_spend_handler import as_utc
+
+
+@event.listens_for(Transaction, "after_insert")
+def _count_visit(mapper, connection, target: Transaction) -> None:
+    """Fold each member transaction into its member's lifetime stats as it is inserted."""
+    if target.member_id is None:
+        return
+    table = MemberStats.__table__
+    tx_date = as_utc(target.transaction_date)
+    insert = dialect_insert(connection)
+    stmt = insert(table).values(
+        member_id=target.member_id,
+        visit_count=1,
+        lifetime_spent=target.total_amount,
+        first_visit=tx_date,
+        last_visit=tx_date,
+        updated_at=datetime.now(timezone.utc),
+    )
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.member_id],
+        set_={
+            "visit_count": table.c.visit_count + 1,
+            "lifetime_spent": table.c.lifetime_spent + stmt.excluded.lifetime_spent,
+            "first_visit": case(
+                (table.c.first_visit.is_(None), stmt.excluded.first_visit),
+                (stmt.excluded.first_visit < table.c.first_visit, stmt.excluded.first_visit),
+                else_=table.c.first_visit,
+            ),
+            "last_visit": case(
+                (table.c.last_visit.is_(None), stmt.excluded.last_visit),
+                (stmt.excluded.last_visit > table.c.last_visit, stmt.excluded.last_visit),
+                else_=table.c.last_visit,
+            ),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+
+def backfill_member_stats(session: Session) -> int:
+    """Rebuild every member's lifetime stats in one INSERT ... SELECT upsert."""
+    table = MemberStats.__table__
+    totals = (
+        select(
+            Transaction.member_id,
+            func.count().label("visits"),
+            func.sum(Transaction.total_amount).label("spent"),
+            func.min(Transaction.transaction_date).label("first"),
+            func.max(Transaction.transaction_date).label("last"),
+        )
+        .where(Transaction.member_id.is_not(None))
+        .group_by(Transaction.member_id)
+        .subquery()
+    )
+    insert = dialect_insert(session)
+    stmt = insert(table).from_select(
+        ["member_id", "visit_count", "lifetime_spent", "first_visit", "last_visit", "updated_at"],
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT.
+        select(totals.c.member_id, totals.c.visits, totals.c.spent, totals.c.first, totals.c.last, literal(datetime.now(timezone.utc))).where(true()),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.member_id],
+        set_={c: getattr(stmt.excluded, c) for c in ("visit_count", "lifetime_spent", "first_visit", "last_visit", "updated_at")},
+    )
+    result = session.execute(stmt)
+    session.commit()
+    return result.rowcount or 0
+
+
+def ensure_member_stats(session: Session) -> None:
+    """Backfill on first start after the table is introduced."""
+    if session.exec(select(MemberStats.member_id).limit(1)).first() is None:
+        backfill_member_stats(session)
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import and_, case, func, insert, literal, update
+from sqlmodel import Session, select
+from ..models.member import Member
+from ..models.member_spend import MemberSpend
+from ..models.member_tier_change import MemberTierChange
+from ..utils.member_lookup import member_cache
+from ..utils.tiers import TierInfo, load_tiers, resolve_tier
+from .member_spend_handler import expire_member_spend
+
+
+TIER_BATCH = 5000
+
+
+def _tier_case(tiers: list[TierInfo], spent, attr: str):
+    """SQL CASE equivalent of ``resolve_tier`` returning the tier's ``attr``."""
+    whens = []
+    for t in reversed(tiers):
+        cond = spent >= t.min_spent if t.max_spent is None else and_(spent >= t.min_spent, spent <= t.max_spent)
+        whens.append((cond, literal(getattr(t, attr))))
+    return case(*whens, else_=literal(getattr(tiers[0], attr)))
+
+
+def recalculate_member_tiers(session: Session) -> int:
+    """Nightly: set every member's tier and discount rate from their rolling-year spend.
+
+    Each batch of member ids is one INSERT ... SELECT recording the changes and one UPDATE
+    touching only members whose tier moves, committed separately so checkout never waits
+    on more than a batch of row locks.
+    """
+    expire_member_spend(session)
+    tiers = load_tiers(session)
+    if not tiers:
+        return 0
+    member = Member.__table__
+    spent = func.coalesce(
+        select(MemberSpend.rolling_year_spent).where(MemberSpend.member_id == member.c.member_id).scalar_subquery(),
+        literal(Decimal("0.00")),
+    )
+    new_rank = _tier_case(tiers, spent, "rank_name")
+    new_rate = _tier_case(tiers, spent, "discount_rate")
+    bounds = session.exec(select(func.min(Member.member_id), func.max(Member.member_id))).one()
+    if bounds[0] is None:
+        return 0
+    changed = 0
+    now = datetime.now(timezone.utc)
+    for low in range(bounds[0], bounds[1] + 1, TIER_BATCH):
+        in_batch = and_(member.c.member_id >= low, member.c.member_id < low + TIER_BATCH)
+        moves = and_(in_batch, (member.c.membership_rank != new_rank) | (member.c.discount_rate != new_rate))
+        session.execute(
+            insert(MemberTierChange.__table__).from_select(
+                ["member_id", "old_rank", "new_rank", "old_discount_rate", "new_discount_rate", "rolling_year_spent", "reason", "changed_at"],
+                select(member.c.member_id, member.c.membership_rank, new_rank, member.c.discount_rate, new_rate, spent, literal("NIGHTLY"), literal(now)).where(moves),
+            )
+        )
+        result = session.execute(update(member).where(moves).values(membership_rank=new_rank, discount_rate=new_rate))
+        session.commit()
+        changed += result.rowcount or 0
+    if changed:
+        member_cache.clear()
+    return changed
+
+
+def upgrade_member_tier(session: Session, member: Member) -> bool:
+    """Move ``member`` up to the tier their rolling-year spend now reaches, without committing.
+
+    Checkout only ever upgrades; downgrades wait for the nightly recalculation.
+    """
+    tiers = load_tiers(session)
+    spent = session.exec(select(MemberSpend.rolling_year_spent).where(MemberSpend.member_id == member.member_id)).first()
+    rolling = Decimal(spent) if spent is not None else Decimal("0.00")
+    target = resolve_tier(tiers, rolling)
+    current = next((t for t in tiers if t.rank_name == member.membership_rank), None)
+    if target is None or (current is not None and target.min_spent <= current.min_spent):
+        return False
+    session.add(MemberTierChange(
+        member_id=member.member_id,
+        old_rank=member.membership_rank,
+        new_rank=target.rank_name,
+        old_discount_rate=member.discount_rate,
+        new_discount_rate=target.discount_rate,
+        rolling_year_spent=rolling,
+        reason="CHECKOUT",
+    ))
+    member.membership_rank = target.rank_name
+    member.discount_rate = target.discount_rate
+    session.add(member)
+    return True
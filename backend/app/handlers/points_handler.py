@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+from typing import Sequence
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, false, func, insert, literal, update
+from sqlmodel import Session, select
+from ..models.member import Member
+from ..models.points_ledger import PointsCheckpoint, PointsLedger
+from ..utils.sql import CHUNK_SIZE, chunked, dialect_insert
+
+
+POINTS_EXPIRY_DAYS = 365
+EXPIRE_BATCH = 5000
+
+
+def _tail_sum(member_id):
+    return (
+        select(func.coalesce(func.sum(PointsLedger.points), 0))
+        .where(PointsLedger.member_id == member_id, PointsLedger.folded == false())
+        .scalar_subquery()
+    )
+
+
+def points_balances(session: Session, member_ids: Sequence[int]) -> dict[int, int]:
+    """Current balances: each member's checkpoint plus the ledger entries written after it."""
+    out: dict[int, int] = {}
+    for chunk in chunked(list(member_ids)):
+        rows = session.exec(
+            select(Member.member_id, func.coalesce(PointsCheckpoint.balance, 0) + _tail_sum(Member.member_id))
+            .outerjoin(PointsCheckpoint, PointsCheckpoint.member_id == Member.member_id)
+            .where(Member.member_id.in_(chunk))
+        ).all()
+        out.update((mid, int(balance)) for mid, balance in rows)
+    return out
+
+
+def post_points(session: Session, member_id: int, entry_type: str, points: int, employee_id: str | None = None, note: str | None = None) -> PointsLedger:
+    """Append a REDEEM or ADJUST entry, refusing to take the balance below zero. Does not commit.
+
+    Only debits lock the member row, so concurrent redemptions cannot overdraw; earning at
+    checkout stays a plain insert.
+    """
+    if points == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Points must not be zero")
+    stmt = select(Member.member_id).where(Member.member_id == member_id)
+    if points < 0:
+        stmt = stmt.with_for_update()
+    if session.exec(stmt).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Member not found")
+    if points < 0 and points_balances(session, [member_id])[member_id] + points < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient points")
+    entry = PointsLedger(member_id=member_id, entry_type=entry_type, points=points, employee_id=employee_id, note=note)
+    session.add(entry)
+    session.flush()
+    return entry
+
+
+def compact_points(session: Session) -> int:
+    """Fold ledger tails into checkpoints, a member-id batch per commit.
+
+    The entries are flagged ``folded`` by one UPDATE ... RETURNING, and exactly the returned
+    rows are added to the checkpoints in the same transaction. An entry that has not committed
+    yet is neither flagged nor summed, so it stays in the tail whatever its id.
+    ``Member.points_balance`` is refreshed from the checkpoint for display.
+    """
+    ledger = PointsLedger.__table__
+    table = PointsCheckpoint.__table__
+    after = 0
+    compacted = 0
+    while True:
+        ids = session.exec(
+            select(PointsLedger.member_id)
+            .where(PointsLedger.folded == false(), PointsLedger.member_id > after)
+            .group_by(PointsLedger.member_id)
+            .order_by(PointsLedger.member_id)
+            .limit(CHUNK_SIZE)
+        ).all()
+        if not ids:
+            return compacted
+        folded = session.execute(
+            update(ledger)
+            .where(ledger.c.member_id.in_(ids), ledger.c.folded == false())
+            .values(folded=True)
+            .returning(ledger.c.member_id, ledger.c.entry_id, ledger.c.points)
+        ).all()
+        totals: dict[int, dict] = {}
+        now = datetime.now(timezone.utc)
+        for member_id, entry_id, points in folded:
+            row = totals.setdefault(member_id, {"member_id": member_id, "balance": 0, "last_entry_id": 0, "checkpoint_at": now})
+            row["balance"] += points
+            row["last_entry_id"] = max(row["last_entry_id"], entry_id)
+        if totals:
+            insert_ = dialect_insert(session)
+            stmt = insert_(table)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.member_id],
+                set_={
+                    "balance": table.c.balance + stmt.excluded.balance,
+                    "last_entry_id": case((stmt.excluded.last_entry_id > table.c.last_entry_id, stmt.excluded.last_entry_id), else_=table.c.last_entry_id),
+                    "checkpoint_at": stmt.excluded.checkpoint_at,
+                },
+            ), list(totals.values()))
+            session.execute(
+                update(Member.__table__)
+                .where(Member.__table__.c.member_id.in_(list(totals)))
+                .values(points_balance=select(table.c.balance).where(table.c.member_id == Member.__table__.c.member_id).scalar_subquery())
+            )
+        session.commit()
+        compacted += len(totals)
+        after = ids[-1]
+
+
+def expire_points(session: Session, now: datetime | None = None) -> int:
+    """Nightly: expire points earned more than ``POINTS_EXPIRY_DAYS`` ago that are still unspent.
+
+    Debits consume the oldest credits first, so a member's expiring amount is their credits
+    older than the cutoff minus every debit so far (earlier EXPIRE entries included, which
+    makes reruns no-ops). Each member-id range is one INSERT ... SELECT.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=POINTS_EXPIRY_DAYS)
+    bounds = session.exec(select(func.min(PointsLedger.member_id), func.max(PointsLedger.member_id))).one()
+    if bounds[0] is None:
+        return 0
+    old_credits = func.sum(case((and_(PointsLedger.points > 0, PointsLedger.created_at < cutoff), PointsLedger.points), else_=0))
+    debits = -func.sum(case((PointsLedger.points < 0, PointsLedger.points), else_=0))
+    expired = 0
+    for low in range(bounds[0], bounds[1] + 1, EXPIRE_BATCH):
+        due = (
+            select(PointsLedger.member_id, literal("EXPIRE"), -(old_credits - debits), literal("Points expired"), literal(now))
+            .where(PointsLedger.member_id >= low, PointsLedger.member_id < low + EXPIRE_BATCH)
+            .group_by(PointsLedger.member_id)
+            .having(old_credits - debits > 0)
+        )
+        result = session.execute(insert(PointsLedger.__table__).from_select(["member_id", "entry_type", "points", "note", "created_at"], due))
+        session.commit()
+        expired += result.rowcount or 0
+    return expired
+
+
+def ensure_points_ledger(session: Session) -> None:
+    """On first start after the ledger is introduced, carry existing balances in as ADJUST entries."""
+    if session.exec(select(PointsLedger.entry_id).limit(1)).first() is not None:
+        return
+    session.execute(insert(PointsLedger.__table__).from_select(
+        ["member_id", "entry_type", "points", "note", "created_at"],
+        select(Member.member_id, literal("ADJUST"), Member.points_balance, literal("Opening balance"), literal(datetime.now(timezone.utc))).where(Member.points_balance > 0),
+    ))
+    session.commit()
+    compact_points(session)
@@ -0,0 +1,183 @@
+import codecs
+import csv
+from decimal import Decimal
+from typing import Iterable, Iterator
+from pydantic import BaseModel, ValidationError, condecimal, conint, constr, model_validator
+from sqlmodel import Session, select
+from ..models.product import Product
+from .inventory_handler import record_movements
+from ..utils.catalog import catalog_changed
+from ..utils.sql import dialect_insert
+
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+REQUIRED_COLUMNS = ("barcode", "name", "cost_price", "selling_price")
+OPTIONAL_COLUMNS = ("brand", "category", "stock_quantity", "min_stock")
+# Columns refreshed when a barcode already exists; stock moves through inventory endpoints.
+UPSERT_UPDATE_COLUMNS = ("name", "brand", "category", "cost_price", "selling_price", "min_stock")
+
+
+class ProductImportRow(BaseModel):
+    barcode: constr(strip_whitespace=True, min_length=1, max_length=64)
+    name: constr(strip_whitespace=True, min_length=1)
+    brand: str | None = None
+    category: str | None = None
+    cost_price: condecimal(ge=Decimal("0"), max_digits=10, decimal_places=2)
+    selling_price: condecimal(ge=Decimal("0"), max_digits=10, decimal_places=2)
+    stock_quantity: conint(ge=0) = 0
+    min_stock: conint(gt=0) = 10
+
+    @model_validator(mode="before")
+    def strip_blanks(cls, data):
+        if not isinstance(data, dict):
+            return data
+        cleaned = {}
+        for key, value in data.items():
+            if isinstance(value, str):
+                value = value.strip()
+                if value == "" and key in OPTIONAL_COLUMNS:
+                    continue
+            cleaned[key] = value
+        return cleaned
+
+    @model_validator(mode="after")
+    def check_prices(self):
+        if self.selling_price < self.cost_price:
+            raise ValueError("Selling price cannot be less than cost price")
+        return self
+
+
+class ImportRowError(BaseModel):
+    row: int
+    barcode: str | None = None
+    error: str
+
+
+class ImportReport(BaseModel):
+    total_rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    dry_run: bool = False
+    errors: list[ImportRowError] = []
+
+
+def _upsert_statement(session: Session):
+    insert = dialect_insert(session)
+    stmt = insert(Product.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["barcode"],
+        set_={col: stmt.excluded[col] for col in UPSERT_UPDATE_COLUMNS},
+    )
+    return stmt.returning(Product.__table__.c.product_id)
+
+
+def _format_error(exc: ValidationError) -> str:
+    parts = []
+    for err in exc.errors():
+        loc = ".".join(str(x) for x in err.get("loc", ()))
+        msg = err.get("msg", "invalid")
+        parts.append(f"{loc}: {msg}" if loc else msg)
+    return "; ".join(parts)
+
+
+class ProductImporter:
+    """Validates product rows in batches and upserts each batch by barcode in one statement."""
+
+    def __init__(self, session: Session, batch_size: int = BATCH_SIZE, dry_run: bool = False):
+        self.session = session
+        self.batch_size = batch_size
+        self.report = ImportReport(dry_run=dry_run)
+        self._batch: list[tuple[int, dict]] = []
+        self._seen: set[str] = set()
+
+    def _error(self, row: int, barcode: str | None, message: str) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(ImportRowError(row=row, barcode=barcode, error=message))
+
+    def add(self, row_number: int, record: dict) -> None:
+        self.report.total_rows += 1
+        self._batch.append((row_number, record))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        batch, self._batch = self._batch, []
+        valid: list[tuple[int, ProductImportRow]] = []
+        for row_number, record in batch:
+            try:
+                item = ProductImportRow.model_validate(record)
+            except ValidationError as exc:
+                self._error(row_number, (record.get("barcode") or "").strip() or None, _format_error(exc))
+                continue
+            if item.barcode in self._seen:
+                self._error(row_number, item.barcode, "Duplicate barcode in file")
+                continue
+            self._seen.add(item.barcode)
+            valid.append((row_number, item))
+        if not valid:
+            return
+        barcodes = [item.barcode for _, item in valid]
+        existing = set(self.session.exec(select(Product.barcode).where(Product.barcode.in_(barcodes))).all())
+        if self.report.dry_run:
+            self.report.updated += len(existing)
+            self.report.inserted += len(valid) - len(existing)
+            return
+        rows = [item.model_dump() for _, item in valid]
+        try:
+            # executemany with RETURNING is batched into multi-row VALUES by the driver layer
+            product_ids = self.session.execute(_upsert_statement(self.session), rows).scalars().all()
+            opening = {item.barcode: item.stock_quantity for _, item in valid if item.barcode not in existing and item.stock_quantity}
+            if opening:
+                # New products start their ledger with the imported stock, as POST /api/products does.
+                ids = dict(self.session.exec(select(Product.barcode, Product.product_id).where(Product.barcode.in_(list(opening)))).all())
+                record_movements(self.session, {ids[bc]: qty for bc, qty in opening.items()}, "ADJUSTMENT", reference="Product import")
+            catalog_changed(self.session, products=product_ids)
+            self.session.commit()
+        except Exception as exc:
+            self.session.rollback()
+            for row_number, item in valid:
+                self._error(row_number, item.barcode, f"Database error: {exc.__class__.__name__}")
+            return
+        self.report.updated += len(existing)
+        self.report.inserted += len(valid) - len(existing)
+
+    def finish(self) -> ImportReport:
+        self.flush()
+        return self.report
+
+
+def import_products_csv(session: Session, lines: Iterable[str], batch_size: int = BATCH_SIZE, dry_run: bool = False) -> ImportReport:
+    """Stream CSV lines (header first) into the product table and return a per-row report."""
+    reader = csv.DictReader(lines)
+    importer = ProductImporter(session, batch_size=batch_size, dry_run=dry_run)
+    header = [h.strip().lower() for h in (reader.fieldnames or [])]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        importer._error(1, None, f"Missing required columns: {', '.join(missing)}")
+        return importer.report
+    reader.fieldnames = header
+    allowed = set(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    for record in reader:
+        # DictReader reports the physical line the record ended on; header is line 1.
+        importer.add(reader.line_num, {k: v for k, v in record.items() if k in allowed})
+    return importer.finish()
+
+
+def iter_text_lines(chunks: Iterable[bytes], encoding: str = "utf-8-sig") -> Iterator[str]:
+    """Decode a byte-chunk stream into newline-terminated lines, as csv expects."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        cut = pending.rfind("\n")
+        if cut < 0:
+            continue
+        complete, pending = pending[:cut], pending[cut + 1:]
+        for line in complete.split("\n"):
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
@@ -0,0 +1,203 @@
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from ..utils.promotion_index import ActivePromotion
+from ..utils.promotion_rule_index import CompiledRule
+
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+@dataclass(slots=True)
+class CartLine:
+    product_id: int
+    quantity: int
+    unit_price: Decimal
+    promotion: ActivePromotion | None = None
+
+
+@dataclass(slots=True)
+class AppliedRule:
+    rule_id: int
+    name: str
+    rule_type: str
+    times: int
+    discount: Decimal
+
+
+@dataclass(slots=True)
+class CartPricing:
+    """Discount per product line, plus the rules that produced part of it."""
+    discounts: dict[int, Decimal]
+    applied: list[AppliedRule] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class _Plan:
+    rule: CompiledRule
+    times: int
+    consumed: dict[int, int]
+    discounts: dict[int, Decimal]
+    savings: Decimal
+
+
+def calculate_product_discount(unit_price: Decimal, quantity: int, promotion: ActivePromotion | None) -> Decimal:
+    """Calculates discount for a single line item based on the promotion in effect today."""
+    if not promotion:
+        return Decimal("0.00")
+
+    original_line_total = unit_price * Decimal(quantity)
+
+    if promotion.discount_type == 'PERCENTAGE':
+        # discount_amount = original_line_total * (discount_value / 100)
+        discount = original_line_total * (promotion.discount_value / Decimal("100"))
+        # Round the discount amount to 2 decimal places using ROUND_HALF_UP (common in retail)
+        return discount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    
+    elif promotion.discount_type == 'FIXED':
+        # discount_amount = fixed_amount * quantity
+        discount = promotion.discount_value * Decimal(quantity)
+        return discount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    
+    return Decimal("0.00") 
+
+
+def allocate(total: Decimal, weights: dict[int, Decimal]) -> dict[int, Decimal]:
+    """Split ``total`` across lines in proportion to ``weights``, exactly, in whole cents.
+
+    Uses largest remainders, so no share exceeds its weight when ``total`` does not exceed
+    the sum of weights.
+    """
+    total_cents = int((total / CENT).to_integral_value(rounding=ROUND_HALF_UP))
+    weight_sum = sum(weights.values())
+    if total_cents <= 0 or weight_sum <= 0:
+        return {}
+    shares: dict[int, int] = {}
+    remainders: list[tuple[Decimal, int]] = []
+    for pid, weight in weights.items():
+        exact = Decimal(total_cents) * weight / weight_sum
+        shares[pid] = int(exact)
+        remainders.append((exact - shares[pid], pid))
+    leftover = total_cents - sum(shares.values())
+    for _, pid in sorted(remainders, key=lambda r: (-r[0], r[1]))[:leftover]:
+        shares[pid] += 1
+    return {pid: Decimal(cents) * CENT for pid, cents in shares.items() if cents}
+
+
+def _unit_promo_value(line: CartLine) -> Decimal:
+    """What the line's own promotion is worth per unit; units used by a rule forgo it."""
+    if line.promotion is None:
+        return ZERO
+    if line.promotion.discount_type == "PERCENTAGE":
+        return line.unit_price * line.promotion.discount_value / Decimal("100")
+    return min(line.promotion.discount_value, line.unit_price)
+
+
+def _free_positions(n: int, buy: int, pay: int) -> int:
+    """Free units among the first ``n`` units when every ``buy`` consecutive units pay ``pay``."""
+    return (n // buy) * (buy - pay) + max(0, n % buy - pay)
+
+
+def _plan_multi_buy(rule: CompiledRule, lines: dict[int, CartLine], remaining: dict[int, int]) -> _Plan | None:
+    # Mix and match across the rule's products; within each group the cheapest units are free.
+    eligible = sorted((pid for pid in rule.products if remaining.get(pid)), key=lambda pid: (-lines[pid].unit_price, pid))
+    times = sum(remaining[pid] for pid in eligible) // rule.buy_quantity
+    if times == 0:
+        return None
+    limit = times * rule.buy_quantity
+    consumed: dict[int, int] = {}
+    discounts: dict[int, Decimal] = {}
+    pos = 0
+    for pid in eligible:
+        take = min(remaining[pid], limit - pos)
+        free = _free_positions(pos + take, rule.buy_quantity, rule.pay_quantity) - _free_positions(pos, rule.buy_quantity, rule.pay_quantity)
+        consumed[pid] = take
+        if free:
+            discounts[pid] = lines[pid].unit_price * free
+        pos += take
+        if pos == limit:
+            break
+    return _plan(rule, times, consumed, discounts, lines)
+
+
+def _plan_bundle(rule: CompiledRule, lines: dict[int, CartLine], remaining: dict[int, int]) -> _Plan | None:
+    if not rule.products or any(pid not in lines for pid in rule.products):
+        return None
+    times = min(remaining[pid] // qty for pid, qty in rule.products.items())
+    if times == 0:
+        return None
+    weights = {pid: lines[pid].unit_price * qty for pid, qty in rule.products.items()}
+    per_bundle = sum(weights.values()) - rule.bundle_price
+    if per_bundle <= 0:
+        return None
+    consumed = {pid: qty * times for pid, qty in rule.products.items()}
+    return _plan(rule, times, consumed, allocate(per_bundle * times, weights), lines)
+
+
+def _plan(rule: CompiledRule, times: int, consumed: dict[int, int], discounts: dict[int, Decimal], lines: dict[int, CartLine]) -> _Plan:
+    forgone = sum((_unit_promo_value(lines[pid]) * qty for pid, qty in consumed.items()), ZERO)
+    return _Plan(rule, times, consumed, discounts, sum(discounts.values(), ZERO) - forgone)
+
+
+_PLANNERS = {"MULTI_BUY": _plan_multi_buy, "BUNDLE": _plan_bundle}
+
+
+def evaluate_cart(cart: list[CartLine], item_rules: list[CompiledRule], basket_rules: list[CompiledRule]) -> CartPricing:
+    """Pick the best non-conflicting set of deals for a cart.
+
+    Each unit takes part in at most one item deal (multi-buy, bundle, or the product's own
+    promotion). Item rules are ranked once by what they would save on the whole cart, then
+    applied in that order to the units still left, each as many times as they allow and only
+    when they beat the product promotions of the units they use. Units left over get their
+    product promotion. Then the single most valuable basket rule is applied on top and spread
+    across the eligible lines in proportion to their totals. Each rule is planned at most
+    twice, so work is linear in the number of rules times the cart lines they mention.
+    """
+    lines = {line.product_id: line for line in cart}
+    remaining = {pid: line.quantity for pid, line in lines.items()}
+    discounts: dict[int, Decimal] = {pid: ZERO for pid in lines}
+    applied: list[AppliedRule] = []
+
+    ranked: list[_Plan] = []
+    for rule in item_rules:
+        if rule.rule_type in _PLANNERS:
+            plan = _PLANNERS[rule.rule_type](rule, lines, remaining)
+            if plan is not None and plan.savings > 0:
+                ranked.append(plan)
+    ranked.sort(key=lambda plan: plan.savings, reverse=True)
+    for i, first in enumerate(ranked):
+        # The first rule sees the whole cart; later ones re-plan against what is left.
+        plan = first if i == 0 else _PLANNERS[first.rule.rule_type](first.rule, lines, remaining)
+        if plan is None or plan.savings <= 0:
+            continue
+        for pid, qty in plan.consumed.items():
+            remaining[pid] -= qty
+        for pid, amount in plan.discounts.items():
+            discounts[pid] += amount
+        applied.append(AppliedRule(plan.rule.rule_id, plan.rule.name, plan.rule.rule_type, plan.times, sum(plan.discounts.values(), ZERO)))
+
+    for pid, line in lines.items():
+        if remaining[pid] and line.promotion is not None:
+            gross = line.unit_price * remaining[pid]
+            discounts[pid] += min(calculate_product_discount(line.unit_price, remaining[pid], line.promotion), gross)
+
+    line_totals = {pid: line.unit_price * line.quantity - discounts[pid] for pid, line in lines.items()}
+    best_basket: tuple[Decimal, CompiledRule, dict[int, Decimal]] | None = None
+    for rule in basket_rules:
+        eligible = {pid: total for pid, total in line_totals.items() if (not rule.products or pid in rule.products) and total > 0}
+        eligible_total = sum(eligible.values(), ZERO)
+        if eligible_total < rule.min_basket or eligible_total <= 0:
+            continue
+        if rule.discount_type == "PERCENTAGE":
+            amount = (eligible_total * rule.discount_value / Decimal("100")).quantize(CENT, rounding=ROUND_HALF_UP)
+        else:
+            amount = min(rule.discount_value, eligible_total)
+        if best_basket is None or amount > best_basket[0]:
+            best_basket = (amount, rule, eligible)
+    if best_basket is not None and best_basket[0] > 0:
+        amount, rule, eligible = best_basket
+        for pid, share in allocate(amount, eligible).items():
+            discounts[pid] += share
+        applied.append(AppliedRule(rule.rule_id, rule.name, rule.rule_type, 1, amount))
+
+    return CartPricing(discounts={pid: d.quantize(CENT, rounding=ROUND_HALF_UP) for pid, d in discounts.items()}, applied=applied)
@@ -0,0 +1,206 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Callable, Literal
+from pydantic import BaseModel, condecimal, model_validator
+from sqlalchemy import case, delete, func, literal, true, update
+from sqlmodel import Session, select
+from .. import db
+from ..models.product import Product
+from ..models.simulation_job import SimulationJob
+from ..models.transaction import Transaction
+from ..models.transaction_item import TransactionItem
+from ..utils.sql import chunked
+from .bulk_product_handler import ProductSelector, selector_clause
+
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+PRODUCT_BATCH = 500
+MAX_WINDOW_DAYS = 3 * 366
+# Jobs are kept this long for polling, then dropped when the next one is submitted.
+JOB_RETENTION = timedelta(hours=1)
+
+
+class PromotionScenario(BaseModel):
+    """A proposed per-unit promotion and the sales window to replay it over.
+
+    The window's days are UTC calendar days, the clock ``transaction_date`` is stored in.
+    """
+    discount_type: Literal["PERCENTAGE", "FIXED"]
+    discount_value: condecimal(gt=Decimal("0"), max_digits=10, decimal_places=2)
+    start_date: date
+    end_date: date
+    # None simulates the promotion on every product.
+    selector: ProductSelector | None = None
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.discount_type == "PERCENTAGE" and self.discount_value > Decimal("100"):
+            raise ValueError("Percentage discount cannot exceed 100.00")
+        if self.end_date < self.start_date:
+            raise ValueError("End date must be after start date")
+        if (self.end_date - self.start_date).days > MAX_WINDOW_DAYS:
+            raise ValueError(f"Window cannot exceed {MAX_WINDOW_DAYS} days")
+        return self
+
+
+class SimulationLine(BaseModel):
+    units: int = 0
+    gross_sales: Decimal = Decimal("0.00")
+    actual_discount: Decimal = Decimal("0.00")
+    actual_revenue: Decimal = Decimal("0.00")
+    projected_discount: Decimal = Decimal("0.00")
+    projected_revenue: Decimal = Decimal("0.00")
+    cost: Decimal = Decimal("0.00")
+    actual_margin: Decimal = Decimal("0.00")
+    projected_margin: Decimal = Decimal("0.00")
+    margin_impact: Decimal = Decimal("0.00")
+
+    def add(self, other: "SimulationLine") -> None:
+        for name in SimulationLine.model_fields:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+class ProductSimulation(SimulationLine):
+    product_id: int
+    name: str
+    category: str | None
+
+
+class CategorySimulation(SimulationLine):
+    category: str | None
+    products: int = 0
+
+
+class SimulationReport(BaseModel):
+    scenario: PromotionScenario
+    lines_replayed: int
+    totals: SimulationLine
+    categories: list[CategorySimulation]
+    products: list[ProductSimulation]
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def simulate_promotion(session: Session, scenario: PromotionScenario, progress: Callable[[float], None] | None = None) -> SimulationReport:
+    """Replay historical sales under ``scenario`` and project its discount cost and margin.
+
+    Lines are repriced and aggregated by the database, one batch of products at a time, so
+    only per-product totals come back regardless of how many lines fall in the window.
+    Margins use each product's current cost price, as item cost is not recorded per sale.
+    """
+    where = selector_clause(scenario.selector) if scenario.selector is not None else true()
+    product_ids = session.exec(select(Product.product_id).where(where).order_by(Product.product_id)).all()
+    start = datetime.combine(scenario.start_date, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(scenario.end_date + timedelta(days=1), time.min, tzinfo=timezone.utc)
+
+    gross = TransactionItem.quantity * TransactionItem.unit_price
+    value = literal(scenario.discount_value)
+    if scenario.discount_type == "PERCENTAGE":
+        projected = func.round(gross * value / literal(Decimal("100")), 2)
+    else:
+        projected = TransactionItem.quantity * case((TransactionItem.unit_price < value, TransactionItem.unit_price), else_=value)
+
+    products: list[ProductSimulation] = []
+    lines_replayed = 0
+    batches = list(chunked(product_ids, PRODUCT_BATCH))
+    for done, chunk in enumerate(batches, start=1):
+        stmt = (
+            select(
+                Product.product_id,
+                Product.name,
+                Product.category,
+                Product.cost_price,
+                func.count(),
+                func.sum(TransactionItem.quantity),
+                func.sum(gross),
+                func.sum(TransactionItem.discount_amount),
+                func.sum(TransactionItem.line_total),
+                func.sum(projected),
+            )
+            .join(TransactionItem, TransactionItem.product_id == Product.product_id)
+            .join(Transaction, Transaction.transaction_id == TransactionItem.transaction_id)
+            .where(Product.product_id.in_(chunk), Transaction.transaction_date >= start, Transaction.transaction_date < end)
+            .group_by(Product.product_id, Product.name, Product.category, Product.cost_price)
+            .order_by(Product.product_id)
+        )
+        for pid, name, category, cost_price, line_count, units, gross_sales, actual_discount, actual_revenue, projected_discount in session.exec(stmt).all():
+            lines_replayed += line_count
+            row = ProductSimulation(
+                product_id=pid,
+                name=name,
+                category=category,
+                units=int(units),
+                gross_sales=_money(gross_sales),
+                actual_discount=_money(actual_discount),
+                actual_revenue=_money(actual_revenue),
+                projected_discount=_money(projected_discount),
+                cost=_money(Decimal(str(cost_price)) * int(units)),
+            )
+            row.projected_revenue = row.gross_sales - row.projected_discount
+            row.actual_margin = row.actual_revenue - row.cost
+            row.projected_margin = row.projected_revenue - row.cost
+            row.margin_impact = row.projected_margin - row.actual_margin
+            products.append(row)
+        if progress is not None:
+            progress(done / len(batches))
+
+    totals = SimulationLine()
+    categories: dict[str | None, CategorySimulation] = {}
+    for row in products:
+        totals.add(row)
+        cat = categories.setdefault(row.category, CategorySimulation(category=row.category))
+        cat.add(row)
+        cat.products += 1
+    return SimulationReport(
+        scenario=scenario,
+        lines_replayed=lines_replayed,
+        totals=totals,
+        categories=sorted(categories.values(), key=lambda c: c.projected_discount, reverse=True),
+        products=sorted(products, key=lambda p: p.projected_discount, reverse=True),
+    )
+
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="simulation")
+
+
+def _set(session: Session, job_id: str, **values) -> None:
+    session.execute(update(SimulationJob).where(SimulationJob.job_id == job_id).values(**values))
+    session.commit()
+
+
+def _run(job_id: str, scenario: PromotionScenario) -> None:
+    # One session for the replay and the status writes, so a run holds one connection.
+    with Session(db.engine) as session:
+        try:
+            _set(session, job_id, status="running")
+            report = simulate_promotion(session, scenario, progress=lambda p: _set(session, job_id, progress=p))
+            _set(session, job_id, status="done", progress=1.0, result=report.model_dump(mode="json"), finished_at=datetime.now(timezone.utc))
+        except Exception as exc:
+            logger.exception("Promotion simulation %s failed", job_id)
+            session.rollback()
+            _set(session, job_id, status="failed", error=str(exc), finished_at=datetime.now(timezone.utc))
+
+
+def submit_simulation(session: Session, scenario: PromotionScenario) -> SimulationJob:
+    """Queue a simulation on this worker's background pool; poll it with ``get_simulation``.
+
+    The job is a row, so the poll can reach any worker.
+    """
+    session.execute(delete(SimulationJob).where(SimulationJob.created_at < datetime.now(timezone.utc) - JOB_RETENTION))
+    job = SimulationJob(job_id=uuid.uuid4().hex, scenario=scenario.model_dump(mode="json"))
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    _executor.submit(_run, job.job_id, scenario)
+    return job
+
+
+def get_simulation(session: Session, job_id: str) -> SimulationJob | None:
+    return session.get(SimulationJob, job_id)
@@ -1,15 +1,12 @@
 from typing import List
 from sqlmodel import Session, select
 from sqlalchemy import or_
-from passlib.context import CryptContext
 import hmac
 from fastapi import HTTPException, status
 from ..models.user import User
 from ..schemas.user_schema import UserCreate, UserLogin, UserRead, Token
 from ..utils.jwt import create_access_token
-
-
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+from ..utils.passwords import hash_password, verify_password
 
 
 def signup(data: UserCreate, session: Session) -> UserRead:
@@ -27,7 +24,7 @@ def signup(data: UserCreate, session: Session) -> UserRead:
         # Require a non-empty configured code and use constant-time comparison
         if not settings.manager_signup_code or not data.manager_secret or not hmac.compare_digest(str(data.manager_secret), str(settings.manager_signup_code)):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Manager code invalid")
-    hashed = pwd_context.hash(data.password)
+    hashed = hash_password(data.password)
     user = User(email=str(data.email), hashed_password=hashed, username=data.username, name=data.name, role=role)
     session.add(user)
     session.commit()
@@ -40,9 +37,15 @@ def signin(data: UserLogin, session: Session) -> Token:
     user = session.exec(statement).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    if not pwd_context.verify(data.password, user.hashed_password):
+    valid, new_hash = verify_password(data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    token = create_access_token(user_uid=user.uid)
+    if new_hash:
+        # Hash rounds changed since this password was stored; upgrade it transparently.
+        user.hashed_password = new_hash
+        session.add(user)
+        session.commit()
+    token = create_access_token(user_uid=user.uid, role=user.role, is_active=user.is_active)
     return Token(access_token=token)
 
 
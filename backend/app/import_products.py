@@ -0,0 +1,37 @@
+"""
+Bulk product import from CSV
+
+Usage: python -m app.import_products products.csv [--dry-run] [--batch-size 1000]
+Columns: barcode,name,cost_price,selling_price[,brand,category,stock_quantity,min_stock]
+"""
+import json
+import sys
+import time
+from sqlmodel import Session
+from .db import engine
+from .handlers.product_import_handler import BATCH_SIZE, import_products_csv
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import products from a CSV file (upsert by barcode)")
+    parser.add_argument("path", help="CSV file to import, or - for stdin")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, do not write")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per statement (default: {BATCH_SIZE})")
+    parser.add_argument("--errors", type=int, default=20, help="Number of row errors to print (default: 20)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with Session(engine) as session:
+        if args.path == "-":
+            report = import_products_csv(session, sys.stdin, batch_size=args.batch_size, dry_run=args.dry_run)
+        else:
+            with open(args.path, newline="", encoding="utf-8-sig") as f:
+                report = import_products_csv(session, f, batch_size=args.batch_size, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - started
+
+    print(f"Rows: {report.total_rows}  inserted: {report.inserted}  updated: {report.updated}  failed: {report.failed}  ({elapsed:.1f}s){'  [dry run]' if report.dry_run else ''}")
+    for err in report.errors[:args.errors]:
+        print(json.dumps(err.model_dump()))
+    sys.exit(1 if report.failed else 0)
@@ -1,14 +1,31 @@
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel
-from .db import engine, get_session
+from sqlmodel import SQLModel, Session
+from .db import engine, limit_sessions, pool_capacity
 from .config.settings import settings
 from .middleware.auth_middleware import AuthMiddleware
+from .middleware.metrics_middleware import MetricsMiddleware
+from .utils.product_search import ensure_search_indexes
+from .utils.member_lookup import ensure_member_indexes
+from .utils.suggest_index import suggest_index
+from .utils.promotion_index import promotion_index
+from .utils.promotion_rule_index import promotion_rule_index
+from .scheduler import scheduler
+from .utils.passwords import shutdown_password_pool
+from .utils import metrics
+from .handlers.member_spend_handler import ensure_member_spend
+from .handlers.points_handler import ensure_points_ledger
+from .handlers.member_stats_handler import ensure_member_stats
 from .routes.users import router as users_router
 from .routes.products import router as products_router
 from .routes.transactions import router as transactions_router
 from .routes.promotions import router as promotions_router
 from .routes.members import router as members_router
+from .routes.catalog import router as catalog_router
+from .routes.inventory import router as inventory_router
+from .routes.promotion_rules import router as promotion_rules_router
+from .routes.system import router as system_router, metrics_router
 from .models import product as _product_model
 from .models import promotion as _promotion_model
 from .models import membership_tier as _membership_tier_model
@@ -17,6 +34,18 @@ from .models import cashier as _cashier_model
 from .models import transaction as _transaction_model
 from .models import transaction_item as _transaction_item_model
 from .models import user as _user_model
+from .models import catalog_change_log as _catalog_change_log_model
+from .models import stock_movement as _stock_movement_model
+from .models import stocktake as _stocktake_model
+from .models import stock_snapshot as _stock_snapshot_model
+from .models import promotion_rule as _promotion_rule_model
+from .models import member_spend as _member_spend_model
+from .models import member_tier_change as _member_tier_change_model
+from .models import points_ledger as _points_ledger_model
+from .models import member_stats as _member_stats_model
+from .models import token_revocation as _token_revocation_model
+from .models import job_run as _job_run_model
+from .models import simulation_job as _simulation_job_model
 
 
 pass
@@ -31,10 +60,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
 app.add_middleware(AuthMiddleware)
+# Added last so it is outermost and times the whole stack.
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(users_router)
@@ -42,9 +74,55 @@ app.include_router(products_router)
 app.include_router(transactions_router)
 app.include_router(promotions_router) 
 app.include_router(members_router)
+app.include_router(catalog_router)
+app.include_router(inventory_router)
+app.include_router(promotion_rules_router)
+app.include_router(system_router)
+app.include_router(metrics_router)
 
 
 @app.on_event("startup")
 def on_startup():
     SQLModel.metadata.create_all(engine)
+    ensure_search_indexes(engine)
+    ensure_member_indexes(engine)
+    with Session(engine) as session:
+        suggest_index.sync(session)
+        promotion_index.sync(session)
+        promotion_rule_index.sync(session)
+        ensure_member_spend(session)
+        ensure_points_ledger(session)
+        ensure_member_stats(session)
+    if settings.scheduler_enabled:
+        scheduler.start()
+    if settings.metrics_dir:
+        metrics.exporter.start(settings.metrics_dir, settings.metrics_flush_seconds)
+
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """Size sync request threads and open request sessions to the connections left for requests.
+
+    The scheduler, simulation workers and revocation reload take connections outside request
+    sessions, so they are reserved from the pool's capacity. Sessions are capped at the rest,
+    so requests queue for a slot before connecting instead of inside the pool while holding a
+    thread; threads default to the same number, since more would only wait for a slot.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    capacity = pool_capacity(engine)
+    slots = capacity and max(capacity - settings.threadpool_reserved_connections, 1)
+    if slots:
+        limit_sessions(slots)
+    size = settings.threadpool_size or slots
+    if size:
+        limiter.total_tokens = size
+    metrics.gauge("threadpool_size", lambda: limiter.total_tokens)
+    metrics.gauge("threadpool_busy", lambda: limiter.borrowed_tokens)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    scheduler.stop()
+    shutdown_password_pool()
+    metrics.exporter.stop()
     
\ No newline at end of file
@@ -1,24 +1,34 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from typing import Callable
+from starlette.types import ASGIApp, Receive, Scope, Send
 from ..utils.jwt import decode_access_token
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
 
-        if request.method == "OPTIONS":
-            return await call_next(request)
+class AuthMiddleware:
+    """Verify the bearer token once per request and leave its claims on the scope.
 
-        auth = request.headers.get("Authorization")
-        if auth and auth.startswith("Bearer "):
-            token = auth.split(" ", 1)[1]
-            try:
-                payload = decode_access_token(token)
-                request.state.user_id = payload.get("sub")
-            except Exception:
-                request.state.user_id = None
-        else:
-            request.state.user_id = None
+    A pure ASGI middleware, so it adds no per-request task or body buffering. Downstream,
+    ``request.state.token_claims`` holds the decoded claims, ``None`` when the token was
+    missing or invalid; ``request.state.user_id`` is its subject.
+    """
 
-        response = await call_next(request)
-        return response
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        claims = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth = value.decode("latin-1")
+                if auth.startswith("Bearer "):
+                    try:
+                        claims = decode_access_token(auth.split(" ", 1)[1])
+                    except Exception:
+                        claims = None
+                break
+        state = scope.setdefault("state", {})
+        state["token_claims"] = claims
+        state["user_id"] = claims.get("sub") if claims else None
+        await self.app(scope, receive, send)
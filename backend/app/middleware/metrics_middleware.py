@@ -0,0 +1,52 @@
+from time import perf_counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils import metrics
+
+
+_requests = metrics.counter("http_requests_total", "Requests handled", ("method", "route", "status"))
+_latency = metrics.histogram("http_request_duration_seconds", help="Request latency", labelnames=("method", "route"))
+_in_progress = metrics.gauge("http_requests_in_progress", help="Requests being handled", labelnames=("method",))
+
+
+def route_template(scope: Scope) -> str:
+    """The matched route's path template, so ``/api/members/42`` counts as ``/api/members/{member_id}``."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request by method, route template and status.
+
+    Pure ASGI, so the cost per request is a few counter updates. The route is read from
+    the scope after the router has matched it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = _in_progress.labels(method)
+        in_progress.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            in_progress.dec()
+            route = route_template(scope)
+            _requests.labels(method, route, status_code).inc()
+            _latency.labels(method, route).observe(elapsed)
@@ -0,0 +1,10 @@
+from typing import Optional
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+
+
+class CatalogChangeLog(SQLModel, table=True):
+    version: Optional[int] = Field(default=None, primary_key=True)
+    entity: str = Field(index=True)
+    entity_id: Optional[int] = None
+    changed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,8 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class JobRun(SQLModel, table=True):
+    """When a scheduled job last started, shared by every worker running the scheduler."""
+    name: str = Field(primary_key=True)
+    last_run_at: datetime
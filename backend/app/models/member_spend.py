@@ -0,0 +1,13 @@
+from typing import Optional
+from decimal import Decimal
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy.types import Numeric
+
+
+class MemberSpend(SQLModel, table=True):
+    member_id: int = Field(foreign_key="member.member_id", primary_key=True, ondelete="CASCADE")
+    rolling_year_spent: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(12, 2), nullable=False))
+    # Oldest transaction counted; once it leaves the window the row is recomputed.
+    oldest_counted: Optional[datetime] = Field(default=None, index=True)
+    updated_at: datetime
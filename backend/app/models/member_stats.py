@@ -0,0 +1,14 @@
+from typing import Optional
+from decimal import Decimal
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy.types import Numeric
+
+
+class MemberStats(SQLModel, table=True):
+    member_id: int = Field(foreign_key="member.member_id", primary_key=True, ondelete="CASCADE")
+    visit_count: int = Field(default=0)
+    lifetime_spent: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(14, 2), nullable=False))
+    first_visit: Optional[datetime] = None
+    last_visit: Optional[datetime] = None
+    updated_at: datetime
@@ -0,0 +1,21 @@
+from typing import Optional
+from decimal import Decimal
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import CheckConstraint
+from sqlalchemy.types import Numeric
+
+
+class MemberTierChange(SQLModel, table=True):
+    change_id: Optional[int] = Field(default=None, primary_key=True)
+    member_id: int = Field(foreign_key="member.member_id", index=True, ondelete="CASCADE")
+    old_rank: str
+    new_rank: str
+    old_discount_rate: Decimal = Field(sa_column=Column(Numeric(5, 2)))
+    new_discount_rate: Decimal = Field(sa_column=Column(Numeric(5, 2)))
+    rolling_year_spent: Decimal = Field(sa_column=Column(Numeric(12, 2)))
+    reason: str
+    changed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        CheckConstraint("reason IN ('NIGHTLY','CHECKOUT')"),
+    )
@@ -0,0 +1,35 @@
+from typing import Optional
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+from sqlalchemy import CheckConstraint, Index, text
+
+
+class PointsLedger(SQLModel, table=True):
+    entry_id: Optional[int] = Field(default=None, primary_key=True)
+    member_id: int = Field(foreign_key="member.member_id", ondelete="CASCADE")
+    entry_type: str
+    # Signed: EARN is positive, REDEEM and EXPIRE are negative, ADJUST either way.
+    points: int
+    transaction_id: Optional[int] = Field(default=None, foreign_key="transaction.transaction_id")
+    employee_id: Optional[str] = Field(default=None, foreign_key="user.uid")
+    note: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Set once the entry is counted in the member's checkpoint.
+    folded: bool = Field(default=False)
+    __table_args__ = (
+        CheckConstraint("entry_type IN ('EARN','REDEEM','ADJUST','EXPIRE')"),
+        CheckConstraint("points <> 0"),
+        CheckConstraint("entry_type NOT IN ('REDEEM','EXPIRE') OR points < 0"),
+        CheckConstraint("entry_type <> 'EARN' OR points > 0"),
+        Index("ix_pointsledger_member_entry", "member_id", "entry_id"),
+        Index("ix_pointsledger_unfolded", "member_id", postgresql_where=text("NOT folded"), sqlite_where=text("NOT folded")),
+    )
+
+
+class PointsCheckpoint(SQLModel, table=True):
+    """A member's balance over the ledger entries marked ``folded``; unfolded entries form the tail."""
+    member_id: int = Field(foreign_key="member.member_id", primary_key=True, ondelete="CASCADE")
+    balance: int = Field(default=0)
+    # Highest entry folded so far, for reference; the ``folded`` flags decide the tail.
+    last_entry_id: int = Field(default=0)
+    checkpoint_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,7 +1,7 @@
 from typing import Optional
 from decimal import Decimal
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import CheckConstraint
+from sqlalchemy import CheckConstraint, Index, text
 from sqlalchemy.types import Numeric
 
 
@@ -20,5 +20,15 @@ class Product(SQLModel, table=True):
         CheckConstraint("selling_price >= cost_price"),
         CheckConstraint("stock_quantity >= 0"),
         CheckConstraint("min_stock > 0"),
+        Index("ix_product_name_id", "name", "product_id"),
+        Index("ix_product_category", "category"),
+        Index("ix_product_promotion_id", "promotion_id"),
+        # Partial expression index backing the low-stock alert list, ordered by shortfall.
+        Index(
+            "ix_product_low_stock",
+            text("(min_stock - stock_quantity)"),
+            postgresql_where=text("stock_quantity < min_stock"),
+            sqlite_where=text("stock_quantity < min_stock"),
+        ),
     )
 
@@ -0,0 +1,40 @@
+from typing import Optional
+from decimal import Decimal
+from datetime import date
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import CheckConstraint
+from sqlalchemy.types import Numeric
+
+
+class PromotionRule(SQLModel, table=True):
+    rule_id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    rule_type: str
+    # MULTI_BUY: buy ``buy_quantity`` of the linked products, pay for ``pay_quantity``.
+    buy_quantity: Optional[int] = None
+    pay_quantity: Optional[int] = None
+    # BUNDLE: the linked products (with their quantities) together cost ``bundle_price``.
+    bundle_price: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+    # BASKET: discount once the (linked, or whole) basket reaches ``min_basket``.
+    min_basket: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+    discount_type: Optional[str] = None
+    discount_value: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+    start_date: date
+    end_date: date
+    is_active: bool = Field(default=True)
+    __table_args__ = (
+        CheckConstraint("rule_type IN ('MULTI_BUY','BUNDLE','BASKET')"),
+        CheckConstraint("rule_type <> 'MULTI_BUY' OR (buy_quantity > pay_quantity AND pay_quantity >= 0)"),
+        CheckConstraint("rule_type <> 'BUNDLE' OR bundle_price >= 0"),
+        CheckConstraint("rule_type <> 'BASKET' OR (min_basket >= 0 AND discount_type IN ('PERCENTAGE','FIXED') AND discount_value > 0)"),
+        CheckConstraint("end_date >= start_date"),
+    )
+
+
+class PromotionRuleProduct(SQLModel, table=True):
+    rule_id: int = Field(foreign_key="promotionrule.rule_id", primary_key=True, ondelete="CASCADE")
+    product_id: int = Field(foreign_key="product.product_id", primary_key=True, index=True, ondelete="CASCADE")
+    quantity: int = Field(default=1)
+    __table_args__ = (
+        CheckConstraint("quantity > 0"),
+    )
@@ -0,0 +1,20 @@
+from typing import Optional
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import JSON, CheckConstraint
+
+
+class SimulationJob(SQLModel, table=True):
+    """A promotion simulation: run by one worker's background pool, polled through any worker."""
+    job_id: str = Field(primary_key=True)
+    scenario: dict = Field(sa_column=Column(JSON, nullable=False))
+    status: str = Field(default="queued")
+    progress: float = Field(default=0.0)
+    error: Optional[str] = None
+    # The SimulationReport, as JSON, once ``status`` is done.
+    result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+    finished_at: Optional[datetime] = None
+    __table_args__ = (
+        CheckConstraint("status IN ('queued','running','done','failed')"),
+    )
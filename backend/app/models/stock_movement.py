@@ -0,0 +1,20 @@
+from typing import Optional
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+from sqlalchemy import CheckConstraint, Index
+
+
+class StockMovement(SQLModel, table=True):
+    movement_id: Optional[int] = Field(default=None, primary_key=True)
+    # Deleting a product keeps its ledger history; the entries just lose the link.
+    product_id: Optional[int] = Field(default=None, foreign_key="product.product_id", ondelete="SET NULL")
+    quantity_change: int
+    movement_type: str
+    reference: Optional[str] = None
+    employee_id: Optional[str] = Field(default=None, foreign_key="user.uid")
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        CheckConstraint("movement_type IN ('RECEIPT','STOCKTAKE','SALE','ADJUSTMENT')"),
+        CheckConstraint("quantity_change <> 0"),
+        Index("ix_stockmovement_product_created", "product_id", "created_at"),
+    )
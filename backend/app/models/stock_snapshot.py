@@ -0,0 +1,16 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+
+
+class StockSnapshot(SQLModel, table=True):
+    snapshot_id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int = Field(foreign_key="product.product_id", ondelete="CASCADE")
+    snapshot_at: datetime
+    stock_quantity: int
+    # Highest ledger entry already reflected in stock_quantity.
+    last_movement_id: int = 0
+    __table_args__ = (
+        Index("ix_stocksnapshot_product_at", "product_id", "snapshot_at"),
+    )
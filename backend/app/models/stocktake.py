@@ -0,0 +1,28 @@
+from typing import Optional
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+from sqlalchemy import CheckConstraint
+
+
+class StockTake(SQLModel, table=True):
+    stocktake_id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="OPEN")
+    note: Optional[str] = None
+    created_by: str = Field(foreign_key="user.uid")
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    applied_at: Optional[datetime] = None
+    __table_args__ = (
+        CheckConstraint("status IN ('OPEN','APPLIED','CANCELLED')"),
+    )
+
+
+class StockTakeLine(SQLModel, table=True):
+    stocktake_id: int = Field(foreign_key="stocktake.stocktake_id", primary_key=True)
+    product_id: int = Field(foreign_key="product.product_id", primary_key=True)
+    counted_quantity: int
+    # System stock when the count was recorded; the variance is applied relative to it.
+    expected_quantity: int
+    counted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        CheckConstraint("counted_quantity >= 0"),
+    )
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+
+
+class TokenRevocation(SQLModel, table=True):
+    """Tokens issued to ``uid`` before ``revoked_at`` are no longer accepted."""
+    uid: str = Field(foreign_key="user.uid", primary_key=True, ondelete="CASCADE")
+    revoked_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,10 +1,13 @@
-from typing import Optional
+from typing import List, Optional, TYPE_CHECKING
 from decimal import Decimal
 from datetime import datetime, timezone
-from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import CheckConstraint
+from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlalchemy import CheckConstraint, Index
 from sqlalchemy.types import Numeric
 
+if TYPE_CHECKING:
+    from .transaction_item import TransactionItem
+
 
 class Transaction(SQLModel, table=True):
     transaction_id: Optional[int] = Field(default=None, primary_key=True)
@@ -16,6 +19,7 @@ class Transaction(SQLModel, table=True):
     membership_discount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(10, 2)))
     total_amount: Decimal = Field(sa_column=Column(Numeric(10, 2)))
     payment_method: str
+    items: List["TransactionItem"] = Relationship(back_populates="transaction")
     __table_args__ = (
         CheckConstraint("subtotal >= 0"),
         CheckConstraint("product_discount >= 0"),
@@ -23,4 +27,14 @@ class Transaction(SQLModel, table=True):
         CheckConstraint("total_amount >= 0"),
         CheckConstraint("payment_method IN ('Cash','Card','QR Code')"),
         CheckConstraint("total_amount = subtotal - membership_discount"),
+        # BRIN on Postgres: rows arrive in date order, so a tiny block-range index serves
+        # the date-window scans behind the analytics endpoints.
+        Index("ix_transaction_date", "transaction_date", postgresql_using="brin"),
+        Index("ix_transaction_employee_id", "employee_id"),
+        # Covers member purchase history pages without touching the heap on Postgres.
+        Index(
+            "ix_transaction_member_date",
+            "member_id", "transaction_date", "transaction_id",
+            postgresql_include=["total_amount", "payment_method"],
+        ),
     )
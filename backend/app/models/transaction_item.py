@@ -1,8 +1,13 @@
+from typing import Optional, TYPE_CHECKING
 from decimal import Decimal
-from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import CheckConstraint
+from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlalchemy import CheckConstraint, Index
 from sqlalchemy.types import Numeric
 
+if TYPE_CHECKING:
+    from .transaction import Transaction
+    from .product import Product
+
 
 class TransactionItem(SQLModel, table=True):
     transaction_id: int = Field(foreign_key="transaction.transaction_id", primary_key=True)
@@ -11,11 +16,14 @@ class TransactionItem(SQLModel, table=True):
     unit_price: Decimal = Field(sa_column=Column(Numeric(10, 2)))
     discount_amount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(10, 2)))
     line_total: Decimal = Field(sa_column=Column(Numeric(10, 2)))
+    transaction: Optional["Transaction"] = Relationship(back_populates="items")
+    product: Optional["Product"] = Relationship()
     __table_args__ = (
         CheckConstraint("quantity > 0"),
         CheckConstraint("unit_price >= 0"),
         CheckConstraint("discount_amount >= 0"),
         CheckConstraint("line_total >= 0"),
         CheckConstraint("line_total = (quantity * unit_price) - discount_amount"),
+        # The primary key leads with transaction_id; per-product sales need their own index.
+        Index("ix_transactionitem_product_id", "product_id"),
     )
-
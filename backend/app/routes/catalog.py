@@ -0,0 +1,130 @@
+import gzip
+import json
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
+from sqlmodel import Session, select
+from sqlalchemy import func
+from ..db import get_session
+from ..models.catalog_change_log import CatalogChangeLog
+from ..models.product import Product
+from ..models.promotion import Promotion
+from ..utils.cache import LRUCache
+from ..utils.catalog import DELTA_OVERLAP, current_version
+from ..utils.jwt import Principal, get_principal
+from ..utils.sql import chunked
+
+
+router = APIRouter(prefix="/api/catalog", tags=["catalog"])
+
+
+_snapshot_cache = LRUCache(maxsize=4, name="catalog_snapshot")
+
+
+class CatalogProduct(BaseModel):
+    product_id: int
+    barcode: str
+    name: str
+    brand: str | None
+    category: str | None
+    selling_price: Decimal
+    promotion_id: int | None
+
+
+class CatalogPromotion(BaseModel):
+    promotion_id: int
+    promotion_name: str
+    discount_type: str
+    discount_value: Decimal
+    start_date: str
+    end_date: str
+    is_active: bool
+
+
+class CatalogDelta(BaseModel):
+    version: int
+    full_resync: bool = False
+    products: list[CatalogProduct] = []
+    promotions: list[CatalogPromotion] = []
+    deleted_products: list[int] = []
+    deleted_promotions: list[int] = []
+
+
+def _product_out(p: Product) -> CatalogProduct:
+    return CatalogProduct(product_id=p.product_id, barcode=p.barcode, name=p.name, brand=p.brand, category=p.category, selling_price=p.selling_price, promotion_id=p.promotion_id)
+
+
+def _promotion_out(p: Promotion) -> CatalogPromotion:
+    return CatalogPromotion(promotion_id=p.promotion_id, promotion_name=p.promotion_name, discount_type=p.discount_type, discount_value=p.discount_value, start_date=p.start_date.isoformat(), end_date=p.end_date.isoformat(), is_active=p.is_active)
+
+
+def _require_staff(user: Principal) -> None:
+    if user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+def _load_in_chunks(session: Session, model, key, ids: list[int]) -> list:
+    rows = []
+    for chunk in chunked(ids):
+        rows.extend(session.exec(select(model).where(key.in_(chunk))).all())
+    return rows
+
+
+@router.get("/snapshot")
+def get_catalog_snapshot(request: Request, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Full POS catalog (products and promotions) as gzip-compressed JSON with an ETag."""
+    _require_staff(current_user)
+    version = current_version(session)
+    etag = f'"catalog-{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    key = (id(session.get_bind()), version)
+    body = _snapshot_cache.get(key)
+    if body is None:
+        products = session.exec(select(Product).order_by(Product.product_id)).all()
+        promotions = session.exec(select(Promotion).order_by(Promotion.promotion_id)).all()
+        payload = {
+            "version": version,
+            "products": [_product_out(p).model_dump(mode="json") for p in products],
+            "promotions": [_promotion_out(p).model_dump(mode="json") for p in promotions],
+        }
+        body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        _snapshot_cache.set(key, body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(body), media_type="application/json", headers=headers)
+
+
+@router.get("/changes", response_model=CatalogDelta)
+def get_catalog_changes(since: int = Query(ge=0), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Products and promotions changed or deleted after catalog version ``since``."""
+    _require_staff(current_user)
+    version = current_version(session)
+    if since >= version:
+        return CatalogDelta(version=version)
+    oldest = session.exec(select(func.min(CatalogChangeLog.version))).one()
+    if oldest is not None and since < oldest - 1:
+        return CatalogDelta(version=version, full_resync=True)
+    rows = session.exec(
+        select(CatalogChangeLog.entity, CatalogChangeLog.entity_id)
+        .where(CatalogChangeLog.version > max(since - DELTA_OVERLAP, 0), CatalogChangeLog.version <= version, CatalogChangeLog.entity.in_(("product", "promotion")))
+        .distinct()
+    ).all()
+    if any(entity_id is None for _, entity_id in rows):
+        return CatalogDelta(version=version, full_resync=True)
+    product_ids = sorted({eid for entity, eid in rows if entity == "product"})
+    promotion_ids = sorted({eid for entity, eid in rows if entity == "promotion"})
+    products = _load_in_chunks(session, Product, Product.product_id, product_ids)
+    promotions = _load_in_chunks(session, Promotion, Promotion.promotion_id, promotion_ids)
+    found_products = {p.product_id for p in products}
+    found_promotions = {p.promotion_id for p in promotions}
+    return CatalogDelta(
+        version=version,
+        products=[_product_out(p) for p in products],
+        promotions=[_promotion_out(p) for p in promotions],
+        deleted_products=[i for i in product_ids if i not in found_products],
+        deleted_promotions=[i for i in promotion_ids if i not in found_promotions],
+    )
+
@@ -0,0 +1,254 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field, conint
+from sqlalchemy import case, func, update
+from sqlmodel import Session, select
+from ..db import get_session
+from ..handlers.inventory_handler import apply_stock_deltas, current_stock, resolve_product_ids, stock_at, take_stock_snapshot
+from ..models.stock_movement import StockMovement
+from ..models.stocktake import StockTake, StockTakeLine
+from ..utils.jwt import Principal, get_principal
+from ..utils.sql import dialect_insert
+
+
+router = APIRouter(prefix="/api/inventory", tags=["inventory"])
+
+MAX_LINES = 10000
+MAX_STOCK_AT_IDS = 500
+
+
+class ReceiptLine(BaseModel):
+    product_id: int | None = None
+    barcode: str | None = None
+    quantity: conint(gt=0)
+
+
+class GoodsReceiptInput(BaseModel):
+    reference: str | None = None
+    items: list[ReceiptLine] = Field(min_length=1, max_length=MAX_LINES)
+
+
+class GoodsReceiptResult(BaseModel):
+    reference: str | None
+    product_count: int
+    total_units: int
+
+
+class CountLine(BaseModel):
+    product_id: int | None = None
+    barcode: str | None = None
+    counted_quantity: conint(ge=0)
+
+
+class StockTakeCountsInput(BaseModel):
+    items: list[CountLine] = Field(min_length=1, max_length=MAX_LINES)
+
+
+class StockTakeCreate(BaseModel):
+    note: str | None = None
+
+
+class StockTakeSummary(BaseModel):
+    stocktake_id: int
+    status: str
+    note: str | None
+    created_at: datetime
+    applied_at: datetime | None
+    counted_products: int
+    net_variance: int
+    products_with_variance: int
+
+
+class StockAtItem(BaseModel):
+    product_id: int
+    stock_quantity: int
+
+
+class SnapshotResult(BaseModel):
+    products: int
+
+
+def _require_staff(user: Principal) -> None:
+    if user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+def _require_manager(user: Principal) -> None:
+    if user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+def _get_stocktake(session: Session, stocktake_id: int, lock: bool = False) -> StockTake:
+    stmt = select(StockTake).where(StockTake.stocktake_id == stocktake_id)
+    if lock:
+        stmt = stmt.with_for_update()
+    st = session.exec(stmt).first()
+    if not st:
+        raise HTTPException(status_code=404, detail="Stocktake not found")
+    return st
+
+
+def _close_stocktake(session: Session, stocktake_id: int, new_status: str, **values) -> None:
+    """Move an OPEN stocktake to ``new_status``; of concurrent callers, only one gets past this."""
+    table = StockTake.__table__
+    result = session.execute(
+        update(table)
+        .where(table.c.stocktake_id == stocktake_id, table.c.status == "OPEN")
+        .values(status=new_status, **values)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stocktake is not open")
+
+
+def _summary(session: Session, st: StockTake) -> StockTakeSummary:
+    variance = StockTakeLine.counted_quantity - StockTakeLine.expected_quantity
+    counted, net, with_variance = session.exec(
+        select(
+            func.count(StockTakeLine.product_id),
+            func.coalesce(func.sum(variance), 0),
+            func.coalesce(func.sum(case((variance != 0, 1), else_=0)), 0),
+        ).where(StockTakeLine.stocktake_id == st.stocktake_id)
+    ).one()
+    return StockTakeSummary(
+        stocktake_id=st.stocktake_id,
+        status=st.status,
+        note=st.note,
+        created_at=st.created_at,
+        applied_at=st.applied_at,
+        counted_products=int(counted),
+        net_variance=int(net),
+        products_with_variance=int(with_variance),
+    )
+
+
+@router.post("/receipts", response_model=GoodsReceiptResult, status_code=status.HTTP_201_CREATED)
+def receive_goods(data: GoodsReceiptInput, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Add received quantities to stock in one transaction, recording a movement per product."""
+    _require_staff(current_user)
+    product_ids = resolve_product_ids(session, [i.product_id for i in data.items], [i.barcode for i in data.items])
+    deltas: dict[int, int] = {}
+    for pid, item in zip(product_ids, data.items):
+        deltas[pid] = deltas.get(pid, 0) + item.quantity
+    apply_stock_deltas(session, deltas, "RECEIPT", reference=data.reference, employee_id=current_user.uid)
+    session.commit()
+    return GoodsReceiptResult(reference=data.reference, product_count=len(deltas), total_units=sum(deltas.values()))
+
+
+@router.post("/stocktakes", response_model=StockTakeSummary, status_code=status.HTTP_201_CREATED)
+def open_stocktake(data: StockTakeCreate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Open a stocktake session that counts can be submitted to in batches."""
+    _require_manager(current_user)
+    st = StockTake(note=data.note, created_by=current_user.uid)
+    session.add(st)
+    session.commit()
+    session.refresh(st)
+    return _summary(session, st)
+
+
+@router.get("/stocktakes/{stocktake_id}", response_model=StockTakeSummary)
+def get_stocktake(stocktake_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    _require_staff(current_user)
+    return _summary(session, _get_stocktake(session, stocktake_id))
+
+
+@router.post("/stocktakes/{stocktake_id}/counts", response_model=StockTakeSummary)
+def submit_counts(stocktake_id: int, data: StockTakeCountsInput, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Record counted quantities; each count remembers the system stock at the time it was taken.
+
+    Re-counting a product replaces its previous count.
+    """
+    _require_staff(current_user)
+    # Locked so counts cannot land after a concurrent apply has read the lines.
+    st = _get_stocktake(session, stocktake_id, lock=True)
+    if st.status != "OPEN":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stocktake is not open")
+    product_ids = resolve_product_ids(session, [i.product_id for i in data.items], [i.barcode for i in data.items])
+    counts = dict(zip(product_ids, (i.counted_quantity for i in data.items)))
+    expected = current_stock(session, list(counts))
+    now = datetime.now(timezone.utc)
+    insert = dialect_insert(session)
+    stmt = insert(StockTakeLine.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["stocktake_id", "product_id"],
+        set_={col: stmt.excluded[col] for col in ("counted_quantity", "expected_quantity", "counted_at")},
+    )
+    session.execute(stmt, [
+        {"stocktake_id": stocktake_id, "product_id": pid, "counted_quantity": qty, "expected_quantity": expected[pid], "counted_at": now}
+        for pid, qty in counts.items()
+    ])
+    session.commit()
+    return _summary(session, st)
+
+
+@router.post("/stocktakes/{stocktake_id}/apply", response_model=StockTakeSummary)
+def apply_stocktake(stocktake_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Apply count variances as relative stock adjustments in one transaction (manager only).
+
+    Sales made after a product was counted are preserved because only the difference
+    between the count and the stock at count time is applied.
+    """
+    _require_manager(current_user)
+    st = _get_stocktake(session, stocktake_id)
+    # Claim the stocktake before touching stock, so a concurrent apply or cancel loses cleanly.
+    _close_stocktake(session, stocktake_id, "APPLIED", applied_at=datetime.now(timezone.utc))
+    variance = StockTakeLine.counted_quantity - StockTakeLine.expected_quantity
+    variances = dict(session.exec(
+        select(StockTakeLine.product_id, variance).where(StockTakeLine.stocktake_id == stocktake_id, variance != 0)
+    ).all())
+    stock = current_stock(session, list(variances), lock=True)
+    # A variance larger than the remaining stock can only clamp to zero.
+    deltas = {pid: max(stock[pid] + v, 0) - stock[pid] for pid, v in variances.items() if pid in stock}
+    apply_stock_deltas(session, deltas, "STOCKTAKE", reference=f"stocktake:{stocktake_id}", employee_id=current_user.uid)
+    session.commit()
+    session.refresh(st)
+    return _summary(session, st)
+
+
+@router.post("/stocktakes/{stocktake_id}/cancel", response_model=StockTakeSummary)
+def cancel_stocktake(stocktake_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    _require_manager(current_user)
+    st = _get_stocktake(session, stocktake_id)
+    _close_stocktake(session, stocktake_id, "CANCELLED")
+    session.commit()
+    session.refresh(st)
+    return _summary(session, st)
+
+
+@router.get("/movements", response_model=list[StockMovement])
+def list_movements(
+    product_id: int | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    before: int | None = Query(default=None, description="Return movements older than this movement_id"),
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_principal),
+):
+    """Stock ledger, newest first, optionally for one product (manager only)."""
+    _require_manager(current_user)
+    stmt = select(StockMovement)
+    if product_id is not None:
+        stmt = stmt.where(StockMovement.product_id == product_id)
+    if before is not None:
+        stmt = stmt.where(StockMovement.movement_id < before)
+    return session.exec(stmt.order_by(StockMovement.movement_id.desc()).limit(limit)).all()
+
+
+@router.get("/stock-at", response_model=list[StockAtItem])
+def get_stock_at(
+    at: datetime,
+    product_ids: list[int] = Query(..., max_length=MAX_STOCK_AT_IDS),
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_principal),
+):
+    """Stock on hand at a point in time, from the nearest snapshot plus the ledger (manager only)."""
+    _require_manager(current_user)
+    at = at.replace(tzinfo=timezone.utc) if at.tzinfo is None else at.astimezone(timezone.utc)
+    ids = resolve_product_ids(session, product_ids, [None] * len(product_ids))
+    stock = stock_at(session, ids, at)
+    return [StockAtItem(product_id=pid, stock_quantity=stock[pid]) for pid in dict.fromkeys(ids)]
+
+
+@router.post("/snapshots", response_model=SnapshotResult)
+def create_snapshot(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Snapshot stock now instead of waiting for the scheduled run (manager only)."""
+    _require_manager(current_user)
+    return SnapshotResult(products=take_stock_snapshot(session))
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlmodel import Session, select
-from pydantic import BaseModel
+from sqlalchemy import and_, or_
+from pydantic import BaseModel, Field
 from decimal import Decimal
-from datetime import date, datetime, timedelta, timezone
-from sqlalchemy import func
+from datetime import date, datetime
 from ..db import get_session
-from ..utils.jwt import get_current_user
-from ..models.user import User
+from ..utils.jwt import Principal, get_principal
 from ..models.member import Member
+from ..models.member_spend import MemberSpend
+from ..models.member_tier_change import MemberTierChange
+from ..handlers.member_spend_handler import as_utc, window_spend, window_start
+from ..handlers.member_tier_handler import recalculate_member_tiers
+from ..handlers.points_handler import points_balances, post_points
+from ..models.points_ledger import PointsLedger
+from ..models.member_stats import MemberStats
 from ..models.transaction import Transaction
-from ..models.membership_tier import MembershipTier
+from .transactions import TransactionItemDetail, load_transaction_details
+from ..utils.tiers import load_tiers, resolve_tier
+from ..utils.member_lookup import LOOKUP_LIMIT, lookup_members
 
 router = APIRouter(prefix="/api/members", tags=["members"])
 
@@ -32,8 +40,61 @@ class MemberSummary(BaseModel):
     current_discount_rate: Decimal
 
 
+class MemberLookupItem(BaseModel):
+    member_id: int
+    name: str
+    phone: str
+    membership_rank: str
+    discount_rate: Decimal
+
+
+class TierRecalculation(BaseModel):
+    changed: int
+
+
+class PointsRedeem(BaseModel):
+    points: int = Field(gt=0)
+    note: str | None = None
+
+
+class PointsAdjust(BaseModel):
+    points: int
+    note: str = Field(min_length=1)
+
+
+class MemberProfile(BaseModel):
+    member_id: int
+    name: str
+    phone: str
+    membership_rank: str
+    discount_rate: Decimal
+    registration_date: date
+    points_balance: int
+    rolling_year_spent: Decimal
+    visit_count: int
+    lifetime_spent: Decimal
+    average_basket: Decimal
+    first_visit: datetime | None
+    last_visit: datetime | None
+
+
+class MemberTransaction(BaseModel):
+    transaction_id: int
+    transaction_date: datetime
+    total_amount: Decimal
+    payment_method: str
+    # Present only with ``expand=items``.
+    items: list[TransactionItemDetail] | None = None
+
+
+class PointsStatement(BaseModel):
+    member_id: int
+    balance: int
+    entries: list[PointsLedger]
+
+
 @router.post("", response_model=Member, status_code=status.HTTP_201_CREATED)
-def create_member(data: MemberCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def create_member(data: MemberCreate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     if current_user.role not in ("manager", "cashier"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     name = (data.name or "").strip()
@@ -52,38 +113,61 @@ def create_member(data: MemberCreate, session: Session = Depends(get_session), c
     return m
 
 
+@router.get("/lookup", response_model=list[MemberLookupItem])
+def lookup_member(q: str = Query(min_length=1, max_length=100), limit: int = Query(default=LOOKUP_LIMIT, ge=1, le=50), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Identify a member at the lane by full phone, phone prefix/suffix (3+ digits) or name prefix."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return [MemberLookupItem(member_id=m.member_id, name=m.name, phone=m.phone, membership_rank=m.membership_rank, discount_rate=m.discount_rate) for m in lookup_members(session, q, limit)]
+
+
 @router.get("", response_model=list[MemberSummary])
-def list_members(q: str | None = Query(default=None), session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def list_members(
+    response: Response,
+    q: str | None = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=500),
+    after: int | None = Query(default=None, description="Cursor from the X-Next-Cursor header"),
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_principal),
+):
+    """List members a page at a time with their rolling-year spend and current tier.
+
+    Spend is read from the maintained ``MemberSpend`` table. Rows on the page whose oldest
+    counted transaction has aged out of the window are summed from transactions for the
+    response and left for the nightly ``expire_member_spend`` to rewrite.
+    A ``q`` made of digits matches phone prefixes, anything else matches names.
+    Managers and cashiers; checkout lanes should prefer the lighter ``/lookup``.
+    """
     if current_user.role not in ("manager", "cashier"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
-    stmt = select(Member)
-    if q:
-        pattern = f"%{q}%"
-        stmt = stmt.where((Member.name.ilike(pattern)) | (Member.phone.ilike(pattern)))
-    members = session.exec(stmt).all()
-    threshold = datetime.now(timezone.utc) - timedelta(days=365)
-    agg_stmt = select(Transaction.member_id, func.coalesce(func.sum(Transaction.total_amount), 0)).where(Transaction.transaction_date >= threshold).group_by(Transaction.member_id)
-    agg_rows = session.exec(agg_stmt).all()
-    spent_map: dict[int, Decimal] = {}
-    for mid, s in agg_rows:
-        if mid is not None:
-            spent_map[int(mid)] = Decimal(str(s))
-    tiers = session.exec(select(MembershipTier)).all()
-    tiers_sorted = sorted(tiers, key=lambda t: t.min_spent)
+    stmt = select(Member, MemberSpend.rolling_year_spent, MemberSpend.oldest_counted).outerjoin(MemberSpend, MemberSpend.member_id == Member.member_id)
+    if q and q.strip():
+        q = q.strip()
+        if q.isdigit():
+            stmt = stmt.where(Member.phone.startswith(q, autoescape=True))
+        else:
+            stmt = stmt.where(Member.name.ilike(f"%{q}%"))
+    if after is not None:
+        stmt = stmt.where(Member.member_id > after)
+    rows = session.exec(stmt.order_by(Member.member_id).limit(limit)).all()
+
+    cutoff = window_start()
+    stale = [m.member_id for m, _, oldest in rows if oldest is not None and as_utc(oldest) < cutoff]
+    spent_map = {m.member_id: Decimal(str(spent or 0)) for m, spent, _ in rows}
+    if stale:
+        spent_map.update(window_spend(session, stale))
+
+    tiers = load_tiers(session)
+    balances = points_balances(session, [m.member_id for m, _, _ in rows])
     out: list[MemberSummary] = []
-    for m in members:
-        rs = spent_map.get(m.member_id or 0, Decimal("0.00"))
-        current = None
-        for t in tiers_sorted:
-            if rs >= t.min_spent and (t.max_spent is None or rs <= t.max_spent):
-                current = t
-        if current is None and tiers_sorted:
-            current = tiers_sorted[0]
+    for m, _, _ in rows:
+        rs = Decimal(str(spent_map[m.member_id]))
+        current = resolve_tier(tiers, rs)
         out.append(MemberSummary(
             member_id=m.member_id or 0,
             name=m.name,
             phone=m.phone,
-            points_balance=m.points_balance,
+            points_balance=balances.get(m.member_id, 0),
             membership_rank=m.membership_rank,
             discount_rate=m.discount_rate,
             registration_date=m.registration_date,
@@ -91,4 +175,145 @@ def list_members(q: str | None = Query(default=None), session: Session = Depends
             current_tier=current.rank_name if current else m.membership_rank,
             current_discount_rate=current.discount_rate if current else m.discount_rate,
         ))
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0].member_id)
+    return out
+
+
+@router.post("/tiers/recalculate", response_model=TierRecalculation)
+def recalculate_tiers(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Run the nightly tier recalculation now (Manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return TierRecalculation(changed=recalculate_member_tiers(session))
+
+
+@router.get("/tier-changes", response_model=list[MemberTierChange])
+def list_tier_changes(
+    member_id: int | None = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=500),
+    before: int | None = Query(default=None, description="change_id to continue from"),
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_principal),
+):
+    """Tier changes, newest first (Manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    stmt = select(MemberTierChange)
+    if member_id is not None:
+        stmt = stmt.where(MemberTierChange.member_id == member_id)
+    if before is not None:
+        stmt = stmt.where(MemberTierChange.change_id < before)
+    return session.exec(stmt.order_by(MemberTierChange.change_id.desc()).limit(limit)).all()
+
+
+@router.get("/{member_id}/points", response_model=PointsStatement)
+def points_statement(
+    member_id: int,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=500),
+    before: int | None = Query(default=None, description="Cursor from the X-Next-Cursor header"),
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_principal),
+):
+    """A member's points balance and ledger entries, newest first."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    if session.get(Member, member_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Member not found")
+    stmt = select(PointsLedger).where(PointsLedger.member_id == member_id)
+    if before is not None:
+        stmt = stmt.where(PointsLedger.entry_id < before)
+    entries = session.exec(stmt.order_by(PointsLedger.entry_id.desc()).limit(limit)).all()
+    if len(entries) == limit:
+        response.headers["X-Next-Cursor"] = str(entries[-1].entry_id)
+    return PointsStatement(member_id=member_id, balance=points_balances(session, [member_id])[member_id], entries=entries)
+
+
+@router.post("/{member_id}/points/redeem", response_model=PointsLedger, status_code=status.HTTP_201_CREATED)
+def redeem_points(member_id: int, data: PointsRedeem, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Redeem points from a member's balance."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    entry = post_points(session, member_id, "REDEEM", -data.points, employee_id=current_user.uid, note=data.note)
+    session.commit()
+    session.refresh(entry)
+    return entry
+
+
+@router.post("/{member_id}/points/adjust", response_model=PointsLedger, status_code=status.HTTP_201_CREATED)
+def adjust_points(member_id: int, data: PointsAdjust, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Credit or debit points with a reason (Manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    entry = post_points(session, member_id, "ADJUST", data.points, employee_id=current_user.uid, note=data.note)
+    session.commit()
+    session.refresh(entry)
+    return entry
+
+
+@router.get("/{member_id}", response_model=MemberProfile)
+def get_member(member_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Member profile with lifetime stats, read from maintained summary rows."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    row = session.exec(
+        select(Member, MemberStats, MemberSpend.rolling_year_spent)
+        .outerjoin(MemberStats, MemberStats.member_id == Member.member_id)
+        .outerjoin(MemberSpend, MemberSpend.member_id == Member.member_id)
+        .where(Member.member_id == member_id)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Member not found")
+    m, stats, rolling = row
+    visits = stats.visit_count if stats else 0
+    lifetime = Decimal(str(stats.lifetime_spent)) if stats else Decimal("0.00")
+    return MemberProfile(
+        member_id=m.member_id,
+        name=m.name,
+        phone=m.phone,
+        membership_rank=m.membership_rank,
+        discount_rate=m.discount_rate,
+        registration_date=m.registration_date,
+        points_balance=points_balances(session, [member_id])[member_id],
+        rolling_year_spent=Decimal(str(rolling or 0)).quantize(Decimal("0.01")),
+        visit_count=visits,
+        lifetime_spent=lifetime.quantize(Decimal("0.01")),
+        average_basket=(lifetime / visits if visits else Decimal("0")).quantize(Decimal("0.01")),
+        first_visit=stats.first_visit if stats else None,
+        last_visit=stats.last_visit if stats else None,
+    )
+
+
+@router.get("/{member_id}/transactions", response_model=list[MemberTransaction])
+def member_transactions(
+    member_id: int,
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    before: int | None = Query(default=None, description="Cursor from the X-Next-Cursor header"),
+    expand: str | None = Query(default=None, pattern="^items$"),
+    session: Session = Depends(get_session),
+    current_user: Principal = Depends(get_principal),
+):
+    """A member's purchases, newest first, a page at a time.
+
+    Pages are read from the (member_id, transaction_date) index; ``expand=items`` adds the
+    line items in a fixed number of extra queries.
+    """
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    stmt = select(Transaction.transaction_id, Transaction.transaction_date, Transaction.total_amount, Transaction.payment_method).where(Transaction.member_id == member_id)
+    if before is not None:
+        anchor = session.exec(select(Transaction.transaction_date).where(Transaction.transaction_id == before, Transaction.member_id == member_id)).first()
+        if anchor is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        stmt = stmt.where(or_(Transaction.transaction_date < anchor, and_(Transaction.transaction_date == anchor, Transaction.transaction_id < before)))
+    rows = session.exec(stmt.order_by(Transaction.transaction_date.desc(), Transaction.transaction_id.desc()).limit(limit)).all()
+    out = [MemberTransaction(transaction_id=tid, transaction_date=tdate, total_amount=total, payment_method=method) for tid, tdate, total, method in rows]
+    if expand == "items" and out:
+        items = {d.transaction_id: d.items for d in load_transaction_details(session, [t.transaction_id for t in out])}
+        for t in out:
+            t.items = items.get(t.transaction_id, [])
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0])
     return out
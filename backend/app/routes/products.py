@@ -1,38 +1,235 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import base64
+import json
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from pydantic import BaseModel
-from decimal import Decimal
-from sqlalchemy import or_
+from pydantic import BaseModel, ConfigDict, Field
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import case, func, tuple_
 from ..db import get_session
 from ..models.product import Product
 from ..models.promotion import Promotion
-from ..utils.jwt import get_current_user
-from ..models.user import User
+from ..utils.jwt import Principal, get_principal
+from ..utils.catalog import catalog_changed
+from ..utils.product_search import search_products
+from ..utils.barcode_index import barcode_index
+from ..utils.suggest_index import suggest_index
+from ..handlers.product_import_handler import ImportReport, import_products_csv, iter_text_lines
+from ..handlers.inventory_handler import apply_stock_deltas, current_stock, record_movements
+from ..handlers.bulk_product_handler import BulkResult, PromotionAssignInput, RepriceInput, assign_promotion, reprice_products
 
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
 
-@router.get("", response_model=list[Product])
-def list_products(q: str | None = Query(default=None), barcode: str | None = Query(default=None), session: Session = Depends(get_session)):
-    """List products by optional search or exact barcode match."""
+class ProductRead(BaseModel):
+    """Product as listed; only the requested fields are present when ``fields=`` is used."""
+    model_config = ConfigDict(from_attributes=True)
+    product_id: int | None = None
+    barcode: str | None = None
+    name: str | None = None
+    brand: str | None = None
+    category: str | None = None
+    cost_price: Decimal | None = None
+    selling_price: Decimal | None = None
+    stock_quantity: int | None = None
+    min_stock: int | None = None
+    promotion_id: int | None = None
+
+
+PRODUCT_FIELDS = tuple(ProductRead.model_fields)
+# Keyset sorts are limited to non-null columns so (value, product_id) is a total order.
+SORTABLE_FIELDS = ("product_id", "name", "barcode", "selling_price", "stock_quantity")
+
+
+def _parse_fields(fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ["product_id"] + [f for f in dict.fromkeys(requested) if f != "product_id"]
+
+
+def _encode_cursor(value, product_id: int) -> str:
+    raw = json.dumps([str(value) if isinstance(value, Decimal) else value, product_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_field: str) -> tuple:
+    try:
+        value, product_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if sort_field == "selling_price":
+            value = Decimal(value)
+        return value, int(product_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _project(products: list[Product], columns: list[str] | None) -> list[ProductRead]:
+    if columns is None:
+        return [ProductRead.model_validate(p) for p in products]
+    return [ProductRead(**{c: getattr(p, c) for c in columns}) for p in products]
+
+
+@router.get("", response_model=list[ProductRead], response_model_exclude_unset=True)
+def list_products(
+    response: Response,
+    q: str | None = Query(default=None),
+    barcode: str | None = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=500),
+    sort: str = Query(default="product_id", description="Sort field, prefix with - for descending"),
+    after: str | None = Query(default=None, description="Cursor from the X-Next-Cursor header"),
+    fields: str | None = Query(default=None, description="Comma-separated fields to return"),
+    session: Session = Depends(get_session),
+):
+    """List products by optional search or exact barcode match, or page through the catalog.
+
+    Catalog pages use keyset pagination: pass the ``X-Next-Cursor`` response header back as
+    ``after`` to fetch the next page. ``fields`` selects only the named columns in SQL.
+    """
+    columns = _parse_fields(fields)
     if barcode:
         prod = session.exec(select(Product).where(Product.barcode == barcode)).first()
         if not prod:
             raise HTTPException(status_code=404, detail="Product not found")
-        return [prod]
-    if q:
-        pattern = f"%{q}%"
-        stmt = select(Product).where(
-            or_(
-                Product.name.ilike(pattern),
-                Product.brand.ilike(pattern),
-                Product.category.ilike(pattern),
-                Product.barcode.ilike(pattern),
-            )
-        ).limit(50)
-        return session.exec(stmt).all()
-    return session.exec(select(Product).limit(50)).all()
+        return _project([prod], columns)
+    if q and q.strip():
+        return _project(search_products(session, q, limit), columns)
+
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    if sort_field not in SORTABLE_FIELDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Sort must be one of: {', '.join(SORTABLE_FIELDS)}")
+    sort_col = getattr(Product, sort_field)
+    selected = columns if columns is not None else list(PRODUCT_FIELDS)
+    query_cols = list(dict.fromkeys(selected + [sort_field]))
+    stmt = select(*[getattr(Product, c) for c in query_cols])
+    if after:
+        value, last_id = _decode_cursor(after, sort_field)
+        key = tuple_(sort_col, Product.product_id)
+        stmt = stmt.where(key < tuple_(value, last_id) if descending else key > tuple_(value, last_id))
+    if descending:
+        stmt = stmt.order_by(sort_col.desc(), Product.product_id.desc())
+    else:
+        stmt = stmt.order_by(sort_col, Product.product_id)
+    rows = session.execute(stmt.limit(limit)).mappings().all()
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last[sort_field], last["product_id"])
+    return [ProductRead(**{c: row[c] for c in selected}) for row in rows]
+
+
+class ProductSuggestion(BaseModel):
+    product_id: int
+    name: str
+    brand: str | None
+
+
+@router.get("/suggest", response_model=list[ProductSuggestion])
+def suggest_products(q: str = Query(min_length=1, max_length=64), limit: int = Query(default=10, ge=1, le=50), session: Session = Depends(get_session)):
+    """Type-ahead suggestions by name, word, brand or barcode prefix from the in-memory index."""
+    return [ProductSuggestion(product_id=pid, name=name, brand=brand) for pid, name, brand in suggest_index.suggest(session, q, limit)]
+
+
+class LowStockItem(BaseModel):
+    product_id: int
+    barcode: str
+    name: str
+    brand: str | None
+    category: str | None
+    stock_quantity: int
+    min_stock: int
+    shortfall: int
+
+
+class LowStockPage(BaseModel):
+    total: int
+    out_of_stock: int
+    limit: int
+    offset: int
+    items: list[LowStockItem]
+
+
+@router.get("/low-stock", response_model=LowStockPage)
+def list_low_stock(limit: int = Query(default=50, ge=1, le=500), offset: int = Query(default=0, ge=0), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Products below their minimum stock, largest shortfall first, with totals."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    # Predicate and sort expression match ix_product_low_stock so both come from the index.
+    is_low = Product.stock_quantity < Product.min_stock
+    shortfall = Product.min_stock - Product.stock_quantity
+    total, out_of_stock = session.exec(
+        select(func.count(), func.coalesce(func.sum(case((Product.stock_quantity <= 0, 1), else_=0)), 0)).select_from(Product).where(is_low)
+    ).one()
+    rows = session.exec(
+        select(Product.product_id, Product.barcode, Product.name, Product.brand, Product.category, Product.stock_quantity, Product.min_stock, shortfall.label("shortfall"))
+        .where(is_low)
+        .order_by(shortfall.desc(), Product.product_id)
+        .offset(offset)
+        .limit(limit)
+    ).all()
+    return LowStockPage(
+        total=int(total),
+        out_of_stock=int(out_of_stock),
+        limit=limit,
+        offset=offset,
+        items=[LowStockItem(**row._mapping) for row in rows],
+    )
+
+
+class ScanRequest(BaseModel):
+    barcodes: list[str] = Field(min_length=1, max_length=500)
+
+
+class ScanItem(BaseModel):
+    product_id: int
+    barcode: str
+    name: str
+    selling_price: Decimal
+    stock_quantity: int
+    promotion_id: int | None = None
+    promotion_name: str | None = None
+    discount_type: str | None = None
+    discount_value: Decimal | None = None
+    final_unit_price: Decimal
+
+
+class ScanResponse(BaseModel):
+    items: list[ScanItem]
+    not_found: list[str]
+
+
+def _final_unit_price(price: Decimal, discount_type: str | None, discount_value: Decimal | None) -> Decimal:
+    if discount_type == "PERCENTAGE":
+        price = price - price * discount_value / Decimal("100")
+    elif discount_type == "FIXED":
+        price = price - discount_value
+    return max(price, Decimal("0.00")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+@router.post("/scan", response_model=ScanResponse)
+def scan_barcodes(data: ScanRequest, session: Session = Depends(get_session)):
+    """Resolve barcodes to price, stock and active promotion from the in-memory index."""
+    found, missing = barcode_index.lookup_many(session, data.barcodes)
+    items = [
+        ScanItem(
+            product_id=r.product_id,
+            barcode=r.barcode,
+            name=r.name,
+            selling_price=r.selling_price,
+            stock_quantity=r.stock_quantity,
+            promotion_id=r.promotion_id,
+            promotion_name=r.promotion_name,
+            discount_type=r.discount_type,
+            discount_value=r.discount_value,
+            final_unit_price=_final_unit_price(r.selling_price, r.discount_type, r.discount_value),
+        )
+        for r in found
+    ]
+    return ScanResponse(items=items, not_found=missing)
 
 
 class ProductCreate(BaseModel):
@@ -47,7 +244,7 @@ class ProductCreate(BaseModel):
 
 
 @router.post("", response_model=Product)
-def create_product(data: ProductCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def create_product(data: ProductCreate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Create a product (manager only) and enforce price constraints."""
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -69,11 +266,62 @@ def create_product(data: ProductCreate, session: Session = Depends(get_session),
         min_stock=data.min_stock,
     )
     session.add(p)
+    session.flush()
+    record_movements(session, {p.product_id: data.stock_quantity}, "ADJUSTMENT", reference="Product created", employee_id=current_user.uid)
+    catalog_changed(session, products=[p.product_id])
     session.commit()
     session.refresh(p)
     return p
 
 
+@router.post("/import", response_model=ImportReport)
+async def import_products(request: Request, dry_run: bool = Query(default=False), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Bulk create or update products by barcode from a streamed CSV body (manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    body = request.stream().__aiter__()
+
+    async def next_chunk():
+        try:
+            return await body.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def chunks():
+        # Runs on the worker thread; pulls body chunks from the event loop on demand.
+        while (chunk := from_thread.run(next_chunk)) is not None:
+            if chunk:
+                yield chunk
+
+    return await run_in_threadpool(lambda: import_products_csv(session, iter_text_lines(chunks()), dry_run=dry_run))
+
+
+@router.post("/bulk/reprice", response_model=BulkResult)
+def bulk_reprice(data: RepriceInput, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Set, scale or round selling prices for products selected by category, brand or ids (manager only).
+
+    Nothing is changed if any selected product would end up below its cost price; the
+    offending ids are returned instead.
+    """
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    result = reprice_products(session, data)
+    if result.violations and not data.dry_run:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Selling price cannot be less than cost price for {result.violations} products (e.g. {', '.join(map(str, result.violating_product_ids))})",
+        )
+    return result
+
+
+@router.post("/bulk/promotion", response_model=BulkResult)
+def bulk_assign_promotion(data: PromotionAssignInput, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Attach or detach a promotion for all selected products in one statement (manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return assign_promotion(session, data)
+
+
 class ProductUpdate(BaseModel):
     name: str | None = None
     brand: str | None = None
@@ -85,7 +333,7 @@ class ProductUpdate(BaseModel):
 
 
 @router.patch("/{product_id}", response_model=Product)
-def update_product(product_id: int, data: ProductUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def update_product(product_id: int, data: ProductUpdate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Update mutable product fields and validate promotion linkage."""
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -106,6 +354,9 @@ def update_product(product_id: int, data: ProductUpdate, session: Session = Depe
         setattr(p, 'promotion_id', promo_id)
         del data_to_update['promotion_id'] # Prevent re-setting in the loop
 
+    # Stock edits go through the ledger as an adjustment relative to the current level
+    new_stock = data_to_update.pop('stock_quantity', None)
+
     for field, value in data_to_update.items():
         setattr(p, field, value)
     
@@ -113,13 +364,17 @@ def update_product(product_id: int, data: ProductUpdate, session: Session = Depe
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Selling price cannot be less than cost price")
 
     session.add(p)
+    if new_stock is not None:
+        stock = current_stock(session, [p.product_id], lock=True)[p.product_id]
+        apply_stock_deltas(session, {p.product_id: new_stock - stock}, "ADJUSTMENT", reference="Manual edit", employee_id=current_user.uid)
+    catalog_changed(session, products=[p.product_id])
     session.commit()
     session.refresh(p)
     return p
 
 
 @router.delete("/{product_id}")
-def delete_product(product_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def delete_product(product_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Delete a product (manager only)."""
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -127,5 +382,6 @@ def delete_product(product_id: int, session: Session = Depends(get_session), cur
     if not p:
         raise HTTPException(status_code=404, detail="Product not found")
     session.delete(p)
+    catalog_changed(session, products=[product_id])
     session.commit()
     return {"ok": True}
@@ -0,0 +1,201 @@
+from decimal import Decimal
+from datetime import date
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field, conint, condecimal
+from sqlalchemy import delete
+from sqlmodel import Session, select
+from ..db import get_session
+from ..models.product import Product
+from ..models.promotion_rule import PromotionRule, PromotionRuleProduct
+from ..utils.catalog import catalog_changed
+from ..utils.jwt import Principal, get_principal
+
+
+router = APIRouter(prefix="/api/promotion-rules", tags=["promotion-rules"])
+
+MAX_RULE_PRODUCTS = 1000
+
+
+# --- Schemas ---
+
+class RuleProductInput(BaseModel):
+    product_id: int
+    quantity: conint(gt=0) = 1
+
+
+class PromotionRuleCreate(BaseModel):
+    name: str
+    rule_type: str
+    buy_quantity: int | None = None
+    pay_quantity: int | None = None
+    bundle_price: condecimal(ge=Decimal("0"), decimal_places=2) | None = None
+    min_basket: condecimal(ge=Decimal("0"), decimal_places=2) | None = None
+    discount_type: str | None = None
+    discount_value: condecimal(ge=Decimal("0.01"), decimal_places=2) | None = None
+    start_date: date
+    end_date: date
+    is_active: bool = True
+    products: List[RuleProductInput] = Field(default_factory=list, max_length=MAX_RULE_PRODUCTS)
+
+
+class PromotionRuleUpdate(BaseModel):
+    name: str | None = None
+    buy_quantity: int | None = None
+    pay_quantity: int | None = None
+    bundle_price: condecimal(ge=Decimal("0"), decimal_places=2) | None = None
+    min_basket: condecimal(ge=Decimal("0"), decimal_places=2) | None = None
+    discount_type: str | None = None
+    discount_value: condecimal(ge=Decimal("0.01"), decimal_places=2) | None = None
+    start_date: date | None = None
+    end_date: date | None = None
+    is_active: bool | None = None
+    products: List[RuleProductInput] | None = Field(default=None, max_length=MAX_RULE_PRODUCTS)
+
+
+class PromotionRuleRead(BaseModel):
+    rule_id: int
+    name: str
+    rule_type: str
+    buy_quantity: int | None
+    pay_quantity: int | None
+    bundle_price: Decimal | None
+    min_basket: Decimal | None
+    discount_type: str | None
+    discount_value: Decimal | None
+    start_date: date
+    end_date: date
+    is_active: bool
+    products: List[RuleProductInput]
+
+
+# --- Helpers ---
+
+def _require_manager(user: Principal) -> None:
+    if user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+def _validate(rule: PromotionRule, products: List[RuleProductInput]) -> None:
+    """Mirror the table's per-type check constraints with readable errors."""
+    if rule.rule_type not in ("MULTI_BUY", "BUNDLE", "BASKET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rule type must be 'MULTI_BUY', 'BUNDLE' or 'BASKET'")
+    if rule.end_date < rule.start_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="End date must be after start date")
+    if len({p.product_id for p in products}) != len(products):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each product may only be listed once")
+    if rule.rule_type == "MULTI_BUY":
+        if rule.buy_quantity is None or rule.pay_quantity is None or rule.pay_quantity < 0 or rule.buy_quantity <= rule.pay_quantity:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Multi-buy rules need buy_quantity greater than pay_quantity")
+        if not products:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Multi-buy rules need at least one product")
+    elif rule.rule_type == "BUNDLE":
+        if rule.bundle_price is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bundle rules need a bundle_price")
+        if len(products) < 2 and sum(p.quantity for p in products) < 2:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bundle rules need at least two items")
+    else:
+        if rule.min_basket is None or rule.discount_value is None or rule.discount_type not in ("PERCENTAGE", "FIXED"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Basket rules need min_basket, discount_type ('PERCENTAGE' or 'FIXED') and discount_value")
+        if rule.discount_type == "PERCENTAGE" and rule.discount_value > Decimal("100.00"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Percentage discount cannot exceed 100.00")
+
+
+def _set_products(session: Session, rule_id: int, products: List[RuleProductInput]) -> None:
+    ids = [p.product_id for p in products]
+    if ids:
+        known = set(session.exec(select(Product.product_id).where(Product.product_id.in_(ids))).all())
+        unknown = [str(pid) for pid in ids if pid not in known]
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown products: {', '.join(unknown[:20])}")
+    session.execute(delete(PromotionRuleProduct).where(PromotionRuleProduct.rule_id == rule_id))
+    if products:
+        session.add_all(PromotionRuleProduct(rule_id=rule_id, product_id=p.product_id, quantity=p.quantity) for p in products)
+
+
+def _read(session: Session, rules: List[PromotionRule]) -> List[PromotionRuleRead]:
+    links: dict[int, List[RuleProductInput]] = {r.rule_id: [] for r in rules}
+    if links:
+        rows = session.exec(
+            select(PromotionRuleProduct.rule_id, PromotionRuleProduct.product_id, PromotionRuleProduct.quantity)
+            .where(PromotionRuleProduct.rule_id.in_(list(links)))
+            .order_by(PromotionRuleProduct.rule_id, PromotionRuleProduct.product_id)
+        ).all()
+        for rule_id, pid, qty in rows:
+            links[rule_id].append(RuleProductInput(product_id=pid, quantity=qty))
+    return [PromotionRuleRead(**r.model_dump(), products=links[r.rule_id]) for r in rules]
+
+
+def _get_rule(session: Session, rule_id: int) -> PromotionRule:
+    rule = session.exec(select(PromotionRule).where(PromotionRule.rule_id == rule_id)).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Promotion rule not found")
+    return rule
+
+
+# --- CRUD Endpoints ---
+
+@router.post("", response_model=PromotionRuleRead, status_code=status.HTTP_201_CREATED)
+def create_rule(data: PromotionRuleCreate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Create a multi-buy, bundle or basket promotion rule (Manager only)."""
+    _require_manager(current_user)
+    rule = PromotionRule.model_validate(data.model_dump(exclude={"products"}))
+    _validate(rule, data.products)
+    session.add(rule)
+    session.flush()
+    _set_products(session, rule.rule_id, data.products)
+    catalog_changed(session, rules=[rule.rule_id])
+    session.commit()
+    session.refresh(rule)
+    return _read(session, [rule])[0]
+
+
+@router.get("", response_model=List[PromotionRuleRead])
+def list_rules(active_only: bool = Query(default=False), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """List promotion rules. Managers see all; cashiers may request active-only."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    stmt = select(PromotionRule)
+    if active_only:
+        today = date.today()
+        stmt = stmt.where(PromotionRule.is_active == True, PromotionRule.start_date <= today, PromotionRule.end_date >= today)
+    return _read(session, session.exec(stmt.order_by(PromotionRule.rule_id)).all())
+
+
+@router.get("/{rule_id}", response_model=PromotionRuleRead)
+def get_rule(rule_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Get a promotion rule with its products."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return _read(session, [_get_rule(session, rule_id)])[0]
+
+
+@router.patch("/{rule_id}", response_model=PromotionRuleRead)
+def update_rule(rule_id: int, data: PromotionRuleUpdate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Update a promotion rule; ``products`` replaces the product list (Manager only)."""
+    _require_manager(current_user)
+    rule = _get_rule(session, rule_id)
+    products = data.products if data.products is not None else _read(session, [rule])[0].products
+    update_data = data.model_dump(exclude_unset=True, exclude={"products"})
+    for field, value in update_data.items():
+        setattr(rule, field, value)
+    _validate(rule, products)
+    if data.products is not None:
+        _set_products(session, rule_id, data.products)
+    session.add(rule)
+    catalog_changed(session, rules=[rule_id])
+    session.commit()
+    session.refresh(rule)
+    return _read(session, [rule])[0]
+
+
+@router.delete("/{rule_id}")
+def delete_rule(rule_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Delete a promotion rule (Manager only)."""
+    _require_manager(current_user)
+    rule = _get_rule(session, rule_id)
+    session.execute(delete(PromotionRuleProduct).where(PromotionRuleProduct.rule_id == rule_id))
+    session.delete(rule)
+    catalog_changed(session, rules=[rule_id])
+    session.commit()
+    return {"ok": True}
@@ -6,9 +6,9 @@ from typing import List
 from datetime import date
 from ..db import get_session
 from ..models.promotion import Promotion
-from ..models.product import Product
-from ..utils.jwt import get_current_user
-from ..models.user import User
+from ..utils.jwt import Principal, get_principal
+from ..utils.catalog import catalog_changed
+from ..handlers.bulk_product_handler import unlink_promotion
 
 router = APIRouter(prefix="/api/promotions", tags=["promotions"])
 
@@ -34,7 +34,7 @@ class PromotionUpdate(BaseModel):
 # --- CRUD Endpoints ---
 
 @router.post("", response_model=Promotion, status_code=status.HTTP_201_CREATED)
-def create_promotion(data: PromotionCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def create_promotion(data: PromotionCreate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Create a new promotion (Manager only)."""
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -49,12 +49,14 @@ def create_promotion(data: PromotionCreate, session: Session = Depends(get_sessi
 
     promo = Promotion.model_validate(data)
     session.add(promo)
+    session.flush()
+    catalog_changed(session, promotions=[promo.promotion_id])
     session.commit()
     session.refresh(promo)
     return promo
 
 @router.get("", response_model=List[Promotion])
-def list_promotions(active_only: bool = Query(default=False), session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def list_promotions(active_only: bool = Query(default=False), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """List promotions. Managers see all; cashiers may request active-only."""
     if current_user.role not in ("manager", "cashier"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -69,7 +71,7 @@ def list_promotions(active_only: bool = Query(default=False), session: Session =
     return session.exec(stmt).all()
 
 @router.patch("/{promotion_id}", response_model=Promotion)
-def update_promotion(promotion_id: int, data: PromotionUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def update_promotion(promotion_id: int, data: PromotionUpdate, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Update an existing promotion (Manager only)."""
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -100,12 +102,13 @@ def update_promotion(promotion_id: int, data: PromotionUpdate, session: Session
         setattr(promo, field, value)
 
     session.add(promo)
+    catalog_changed(session, promotions=[promotion_id])
     session.commit()
     session.refresh(promo)
     return promo
 
 @router.delete("/{promotion_id}")
-def delete_promotion(promotion_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def delete_promotion(promotion_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Delete a promotion and unlink it from products (Manager only)."""
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -115,11 +118,9 @@ def delete_promotion(promotion_id: int, session: Session = Depends(get_session),
         raise HTTPException(status_code=404, detail="Promotion not found")
         
     # Before deleting, unlink it from any products
-    products_to_unlink = session.exec(select(Product).where(Product.promotion_id == promotion_id)).all()
-    for product in products_to_unlink:
-        product.promotion_id = None
-        session.add(product)
+    unlinked = unlink_promotion(session, promotion_id)
         
     session.delete(promo)
+    catalog_changed(session, products=unlinked, promotions=[promotion_id])
     session.commit()
     return {"ok": True}
@@ -0,0 +1,30 @@
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from ..config.settings import settings
+from ..utils.jwt import Principal, get_principal
+from ..utils import metrics
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+# Served at the root, where Prometheus scrapes by default.
+metrics_router = APIRouter(tags=["system"])
+
+
+@router.get("/metrics")
+def get_metrics(current_user: Principal = Depends(get_principal)):
+    """In-process counters and latency summaries for this worker (Manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return metrics.snapshot()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(request: Request):
+    """Metrics for all workers in the Prometheus text format; guarded by ``metrics_token`` when set."""
+    if settings.metrics_token:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {settings.metrics_token}"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    if settings.metrics_dir:
+        metrics.flush(settings.metrics_dir)
+    return PlainTextResponse(metrics.render_prometheus(settings.metrics_dir), media_type="text/plain; version=0.0.4")
@@ -1,109 +1,205 @@
 from typing import List
+from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, conint
 from sqlmodel import Session, select
-from datetime import date 
+from sqlalchemy.orm import selectinload
+from datetime import date, datetime
 from ..db import get_session
-from ..utils.jwt import get_current_user
-from ..models.user import User
-from ..models.cashier import Cashier
+from ..utils.jwt import Principal, get_principal
+from ..handlers.inventory_handler import apply_stock_deltas
+from ..handlers.simulation_handler import PromotionScenario, SimulationReport, get_simulation, submit_simulation
+from ..handlers.promotion_rule_handler import AppliedRule, CartLine, evaluate_cart
+from ..handlers.member_tier_handler import upgrade_member_tier
+from ..handlers.member_spend_handler import as_utc
+from ..utils.promotion_index import ActivePromotion, promotion_index
+from ..utils.promotion_rule_index import promotion_rule_index
+from ..utils.member_lookup import MemberBrief, forget, resolve_member
+from ..utils import metrics
 from ..models.member import Member
+from ..models.points_ledger import PointsLedger
 from ..models.product import Product
-from ..models.promotion import Promotion 
-from ..models.membership_tier import MembershipTier 
 from ..models.transaction import Transaction
 from ..models.transaction_item import TransactionItem
 
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
+_checkout_lines = metrics.histogram("checkout_lines", buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89), help="Distinct products per completed checkout")
+
 
 class TransactionItemInput(BaseModel):
     product_id: int
     quantity: conint(gt=0)
 
 
-class TransactionCreateInput(BaseModel):
+class CartInput(BaseModel):
     items: List[TransactionItemInput]
     member_id: int | None = None
     member_phone: str | None = None
+
+
+class TransactionCreateInput(CartInput):
     payment_method: str
 
-def calculate_product_discount(unit_price: Decimal, quantity: int, promotion: Promotion | None) -> Decimal:
-    """Calculates discount for a single line item based on an active promotion."""
-    if not promotion:
-        return Decimal("0.00")
-        
-    # Check if promotion is active by date
-    today = date.today()
-    if not promotion.is_active or today < promotion.start_date or today > promotion.end_date:
-        return Decimal("0.00")
-
-    original_line_total = unit_price * Decimal(quantity)
-
-    if promotion.discount_type == 'PERCENTAGE':
-        # discount_amount = original_line_total * (discount_value / 100)
-        discount = original_line_total * (promotion.discount_value / Decimal("100"))
-        # Round the discount amount to 2 decimal places using ROUND_HALF_UP (common in retail)
-        return discount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    
-    elif promotion.discount_type == 'FIXED':
-        # discount_amount = fixed_amount * quantity
-        discount = promotion.discount_value * Decimal(quantity)
-        return discount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    
-    return Decimal("0.00") 
 
-def update_member_tier(member: Member, session: Session):
-    """Checks the member's total_spent and updates their tier and discount_rate if necessary."""
-    current_spent = member.total_spent
-    
-    # Find the new rank based on total_spent (highest tier whose min_spent is met)
-    stmt = select(MembershipTier).where(MembershipTier.min_spent <= current_spent).order_by(MembershipTier.min_spent.desc())
-    new_tier = session.exec(stmt).first()
-    
-    # Apply changes only if a qualifying tier is found and it's different from the current one
-    if new_tier and new_tier.rank_name != member.membership_rank:
-        member.membership_rank = new_tier.rank_name
-        member.discount_rate = new_tier.discount_rate
-        session.add(member)
+class QuoteLine(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_price: Decimal
+    promotion_id: int | None
+    discount_amount: Decimal
+    line_total: Decimal
 
 
-@router.post("", response_model=Transaction)
-def create_transaction(data: TransactionCreateInput, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    """Create a transaction with product and membership discounts, and update stock."""
-    if current_user.role not in ("cashier", "manager"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+class SimulationStatus(BaseModel):
+    job_id: str
+    status: str
+    progress: float
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+    result: SimulationReport | None = None
 
-    allowed_methods = {"Cash", "Card", "QR Code"}
-    if data.payment_method not in allowed_methods:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payment method")
 
+class AppliedRuleRead(BaseModel):
+    rule_id: int
+    name: str
+    rule_type: str
+    times: int
+    discount: Decimal
+
+
+class TransactionQuote(BaseModel):
+    member_id: int | None
+    items: List[QuoteLine]
+    applied_rules: List[AppliedRuleRead]
+    subtotal: Decimal
+    product_discount: Decimal
+    membership_discount: Decimal
+    total_amount: Decimal
+
+
+class TransactionItemDetail(BaseModel):
+    product_id: int
+    product_name: str | None
+    barcode: str | None
+    quantity: int
+    unit_price: Decimal
+    discount_amount: Decimal
+    line_total: Decimal
+
+
+class TransactionDetail(BaseModel):
+    transaction_id: int
+    transaction_date: datetime
+    employee_id: str
+    member_id: int | None
+    subtotal: Decimal
+    product_discount: Decimal
+    membership_discount: Decimal
+    total_amount: Decimal
+    payment_method: str
+    items: List[TransactionItemDetail]
+
+
+MAX_DETAIL_IDS = 100
+
+
+def load_transaction_details(session: Session, transaction_ids: List[int]) -> List[TransactionDetail]:
+    """Load transactions with their items and products in a fixed number of queries.
+
+    Items and products are fetched with select-in loading, so the query count does not
+    grow with the number of transactions or lines. Results follow the order of the ids.
+    """
+    if not transaction_ids:
+        return []
+    stmt = (
+        select(Transaction)
+        .where(Transaction.transaction_id.in_(transaction_ids))
+        .options(selectinload(Transaction.items).selectinload(TransactionItem.product))
+    )
+    by_id = {tx.transaction_id: tx for tx in session.exec(stmt).all()}
+    out: List[TransactionDetail] = []
+    for tid in transaction_ids:
+        tx = by_id.get(tid)
+        if tx is None:
+            continue
+        out.append(TransactionDetail(
+            transaction_id=tx.transaction_id,
+            transaction_date=tx.transaction_date,
+            employee_id=tx.employee_id,
+            member_id=tx.member_id,
+            subtotal=tx.subtotal,
+            product_discount=tx.product_discount,
+            membership_discount=tx.membership_discount,
+            total_amount=tx.total_amount,
+            payment_method=tx.payment_method,
+            items=[
+                TransactionItemDetail(
+                    product_id=item.product_id,
+                    product_name=item.product.name if item.product else None,
+                    barcode=item.product.barcode if item.product else None,
+                    quantity=item.quantity,
+                    unit_price=item.unit_price,
+                    discount_amount=item.discount_amount,
+                    line_total=item.line_total,
+                )
+                for item in sorted(tx.items, key=lambda i: i.product_id)
+            ],
+        ))
+    return out
+
+@dataclass
+class PricedCart:
+    items: List[TransactionItem]
+    products: dict[int, Product]
+    promotions: dict[int, ActivePromotion]
+    applied_rules: List[AppliedRule]
+    member: MemberBrief | None
+    subtotal: Decimal
+    product_discount: Decimal
+    membership_discount: Decimal
+    total_amount: Decimal
+
+
+def price_cart(session: Session, data: CartInput) -> PricedCart:
+    """Validate stock and price a cart with product, rule and membership discounts.
+
+    Products are loaded in one query; promotions and promotion rules come from in-memory
+    indexes, so pricing does not query per line or per rule. Shared by checkout and quotes.
+    """
     items_to_save: List[TransactionItem] = []
     subtotal_after_product_discount = Decimal("0.00") 
     total_product_discount = Decimal("0.00") 
-    member: Member | None = None
-    
-    # 1. Product Processing, Discount Calculation, and Stock Check
+    member: MemberBrief | None = None
+
+    # Lines for the same product are merged so deals see the full quantity
+    quantities: dict[int, int] = {}
     for it in data.items:
-        prod = session.exec(select(Product).where(Product.product_id == it.product_id)).first()
+        quantities[it.product_id] = quantities.get(it.product_id, 0) + it.quantity
+    products = {p.product_id: p for p in session.exec(select(Product).where(Product.product_id.in_(list(quantities)))).all()} if quantities else {}
+    promotions = promotion_index.get_many(session, products)
+    
+    # 1. Stock Check
+    for product_id, quantity in quantities.items():
+        prod = products.get(product_id)
         if not prod:
-            raise HTTPException(status_code=404, detail=f"Product {it.product_id} not found")
-        if prod.stock_quantity < it.quantity:
-            raise HTTPException(status_code=400, detail=f"Insufficient stock for product {prod.name}. Available: {prod.stock_quantity}, Requested: {it.quantity}")
-
-        # Get the active promotion
-        promo: Promotion | None = None
-        if prod.promotion_id is not None:
-            promo = session.exec(select(Promotion).where(Promotion.promotion_id == prod.promotion_id)).first()
-        
-        unit_price = prod.selling_price 
-        
-        # Calculate product discount
-        discount_amount = calculate_product_discount(unit_price, it.quantity, promo)
-        
-        line_total = (Decimal(it.quantity) * unit_price) - discount_amount
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        if prod.stock_quantity < quantity:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for product {prod.name}. Available: {prod.stock_quantity}, Requested: {quantity}")
+
+    # 2. Product Discounts: own promotions plus the best combination of promotion rules
+    lines = [CartLine(pid, qty, products[pid].selling_price, promotions.get(pid)) for pid, qty in quantities.items()]
+    gross = sum((line.unit_price * line.quantity for line in lines), Decimal("0.00"))
+    item_rules, basket_rules = promotion_rule_index.candidates(session, quantities, basket_total=gross)
+    pricing = evaluate_cart(lines, item_rules, basket_rules)
+
+    for line in lines:
+        discount_amount = pricing.discounts[line.product_id]
+        line_total = (Decimal(line.quantity) * line.unit_price) - discount_amount
         
         # Aggregate totals
         subtotal_after_product_discount += line_total 
@@ -112,38 +208,92 @@ def create_transaction(data: TransactionCreateInput, session: Session = Depends(
         # Store item data for batch insert
         items_to_save.append(TransactionItem(
             transaction_id=0, # Placeholder
-            product_id=prod.product_id, 
-            quantity=it.quantity, 
-            unit_price=unit_price, 
+            product_id=line.product_id, 
+            quantity=line.quantity, 
+            unit_price=line.unit_price, 
             discount_amount=discount_amount, 
             line_total=line_total
         ))
 
-    # 2. Membership Discount Calculation
+    # 3. Membership Discount Calculation
     membership_discount = Decimal("0.00")
     # Resolve member either by explicit member_id or by provided phone number
     if data.member_id is not None or (data.member_phone is not None and data.member_phone.strip() != ""):
+        # Read from the database: another worker may have changed the member's tier since it was cached.
         if data.member_id is not None:
-            member = session.exec(select(Member).where(Member.member_id == data.member_id)).first()
+            member = resolve_member(session, member_id=data.member_id, cached=False)
         else:
-            phone = data.member_phone.strip()
-            member = session.exec(select(Member).where(Member.phone == phone)).first()
+            member = resolve_member(session, phone=data.member_phone.strip(), cached=False)
         if not member:
             raise HTTPException(status_code=404, detail="Member not found")
         rate = member.discount_rate
         membership_discount = (subtotal_after_product_discount * rate) / Decimal("100")
         membership_discount = membership_discount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-    # 3. Final Total Calculation
-    total_amount = subtotal_after_product_discount - membership_discount
+    # 4. Final Total Calculation
+    return PricedCart(
+        items=items_to_save,
+        products=products,
+        promotions=promotions,
+        applied_rules=pricing.applied,
+        member=member,
+        subtotal=subtotal_after_product_discount,
+        product_discount=total_product_discount,
+        membership_discount=membership_discount,
+        total_amount=subtotal_after_product_discount - membership_discount,
+    )
+
+
+@router.post("/quote", response_model=TransactionQuote)
+def quote_transaction(data: CartInput, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Price a cart exactly as checkout would, without recording anything."""
+    if current_user.role not in ("cashier", "manager"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    cart = price_cart(session, data)
+    return TransactionQuote(
+        member_id=(cart.member.member_id if cart.member is not None else None),
+        items=[
+            QuoteLine(
+                product_id=item.product_id,
+                product_name=cart.products[item.product_id].name,
+                quantity=item.quantity,
+                unit_price=item.unit_price,
+                promotion_id=(cart.promotions[item.product_id].promotion_id if item.product_id in cart.promotions else None),
+                discount_amount=item.discount_amount,
+                line_total=item.line_total,
+            )
+            for item in cart.items
+        ],
+        applied_rules=[AppliedRuleRead(rule_id=r.rule_id, name=r.name, rule_type=r.rule_type, times=r.times, discount=r.discount) for r in cart.applied_rules],
+        subtotal=cart.subtotal,
+        product_discount=cart.product_discount,
+        membership_discount=cart.membership_discount,
+        total_amount=cart.total_amount,
+    )
+
+
+@router.post("", response_model=Transaction)
+def create_transaction(data: TransactionCreateInput, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Create a transaction with product and membership discounts, and update stock."""
+    if current_user.role not in ("cashier", "manager"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+    allowed_methods = {"Cash", "Card", "QR Code"}
+    if data.payment_method not in allowed_methods:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payment method")
+
+    cart = price_cart(session, data)
+    items_to_save = cart.items
+    member = cart.member
+    total_amount = cart.total_amount
     
     # Create Transaction Record
     tx = Transaction(
         employee_id=current_user.uid,
         member_id=(member.member_id if member is not None else None),
-        subtotal=subtotal_after_product_discount, 
-        product_discount=total_product_discount, 
-        membership_discount=membership_discount,
+        subtotal=cart.subtotal, 
+        product_discount=cart.product_discount, 
+        membership_discount=cart.membership_discount,
         total_amount=total_amount,
         payment_method=data.payment_method,
     )
@@ -152,30 +302,32 @@ def create_transaction(data: TransactionCreateInput, session: Session = Depends(
     session.refresh(tx)
 
     # 4. Update Inventory and Save Transaction Items
+    sold: dict[int, int] = {}
     for item in items_to_save:
         item.transaction_id = tx.transaction_id
         session.add(item)
-        
-        prod = session.exec(select(Product).where(Product.product_id == item.product_id)).first()
-        if prod:
-            prod.stock_quantity -= item.quantity
-            session.add(prod)
+        sold[item.product_id] = sold.get(item.product_id, 0) - item.quantity
+    apply_stock_deltas(session, sold, "SALE", reference=f"TX-{tx.transaction_id}", employee_id=current_user.uid)
     
-    # 5. Update Member Records (Points, Spending, and Tier Progression)
+    # 5. Update Member Records (Points and Tier Progression; spend is kept in MemberSpend on insert)
+    tier_changed = False
     if member is not None:
+        member = session.get(Member, member.member_id)
         points_earned = int(total_amount.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
-        member.points_balance += points_earned
-        member.total_spent += total_amount 
-        
-        update_member_tier(member, session)
+        if points_earned > 0:
+            session.add(PointsLedger(member_id=member.member_id, entry_type="EARN", points=points_earned, transaction_id=tx.transaction_id, employee_id=current_user.uid))
+        tier_changed = upgrade_member_tier(session, member)
 
     session.commit() 
+    _checkout_lines.observe(len(items_to_save))
+    if tier_changed:
+        forget([member])
     session.refresh(tx)
     return tx
 
 
 @router.get("", response_model=list[Transaction])
-def list_transactions(limit: int = 50, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def list_transactions(limit: int = 50, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """List recent transactions (manager and cashier)."""
     if current_user.role not in ("manager", "cashier"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -183,8 +335,30 @@ def list_transactions(limit: int = 50, session: Session = Depends(get_session),
     return session.exec(stmt).all()
 
 
+@router.get("/details", response_model=list[TransactionDetail])
+def get_transaction_details(ids: List[int] = Query(...), session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Bulk receipt lookup: transactions with line items for the given ids."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) > MAX_DETAIL_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_DETAIL_IDS} ids per request")
+    return load_transaction_details(session, unique_ids)
+
+
+@router.get("/{transaction_id}", response_model=TransactionDetail)
+def get_transaction(transaction_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Get a single transaction with its line items (receipt reprint)."""
+    if current_user.role not in ("manager", "cashier"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    details = load_transaction_details(session, [transaction_id])
+    if not details:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return details[0]
+
+
 @router.get("/analytics/product-sales")
-def get_product_sales_analytics(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def get_product_sales_analytics(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Get product sales analytics: top selling products by quantity and revenue"""
     if current_user.role not in ("manager",):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -220,15 +394,15 @@ def get_product_sales_analytics(session: Session = Depends(get_session), current
 
 
 @router.get("/analytics/daily-sales")
-def get_daily_sales_analytics(days: int = 30, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def get_daily_sales_analytics(days: int = 30, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Get daily sales trends for the last N days"""
     if current_user.role not in ("manager",):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     
     from sqlalchemy import func
-    from datetime import datetime, timedelta
+    from datetime import datetime, timedelta, timezone
     
-    cutoff_date = datetime.now() - timedelta(days=days)
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
     
     stmt = (
         select(
@@ -254,7 +428,7 @@ def get_daily_sales_analytics(days: int = 30, session: Session = Depends(get_ses
 
 
 @router.get("/analytics/payment-methods")
-def get_payment_method_analytics(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def get_payment_method_analytics(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Get payment method distribution"""
     if current_user.role not in ("manager",):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -284,7 +458,7 @@ def get_payment_method_analytics(session: Session = Depends(get_session), curren
 
 
 @router.get("/analytics/category-sales")
-def get_category_sales_analytics(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def get_category_sales_analytics(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Get category sales analytics: top selling categories by quantity and revenue"""
     if current_user.role not in ("manager",):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -319,7 +493,7 @@ def get_category_sales_analytics(session: Session = Depends(get_session), curren
 
 
 @router.get("/analytics/profit")
-def get_profit_analytics(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def get_profit_analytics(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     """Get profit analytics: total revenue, cost, and profit"""
     if current_user.role not in ("manager",):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -356,3 +530,34 @@ def get_profit_analytics(session: Session = Depends(get_session), current_user:
         "total_profit": 0,
         "profit_margin": 0
     }
+
+
+def _simulation_status(job) -> SimulationStatus:
+    return SimulationStatus(
+        job_id=job.job_id,
+        status=job.status,
+        progress=job.progress,
+        error=job.error,
+        created_at=as_utc(job.created_at),
+        finished_at=job.finished_at and as_utc(job.finished_at),
+        result=job.result,
+    )
+
+
+@router.post("/analytics/promotion-simulations", response_model=SimulationStatus, status_code=status.HTTP_202_ACCEPTED)
+def start_promotion_simulation(data: PromotionScenario, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Start a what-if replay of historical sales under a proposed promotion (manager only)."""
+    if current_user.role not in ("manager",):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return _simulation_status(submit_simulation(session, data))
+
+
+@router.get("/analytics/promotion-simulations/{job_id}", response_model=SimulationStatus)
+def get_promotion_simulation(job_id: str, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Poll a promotion simulation; ``result`` is set once ``status`` is ``done``."""
+    if current_user.role not in ("manager",):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    job = get_simulation(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    return _simulation_status(job)
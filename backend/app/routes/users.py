@@ -3,7 +3,7 @@ from sqlmodel import Session
 from ..db import get_session
 from ..schemas.user_schema import UserCreate, UserLogin, UserRead, Token
 from ..handlers.users_handler import signup as signup_handler, signin as signin_handler, to_user_read, list_users as list_users_handler, list_employees as list_employees_handler
-from ..utils.jwt import get_current_user
+from ..utils.jwt import Principal, get_current_user, get_principal, revoke_tokens
 from ..models.user import User
 from typing import List
 
@@ -27,7 +27,7 @@ def me(current_user: User = Depends(get_current_user)):
 
 
 @router.get("", response_model=List[UserRead])
-def list_users(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def list_users(session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     return list_users_handler(session)
@@ -36,8 +36,20 @@ def list_users(session: Session = Depends(get_session), current_user: User = Dep
 def list_employees(
     role: str | None = None,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     if current_user.role != "manager":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     return list_employees_handler(session, role)
+
+
+@router.post("/{uid}/revoke-tokens")
+def revoke_user_tokens(uid: str, session: Session = Depends(get_session), current_user: Principal = Depends(get_principal)):
+    """Sign a user out everywhere by invalidating every token issued to them so far (Manager only)."""
+    if current_user.role != "manager":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    if session.get(User, uid) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    revoke_tokens(session, uid)
+    session.commit()
+    return {"ok": True}
@@ -0,0 +1,153 @@
+"""In-process scheduler for periodic maintenance jobs.
+
+Every worker runs the scheduler. An exclusive job records when it last started in the
+``JobRun`` table and is skipped by any worker that finds it already ran in the current
+period (the same daily slot, or within the last interval), so multi-worker deployments
+do not repeat database work. On PostgreSQL the check and the run happen under an advisory
+lock, so two workers that are due at the same moment cannot both pass the check.
+Non-exclusive jobs (refreshing in-process indexes) run in every worker.
+"""
+import logging
+import threading
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone
+from typing import Callable
+from sqlalchemy import func, select
+from sqlmodel import Session
+from . import db
+from .config.settings import settings
+from .handlers.inventory_handler import take_stock_snapshot
+from .handlers.member_tier_handler import recalculate_member_tiers
+from .handlers.points_handler import compact_points, expire_points
+from .handlers.member_spend_handler import as_utc
+from .models.job_run import JobRun
+from .utils.catalog import prune_change_log
+from .utils.promotion_index import promotion_index
+from .utils.promotion_rule_index import promotion_rule_index
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[Session], object]
+    interval: timedelta | None = None
+    at: time | None = None
+    local: bool = False
+    exclusive: bool = True
+    next_run: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def ran_this_period(self, last_run: datetime, now: datetime) -> bool:
+        """Whether a run started at ``last_run`` (by any worker) covers the run due ``now``."""
+        if self.interval is not None:
+            return last_run > now - self.interval
+        return last_run >= min(self.next_run, now)
+
+    def schedule_next(self, now: datetime) -> None:
+        if self.interval is not None:
+            self.next_run = now + self.interval
+            return
+        if self.local:
+            base = now.astimezone().replace(tzinfo=None)
+            run = datetime.combine(base.date(), self.at)
+            if run <= base:
+                run += timedelta(days=1)
+            self.next_run = run.astimezone(timezone.utc)
+            return
+        run = datetime.combine(now.date(), self.at, tzinfo=timezone.utc)
+        if run <= now:
+            run += timedelta(days=1)
+        self.next_run = run
+
+
+class Scheduler:
+    def __init__(self, tick_seconds: float = 30.0):
+        self.tick_seconds = tick_seconds
+        self.jobs: list[Job] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def every(self, interval: timedelta, func: Callable[[Session], object], name: str | None = None, exclusive: bool = True) -> Job:
+        job = Job(name=name or func.__name__, func=func, interval=interval, exclusive=exclusive)
+        job.schedule_next(datetime.now(timezone.utc))
+        self.jobs.append(job)
+        return job
+
+    def daily(self, at: time, func: Callable[[Session], object], name: str | None = None, local: bool = False, exclusive: bool = True) -> Job:
+        """Run ``func`` once a day at ``at``, in UTC or the server's local time."""
+        job = Job(name=name or func.__name__, func=func, at=at, local=local, exclusive=exclusive)
+        job.schedule_next(datetime.now(timezone.utc))
+        self.jobs.append(job)
+        return job
+
+    def run_pending(self, now: datetime | None = None) -> None:
+        now = now or datetime.now(timezone.utc)
+        for job in self.jobs:
+            if job.next_run <= now:
+                self.run(job, now)
+                job.schedule_next(now)
+
+    def run(self, job: Job, now: datetime | None = None) -> None:
+        now = now or datetime.now(timezone.utc)
+        engine = db.engine
+        try:
+            if not job.exclusive:
+                with Session(engine) as session:
+                    job.func(session)
+                return
+            if engine.dialect.name != "postgresql":
+                self._run_once(job, now)
+                return
+            with engine.connect() as lock_conn:
+                key = zlib.crc32(job.name.encode())
+                if not lock_conn.execute(select(func.pg_try_advisory_lock(key))).scalar():
+                    return
+                try:
+                    self._run_once(job, now)
+                finally:
+                    lock_conn.execute(select(func.pg_advisory_unlock(key)))
+        except Exception:
+            logger.exception("Scheduled job %s failed", job.name)
+
+    def _run_once(self, job: Job, now: datetime) -> None:
+        engine = db.engine
+        with Session(engine) as session:
+            last = session.get(JobRun, job.name)
+            if last is not None and job.ran_this_period(as_utc(last.last_run_at), now):
+                return
+            job.func(session)
+        # Record the start time: a run that took a while must not hide this worker's next slot.
+        with Session(engine) as session:
+            session.merge(JobRun(name=job.name, last_run_at=now))
+            session.commit()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.tick_seconds):
+            self.run_pending()
+
+
+scheduler = Scheduler()
+scheduler.every(timedelta(minutes=settings.stock_snapshot_interval_minutes), take_stock_snapshot, name="stock_snapshot")
+scheduler.daily(time(3, 0), lambda session: prune_change_log(session, settings.catalog_log_retention_days), name="prune_catalog_log")
+scheduler.daily(time(1, 0), recalculate_member_tiers, name="member_tiers")
+scheduler.daily(time(2, 0), expire_points, name="expire_points")
+scheduler.every(timedelta(minutes=settings.points_compaction_interval_minutes), compact_points, name="compact_points")
+# Promotion start/end dates are local calendar days.
+scheduler.daily(time(0, 0), promotion_index.sync, name="promotion_index_rollover", local=True, exclusive=False)
+scheduler.daily(time(0, 0), promotion_rule_index.sync, name="promotion_rule_index_rollover", local=True, exclusive=False)
@@ -0,0 +1,60 @@
+"""
+Promotion what-if simulation over historical sales
+
+Usage: python -m app.simulate_promotion --type PERCENTAGE --value 10 --from 2025-01-01 --to 2025-03-31 [--category Drinks] [--brand X] [--product-id 1 ...]
+Prints totals and the top categories/products by projected discount; --json prints the full report.
+"""
+import sys
+import time
+from sqlmodel import Session
+from .db import engine
+from .handlers.bulk_product_handler import ProductSelector
+from .handlers.simulation_handler import PromotionScenario, simulate_promotion
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Project the cost of a promotion by replaying historical sales")
+    parser.add_argument("--type", dest="discount_type", choices=["PERCENTAGE", "FIXED"], required=True)
+    parser.add_argument("--value", dest="discount_value", required=True, help="Percent off, or amount off per unit")
+    parser.add_argument("--from", dest="start_date", required=True, help="First sales day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", required=True, help="Last sales day (YYYY-MM-DD)")
+    parser.add_argument("--category")
+    parser.add_argument("--brand")
+    parser.add_argument("--product-id", type=int, action="append", dest="product_ids")
+    parser.add_argument("--top", type=int, default=10, help="Rows to print per section (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    selector = None
+    if args.category or args.brand or args.product_ids:
+        selector = ProductSelector(category=args.category, brand=args.brand, product_ids=args.product_ids)
+    scenario = PromotionScenario(
+        discount_type=args.discount_type,
+        discount_value=args.discount_value,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        selector=selector,
+    )
+
+    started = time.perf_counter()
+    with Session(engine) as session:
+        report = simulate_promotion(session, scenario, progress=lambda p: print(f"\r{p:6.1%}", end="", file=sys.stderr))
+    elapsed = time.perf_counter() - started
+    print(file=sys.stderr)
+
+    if args.json:
+        print(report.model_dump_json(indent=2))
+        sys.exit(0)
+
+    t = report.totals
+    print(f"Lines replayed: {report.lines_replayed}  products: {len(report.products)}  ({elapsed:.1f}s)")
+    print(f"Gross sales: {t.gross_sales}  actual discount: {t.actual_discount}  projected discount: {t.projected_discount}")
+    print(f"Actual margin: {t.actual_margin}  projected margin: {t.projected_margin}  impact: {t.margin_impact}")
+    print("\nTop categories by projected discount:")
+    for c in report.categories[:args.top]:
+        print(f"  {c.category or '(none)':<30} units {c.units:>8}  discount {c.projected_discount:>12}  margin impact {c.margin_impact:>12}")
+    print("\nTop products by projected discount:")
+    for p in report.products[:args.top]:
+        print(f"  {p.product_id:>8} {p.name[:30]:<30} units {p.units:>8}  discount {p.projected_discount:>12}  margin impact {p.margin_impact:>12}")
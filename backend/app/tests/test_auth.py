@@ -186,3 +186,100 @@ def test_list_users_requires_manager():
     assert isinstance(lst, list)
     assert any(u["email"] == c_payload["email"] for u in lst)
     assert any(u["email"] == m_payload["email"] for u in lst)
+
+
+def test_me_decodes_once_and_caches_user_until_changed(monkeypatch):
+    import app.middleware.auth_middleware as auth_middleware
+    from sqlmodel import Session, select
+    from app.models.user import User
+    from app.utils.jwt import user_cache
+    payload = {"email": "cached@example.com", "password": "secret12", "username": "cacheduser", "name": "Cached User", "role": "cashier"}
+    assert client.post("/api/users/signup", json=payload).status_code == 200
+    token = client.post("/api/users/signin", json={"identifier": payload["email"], "password": payload["password"]}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    decodes = []
+    original = auth_middleware.decode_access_token
+    monkeypatch.setattr(auth_middleware, "decode_access_token", lambda t: decodes.append(t) or original(t))
+    me = client.get("/api/users/me", headers=headers).json()
+    assert len(decodes) == 1
+    assert user_cache.get(me["uid"])["name"] == "Cached User"
+    assert client.get("/api/users/me", headers=headers).json()["name"] == "Cached User"
+
+    with Session(db.engine) as s:
+        u = s.exec(select(User).where(User.uid == me["uid"])).one()
+        u.name = "Renamed User"
+        s.add(u)
+        s.commit()
+    assert user_cache.get(me["uid"]) is None
+    assert client.get("/api/users/me", headers=headers).json()["name"] == "Renamed User"
+    assert client.get("/api/users/me", headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+
+
+def test_password_rehash_on_login_and_hash_queue_limit(monkeypatch):
+    from sqlmodel import Session, select
+    from app.config.settings import settings
+    from app.models.user import User
+    import app.utils.passwords as passwords
+    payload = {"email": "rehash@example.com", "password": "secret12", "username": "rehashuser", "name": "Rehash User", "role": "manager", "manager_secret": "ef276129"}
+    assert client.post("/api/users/signup", json=payload).status_code == 200
+    with Session(db.engine) as s:
+        old_hash = s.exec(select(User).where(User.username == "rehashuser")).one().hashed_password
+    assert f"${settings.password_hash_rounds}$" in old_hash
+
+    monkeypatch.setattr(settings, "password_hash_rounds", settings.password_hash_rounds + 1000)
+    r = client.post("/api/users/signin", json={"identifier": "rehashuser", "password": "secret12"})
+    assert r.status_code == 200
+    with Session(db.engine) as s:
+        new_hash = s.exec(select(User).where(User.username == "rehashuser")).one().hashed_password
+    assert new_hash != old_hash and f"${settings.password_hash_rounds}$" in new_hash
+    assert client.post("/api/users/signin", json={"identifier": "rehashuser", "password": "secret12"}).status_code == 200
+
+    metrics = client.get("/api/system/metrics", headers={"Authorization": f"Bearer {r.json()['access_token']}"}).json()
+    assert metrics["password_hash_seconds"]["count"] >= 3
+
+    monkeypatch.setattr(passwords, "_slots", passwords.BoundedSemaphore(1))
+    passwords._slots.acquire()
+    r = client.post("/api/users/signin", json={"identifier": "rehashuser", "password": "secret12"})
+    assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+
+
+def test_token_claims_and_revocation():
+    import jwt
+    from datetime import datetime, timedelta, timezone
+    from sqlmodel import Session, select
+    from app.config.settings import settings
+    from app.models.user import User
+    from app.utils.jwt import create_access_token, decode_access_token
+    c_payload = {"email": "claims@example.com", "password": "secret12", "username": "claimsuser", "name": "Claims User", "role": "cashier"}
+    uid = client.post("/api/users/signup", json=c_payload).json()["uid"]
+    m_payload = {"email": "claimsm@example.com", "password": "secret12", "username": "claimsmanager", "name": "Claims Manager", "role": "manager", "manager_secret": "ef276129"}
+    assert client.post("/api/users/signup", json=m_payload).status_code == 200
+    signin = lambda ident: client.post("/api/users/signin", json={"identifier": ident, "password": "secret12"}).json()["access_token"]
+    ctoken, mtoken = signin("claimsuser"), signin("claimsmanager")
+    claims = decode_access_token(ctoken)
+    assert claims["role"] == "cashier" and claims["active"] is True and "iat" in claims
+    hc = {"Authorization": f"Bearer {ctoken}"}
+    assert client.get("/api/users", headers=hc).status_code == 403
+
+    # Tokens issued before claims were embedded still resolve the role from the user row.
+    legacy = jwt.encode({"sub": uid, "exp": datetime.now(timezone.utc) + timedelta(minutes=5)}, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+    assert client.get("/api/users", headers={"Authorization": f"Bearer {legacy}"}).status_code == 403
+    inactive = create_access_token(uid, "cashier", is_active=False)
+    assert client.get("/api/users/me", headers={"Authorization": f"Bearer {inactive}"}).status_code == 401
+
+    assert client.post(f"/api/users/{uid}/revoke-tokens", headers=hc).status_code == 403
+    assert client.post(f"/api/users/{uid}/revoke-tokens", headers={"Authorization": f"Bearer {mtoken}"}).status_code == 200
+    r = client.get("/api/users/me", headers=hc)
+    assert r.status_code == 401 and r.json()["detail"] == "Token revoked"
+    fresh = {"Authorization": f"Bearer {signin('claimsuser')}"}
+    assert client.get("/api/users/me", headers=fresh).status_code == 200
+
+    # Promoting the user invalidates tokens that still say "cashier".
+    with Session(db.engine) as s:
+        u = s.exec(select(User).where(User.uid == uid)).one()
+        u.role = "manager"
+        s.add(u)
+        s.commit()
+    assert client.get("/api/users", headers=fresh).status_code == 401
+    assert client.get("/api/users", headers={"Authorization": f"Bearer {signin('claimsuser')}"}).status_code == 200
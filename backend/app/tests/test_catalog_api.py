@@ -0,0 +1,101 @@
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine
+import app.db as db
+from app.main import app
+from datetime import date, timedelta
+
+
+def setup_module(module):
+    db.engine = create_engine("sqlite:///test_catalog.db", echo=False, connect_args={"check_same_thread": False})
+    SQLModel.metadata.drop_all(db.engine)
+    SQLModel.metadata.create_all(db.engine)
+
+
+client = TestClient(app)
+
+
+def signup_manager(email: str, username: str, name: str, password: str):
+    payload = {"email": email, "password": password, "username": username, "name": name, "role": "manager", "manager_secret": "ef276129"}
+    r = client.post("/api/users/signup", json=payload)
+    assert r.status_code == 200
+
+
+def signin(email: str, password: str):
+    r = client.post("/api/users/signin", json={"identifier": email, "password": password})
+    assert r.status_code == 200
+    return r.json()["access_token"]
+
+
+def test_catalog_snapshot_and_delta_sync():
+    signup_manager("cat@example.com", "catmgr", "Catalog Mgr", "secret12")
+    token = signin("cat@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    ids = []
+    for i in range(3):
+        r = client.post("/api/products", json={"barcode": f"55500000000{i}", "name": f"Cat {i}", "cost_price": "1.00", "selling_price": "2.00"}, headers=headers)
+        assert r.status_code == 200
+        ids.append(r.json()["product_id"])
+
+    rs = client.get("/api/catalog/snapshot", headers=headers)
+    assert rs.status_code == 200
+    snap = rs.json()
+    etag = rs.headers["etag"]
+    assert snap["version"] == 3
+    assert [p["product_id"] for p in snap["products"]] == ids
+    assert "cost_price" not in snap["products"][0]
+
+    rnm = client.get("/api/catalog/snapshot", headers={**headers, "If-None-Match": etag})
+    assert rnm.status_code == 304
+
+    today = date.today()
+    rp = client.post("/api/promotions", json={"promotion_name": "Sync", "discount_type": "FIXED", "discount_value": "1.00", "start_date": str(today), "end_date": str(today + timedelta(days=3))}, headers=headers)
+    promo_id = rp.json()["promotion_id"]
+    client.patch(f"/api/products/{ids[0]}", json={"promotion_id": promo_id}, headers=headers)
+    client.delete(f"/api/products/{ids[1]}", headers=headers)
+
+    rd = client.get("/api/catalog/changes", params={"since": snap["version"]}, headers=headers)
+    assert rd.status_code == 200
+    delta = rd.json()
+    assert delta["version"] == 6
+    assert delta["full_resync"] is False
+    assert ids[0] in [p["product_id"] for p in delta["products"]]
+    assert delta["deleted_products"] == [ids[1]]
+    assert [p["promotion_id"] for p in delta["promotions"]] == [promo_id]
+
+    rnone = client.get("/api/catalog/changes", params={"since": delta["version"]}, headers=headers)
+    assert rnone.json()["products"] == [] and rnone.json()["version"] == 6
+
+    rchanged = client.get("/api/catalog/snapshot", headers={**headers, "If-None-Match": etag})
+    assert rchanged.status_code == 200
+    assert rchanged.headers["etag"] != etag
+
+
+def test_change_log_poll_is_throttled(monkeypatch):
+    from sqlalchemy import event
+    from app.config.settings import settings
+    from app.models.catalog_change_log import CatalogChangeLog
+
+    signup_manager("poll@example.com", "pollmgr", "Poll Mgr", "secret12")
+    headers = {"Authorization": f"Bearer {signin('poll@example.com', 'secret12')}"}
+    client.post("/api/products", json={"barcode": "5560000000001", "name": "Polled", "cost_price": "1.00", "selling_price": "2.00"}, headers=headers)
+    table = CatalogChangeLog.__tablename__
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    monkeypatch.setattr(settings, "catalog_poll_interval_seconds", 3600)
+    client.post("/api/products/scan", json={"barcodes": ["5560000000001"]})
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        for _ in range(3):
+            assert client.post("/api/products/scan", json={"barcodes": ["5560000000001"]}).json()["items"]
+            assert client.get("/api/products/suggest", params={"q": "pol"}, headers=headers).status_code == 200
+        assert statements and not any(table in s for s in statements)
+
+        monkeypatch.setattr(settings, "catalog_poll_interval_seconds", 0)
+        client.post("/api/products/scan", json={"barcodes": ["5560000000001"]})
+        assert any(table in s for s in statements)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
@@ -0,0 +1,182 @@
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine, Session, select
+import app.db as db
+from app.main import app
+from app.models.stock_movement import StockMovement
+
+
+def setup_module(module):
+    db.engine = create_engine("sqlite:///test_inventory.db", echo=False, connect_args={"check_same_thread": False})
+    SQLModel.metadata.drop_all(db.engine)
+    SQLModel.metadata.create_all(db.engine)
+
+
+client = TestClient(app)
+
+
+def signup(email: str, username: str, name: str, role: str, password: str):
+    payload = {"email": email, "password": password, "username": username, "name": name, "role": role}
+    if role == "manager":
+        payload["manager_secret"] = "ef276129"
+    r = client.post("/api/users/signup", json=payload)
+    assert r.status_code == 200
+
+
+def signin(email: str, password: str):
+    r = client.post("/api/users/signin", json={"identifier": email, "password": password})
+    assert r.status_code == 200
+    return r.json()["access_token"]
+
+
+def stock_of(barcode: str) -> int:
+    return client.get("/api/products", params={"barcode": barcode}).json()[0]["stock_quantity"]
+
+
+def test_goods_receipt_and_stocktake_preserve_concurrent_sales():
+    signup("inv@example.com", "invmgr", "Inv Mgr", "manager", "secret12")
+    mtoken = signin("inv@example.com", "secret12")
+    signup("invc@example.com", "invcashier", "Inv Cashier", "cashier", "secret12")
+    ctoken = signin("invc@example.com", "secret12")
+    mh = {"Authorization": f"Bearer {mtoken}"}
+    ch = {"Authorization": f"Bearer {ctoken}"}
+
+    pids = []
+    for i in range(3):
+        r = client.post("/api/products", json={"barcode": f"900000000000{i}", "name": f"Inv {i}", "cost_price": "1.00", "selling_price": "2.00", "stock_quantity": 10}, headers=mh)
+        pids.append(r.json()["product_id"])
+
+    rr = client.post("/api/inventory/receipts", json={"reference": "PO-1", "items": [
+        {"product_id": pids[0], "quantity": 5},
+        {"barcode": "9000000000001", "quantity": 7},
+        {"product_id": pids[0], "quantity": 1},
+    ]}, headers=ch)
+    assert rr.status_code == 201
+    assert rr.json() == {"reference": "PO-1", "product_count": 2, "total_units": 13}
+    assert stock_of("9000000000000") == 16
+    assert stock_of("9000000000001") == 17
+
+    runknown = client.post("/api/inventory/receipts", json={"items": [{"barcode": "nope", "quantity": 1}]}, headers=ch)
+    assert runknown.status_code == 400
+    assert stock_of("9000000000000") == 16
+
+    rst = client.post("/api/inventory/stocktakes", json={"note": "Aisle 1"}, headers=mh)
+    assert rst.status_code == 201
+    st_id = rst.json()["stocktake_id"]
+    assert client.post("/api/inventory/stocktakes", json={}, headers=ch).status_code == 403
+
+    rc = client.post(f"/api/inventory/stocktakes/{st_id}/counts", json={"items": [
+        {"product_id": pids[0], "counted_quantity": 14},
+        {"product_id": pids[1], "counted_quantity": 17},
+        {"barcode": "9000000000002", "counted_quantity": 12},
+    ]}, headers=ch)
+    assert rc.status_code == 200
+    assert rc.json()["counted_products"] == 3
+    assert rc.json()["net_variance"] == 0
+
+    # A sale after counting must survive applying the stocktake
+    rtx = client.post("/api/transactions", json={"items": [{"product_id": pids[0], "quantity": 3}], "payment_method": "Cash"}, headers=ch)
+    assert rtx.status_code == 200
+
+    ra = client.post(f"/api/inventory/stocktakes/{st_id}/apply", headers=mh)
+    assert ra.status_code == 200
+    assert ra.json()["status"] == "APPLIED"
+    assert ra.json()["products_with_variance"] == 2
+    assert stock_of("9000000000000") == 11  # 16 - 3 sold - 2 missing
+    assert stock_of("9000000000001") == 17
+    assert stock_of("9000000000002") == 12
+
+    assert client.post(f"/api/inventory/stocktakes/{st_id}/apply", headers=mh).status_code == 400
+    assert client.post(f"/api/inventory/stocktakes/{st_id}/cancel", headers=mh).status_code == 400
+
+    with Session(db.engine) as s:
+        moves = s.exec(select(StockMovement).where(StockMovement.product_id == pids[0]).order_by(StockMovement.movement_id)).all()
+        assert [(m.movement_type, m.quantity_change) for m in moves] == [("ADJUSTMENT", 10), ("RECEIPT", 6), ("SALE", -3), ("STOCKTAKE", -2)]
+
+
+def test_concurrent_apply_of_a_stocktake_adjusts_stock_once(monkeypatch):
+    from sqlalchemy.orm.attributes import set_committed_value
+    from app.routes import inventory
+
+    signup("sta@example.com", "stamgr", "Sta Mgr", "manager", "secret12")
+    mh = {"Authorization": f"Bearer {signin('sta@example.com', 'secret12')}"}
+    pid = client.post("/api/products", json={"barcode": "9300000000000", "name": "Counted", "cost_price": "1.00", "selling_price": "2.00", "stock_quantity": 10}, headers=mh).json()["product_id"]
+    st_id = client.post("/api/inventory/stocktakes", json={}, headers=mh).json()["stocktake_id"]
+    client.post(f"/api/inventory/stocktakes/{st_id}/counts", json={"items": [{"product_id": pid, "counted_quantity": 7}]}, headers=mh)
+
+    # Every request sees the stocktake as still OPEN, as racing requests that read it together would.
+    original = inventory._get_stocktake
+
+    def read_while_open(session, stocktake_id, lock=False):
+        st = original(session, stocktake_id, lock)
+        set_committed_value(st, "status", "OPEN")
+        return st
+
+    monkeypatch.setattr(inventory, "_get_stocktake", read_while_open)
+    assert client.post(f"/api/inventory/stocktakes/{st_id}/apply", headers=mh).status_code == 200
+    assert client.post(f"/api/inventory/stocktakes/{st_id}/apply", headers=mh).status_code == 400
+    assert client.post(f"/api/inventory/stocktakes/{st_id}/cancel", headers=mh).status_code == 400
+    assert stock_of("9300000000000") == 7
+
+
+def test_ledger_and_point_in_time_stock_from_snapshots():
+    signup("led@example.com", "ledmgr", "Led Mgr", "manager", "secret12")
+    mh = {"Authorization": f"Bearer {signin('led@example.com', 'secret12')}"}
+    pid = client.post("/api/products", json={"barcode": "9100000000000", "name": "Ledger", "cost_price": "1.00", "selling_price": "2.00", "stock_quantity": 10}, headers=mh).json()["product_id"]
+
+    before_sale = datetime.now(timezone.utc).isoformat()
+    assert client.post("/api/transactions", json={"items": [{"product_id": pid, "quantity": 3}], "payment_method": "Cash"}, headers=mh).status_code == 200
+    snap = client.post("/api/inventory/snapshots", headers=mh)
+    assert snap.status_code == 200 and snap.json()["products"] >= 1
+    assert client.post("/api/inventory/snapshots", headers=mh).json()["products"] == 0
+    after_snapshot = datetime.now(timezone.utc).isoformat()
+
+    assert client.post("/api/inventory/receipts", json={"items": [{"product_id": pid, "quantity": 5}]}, headers=mh).status_code == 201
+    assert client.patch(f"/api/products/{pid}", json={"stock_quantity": 20}, headers=mh).json()["stock_quantity"] == 20
+
+    moves = client.get("/api/inventory/movements", params={"product_id": pid}, headers=mh).json()
+    assert [(m["movement_type"], m["quantity_change"]) for m in moves] == [("ADJUSTMENT", 8), ("RECEIPT", 5), ("SALE", -3), ("ADJUSTMENT", 10)]
+    older = client.get("/api/inventory/movements", params={"product_id": pid, "before": moves[1]["movement_id"]}, headers=mh).json()
+    assert [m["movement_id"] for m in older] == [m["movement_id"] for m in moves[2:]]
+
+    def stock_at(at):
+        r = client.get("/api/inventory/stock-at", params={"at": at, "product_ids": [pid]}, headers=mh)
+        assert r.status_code == 200
+        return r.json()[0]["stock_quantity"]
+
+    assert stock_at(before_sale) == 10
+    assert stock_at(after_snapshot) == 7
+    assert stock_at(datetime.now(timezone.utc).isoformat()) == 20
+    assert client.get("/api/inventory/stock-at", params={"at": after_snapshot, "product_ids": [999999]}, headers=mh).status_code == 400
+
+
+def test_snapshot_is_consistent_with_a_movement_committed_mid_snapshot(monkeypatch):
+    from app.handlers import inventory_handler
+    from app.models.stock_snapshot import StockSnapshot
+
+    signup("race@example.com", "racemgr", "Race Mgr", "manager", "secret12")
+    mh = {"Authorization": f"Bearer {signin('race@example.com', 'secret12')}"}
+    pid = client.post("/api/products", json={"barcode": "9200000000000", "name": "Racy", "cost_price": "1.00", "selling_price": "2.00", "stock_quantity": 10}, headers=mh).json()["product_id"]
+    client.post("/api/inventory/snapshots", headers=mh)
+    assert client.post("/api/inventory/receipts", json={"items": [{"product_id": pid, "quantity": 5}]}, headers=mh).status_code == 201
+
+    # A sale commits after the snapshot has found the moved products but before it reads their stock.
+    original = inventory_handler.current_stock
+
+    def current_stock_after_sale(session, product_ids, lock=False):
+        with Session(db.engine) as other:
+            inventory_handler.apply_stock_deltas(other, {pid: -4}, "SALE", reference="interleaved")
+            other.commit()
+        return original(session, product_ids, lock)
+
+    monkeypatch.setattr(inventory_handler, "current_stock", current_stock_after_sale)
+    with Session(db.engine) as s:
+        assert inventory_handler.take_stock_snapshot(s) >= 1
+    monkeypatch.setattr(inventory_handler, "current_stock", original)
+
+    with Session(db.engine) as s:
+        snap = s.exec(select(StockSnapshot).where(StockSnapshot.product_id == pid).order_by(StockSnapshot.snapshot_id.desc())).first()
+        last = s.exec(select(StockMovement).where(StockMovement.product_id == pid).order_by(StockMovement.movement_id.desc())).first()
+    assert (snap.stock_quantity, snap.last_movement_id) == (11, last.movement_id)
+    r = client.get("/api/inventory/stock-at", params={"at": datetime.now(timezone.utc).isoformat(), "product_ids": [pid]}, headers=mh)
+    assert r.json()[0]["stock_quantity"] == stock_of("9200000000000") == 11
@@ -2,6 +2,7 @@ from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, create_engine
 import app.db as db
 from app.main import app
+from decimal import Decimal
 
 
 def setup_module(module):
@@ -65,3 +66,288 @@ def test_products_crud_and_search():
     assert rd.status_code == 200
     rnf = client.delete(f"/api/products/{pid}", headers={"Authorization": f"Bearer {token}"})
     assert rnf.status_code == 404
+
+
+def test_product_search_ranking_and_typos():
+    signup_manager("m2@example.com", "m2", "M2", "secret12")
+    token = signin("m2@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+    items = [
+        ("8850000000011", "Chocolate Milk", "Dutchie", "Dairy"),
+        ("8850000000028", "Milk Chocolate Bar", "Cadbury", "Snacks"),
+        ("8850000000035", "Green Tea", "Oishi", "Drinks"),
+    ]
+    for barcode, name, brand, category in items:
+        r = client.post("/api/products", json={"barcode": barcode, "name": name, "brand": brand, "category": category, "cost_price": "10.00", "selling_price": "15.00"}, headers=headers)
+        assert r.status_code == 200
+
+    r = client.get("/api/products", params={"q": "chocolate"})
+    names = [x["name"] for x in r.json()]
+    assert names[0] == "Chocolate Milk"
+    assert "Milk Chocolate Bar" in names
+    assert "Green Tea" not in names
+
+    rtypo = client.get("/api/products", params={"q": "chocolat milc"})
+    assert rtypo.json()[0]["name"] == "Chocolate Milk"
+
+    rbrand = client.get("/api/products", params={"q": "oishi"})
+    assert [x["name"] for x in rbrand.json()] == ["Green Tea"]
+
+    rbc = client.get("/api/products", params={"q": "885000000003"})
+    assert rbc.json()[0]["barcode"] == "8850000000035"
+
+    # Cached queries are dropped when the catalog changes
+    pid = rbrand.json()[0]["product_id"]
+    rup = client.patch(f"/api/products/{pid}", json={"name": "Jasmine Tea"}, headers=headers)
+    assert rup.status_code == 200
+    rafter = client.get("/api/products", params={"q": "jasmine"})
+    assert [x["product_id"] for x in rafter.json()] == [pid]
+    assert client.get("/api/products", params={"q": "green"}).json() == []
+
+
+def test_search_cache_follows_another_workers_edit(monkeypatch):
+    from datetime import datetime, timezone
+    from sqlalchemy import insert, update
+    from app.config.settings import settings
+    from app.models.catalog_change_log import CatalogChangeLog
+    from app.models.product import Product
+    monkeypatch.setattr(settings, "catalog_poll_interval_seconds", 0)
+
+    signup_manager("mcache@example.com", "mcache", "MCache", "secret12")
+    headers = {"Authorization": f"Bearer {signin('mcache@example.com', 'secret12')}"}
+    pid = client.post("/api/products", json={"barcode": "7710000000001", "name": "Oolong Leaves", "cost_price": "1.00", "selling_price": "2.00"}, headers=headers).json()["product_id"]
+    assert [x["product_id"] for x in client.get("/api/products", params={"q": "oolong"}).json()] == [pid]
+    assert client.get("/api/products", params={"q": "rooibos"}).json() == []
+
+    # A plain connection commit fires no after-commit hook here, like a write made by another worker.
+    table = Product.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.product_id == pid).values(name="Rooibos Leaves"))
+        conn.execute(insert(CatalogChangeLog.__table__).values(entity="product", entity_id=pid, changed_at=datetime.now(timezone.utc)))
+    assert [x["product_id"] for x in client.get("/api/products", params={"q": "rooibos"}).json()] == [pid]
+    assert client.get("/api/products", params={"q": "oolong"}).json() == []
+
+
+def test_bulk_scan_resolves_price_stock_and_promotion():
+    from datetime import date, timedelta
+
+    signup_manager("m3@example.com", "m3", "M3", "secret12")
+    token = signin("m3@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+    r1 = client.post("/api/products", json={"barcode": "7770000000001", "name": "Scan A", "cost_price": "10.00", "selling_price": "40.00", "stock_quantity": 5}, headers=headers)
+    r2 = client.post("/api/products", json={"barcode": "7770000000002", "name": "Scan B", "cost_price": "10.00", "selling_price": "25.00", "stock_quantity": 3}, headers=headers)
+    pid_a = r1.json()["product_id"]
+
+    rs = client.post("/api/products/scan", json={"barcodes": ["7770000000001", "7770000000002", "0000000000000"]})
+    assert rs.status_code == 200
+    body = rs.json()
+    assert [x["name"] for x in body["items"]] == ["Scan A", "Scan B"]
+    assert body["not_found"] == ["0000000000000"]
+    assert body["items"][0]["promotion_id"] is None
+
+    today = date.today()
+    rp = client.post("/api/promotions", json={"promotion_name": "Quarter", "discount_type": "PERCENTAGE", "discount_value": "25.00", "start_date": str(today), "end_date": str(today + timedelta(days=1))}, headers=headers)
+    promo_id = rp.json()["promotion_id"]
+    client.patch(f"/api/products/{pid_a}", json={"promotion_id": promo_id, "stock_quantity": 7}, headers=headers)
+
+    item = client.post("/api/products/scan", json={"barcodes": ["7770000000001"]}).json()["items"][0]
+    assert item["promotion_id"] == promo_id
+    assert item["stock_quantity"] == 7
+    assert str(item["final_unit_price"]) in {"30.00", "30"}
+
+    client.patch(f"/api/promotions/{promo_id}", json={"is_active": False}, headers=headers)
+    item = client.post("/api/products/scan", json={"barcodes": ["7770000000001"]}).json()["items"][0]
+    assert item["promotion_id"] is None
+    assert str(item["final_unit_price"]) in {"40.00", "40"}
+
+    # A sale on another worker moves stock without touching this worker's indexes.
+    from app.models.product import Product
+    table = Product.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.product_id == pid_a).values(stock_quantity=2))
+    item = client.post("/api/products/scan", json={"barcodes": ["7770000000001"]}).json()["items"][0]
+    assert item["stock_quantity"] == 2
+
+
+def test_bulk_csv_import_upserts_and_reports_errors():
+    signup_manager("m4@example.com", "m4", "M4", "secret12")
+    token = signin("m4@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "text/csv"}
+    existing = client.post("/api/products", json={"barcode": "6660000000001", "name": "Old Name", "cost_price": "5.00", "selling_price": "6.00", "stock_quantity": 4}, headers={"Authorization": f"Bearer {token}"})
+    existing_id = existing.json()["product_id"]
+
+    csv_body = (
+        "barcode,name,brand,category,cost_price,selling_price,stock_quantity\n"
+        "6660000000001,New Name,Acme,Snacks,5.00,8.00,99\n"
+        "6660000000002,Fresh Item,Acme,Snacks,1.00,2.50,\n"
+        "6660000000003,Bad Price,,,9.00,3.00,1\n"
+        "6660000000002,Dup Item,,,1.00,2.00,1\n"
+        ",No Barcode,,,1.00,2.00,1\n"
+    )
+    rdry = client.post("/api/products/import", params={"dry_run": True}, content=csv_body, headers=headers)
+    assert rdry.status_code == 200
+    assert rdry.json()["inserted"] == 1 and rdry.json()["updated"] == 1
+    assert client.get("/api/products", params={"barcode": "6660000000002"}).status_code == 404
+
+    r = client.post("/api/products/import", content=csv_body, headers=headers)
+    assert r.status_code == 200
+    report = r.json()
+    assert (report["total_rows"], report["inserted"], report["updated"], report["failed"]) == (5, 1, 1, 3)
+    assert {e["row"] for e in report["errors"]} == {4, 5, 6}
+    assert "Selling price" in next(e["error"] for e in report["errors"] if e["row"] == 4)
+
+    updated = client.get("/api/products", params={"barcode": "6660000000001"}).json()[0]
+    assert updated["product_id"] == existing_id
+    assert updated["name"] == "New Name"
+    assert updated["stock_quantity"] == 4
+    fresh = client.get("/api/products", params={"barcode": "6660000000002"}).json()[0]
+    assert fresh["name"] == "Fresh Item" and fresh["stock_quantity"] == 0
+
+    rforbidden = client.post("/api/products/import", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert rforbidden.status_code == 401
+
+    rmissing = client.post("/api/products/import", content="barcode,name\n1,x\n", headers=headers)
+    assert rmissing.json()["failed"] == 1
+
+    # Imported opening stock is booked in the ledger; re-imports of existing barcodes leave stock alone.
+    stocked = "barcode,name,cost_price,selling_price,stock_quantity\n6660000000004,Stocked,1.00,2.00,7\n6660000000001,New Name,5.00,8.00,50\n"
+    assert client.post("/api/products/import", content=stocked, headers=headers).json()["inserted"] == 1
+    pid = client.get("/api/products", params={"barcode": "6660000000004"}).json()[0]["product_id"]
+    moves = client.get("/api/inventory/movements", params={"product_id": pid}, headers=headers).json()
+    assert [(m["movement_type"], m["quantity_change"], m["reference"]) for m in moves] == [("ADJUSTMENT", 7, "Product import")]
+    assert len(client.get("/api/inventory/movements", params={"product_id": existing_id}, headers=headers).json()) == 1
+
+
+def test_low_stock_endpoint_orders_by_shortfall_and_counts():
+    signup_manager("m5@example.com", "m5", "M5", "secret12")
+    token = signin("m5@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+    baseline = client.get("/api/products/low-stock", headers=headers).json()
+    levels = [("3330000000001", 0, 5), ("3330000000002", 2, 10), ("3330000000003", 9, 10), ("3330000000004", 50, 10)]
+    for barcode, stock, min_stock in levels:
+        r = client.post("/api/products", json={"barcode": barcode, "name": barcode, "cost_price": "1.00", "selling_price": "1.00", "stock_quantity": stock, "min_stock": min_stock}, headers=headers)
+        assert r.status_code == 200
+
+    r = client.get("/api/products/low-stock", params={"limit": 100}, headers=headers)
+    assert r.status_code == 200
+    page = r.json()
+    assert page["total"] == baseline["total"] + 3
+    assert page["out_of_stock"] == baseline["out_of_stock"] + 1
+    ours = [x["barcode"] for x in page["items"] if x["barcode"].startswith("333")]
+    assert ours == ["3330000000002", "3330000000001", "3330000000003"]
+    shortfalls = [x["shortfall"] for x in page["items"]]
+    assert shortfalls == sorted(shortfalls, reverse=True)
+
+    r2 = client.get("/api/products/low-stock", params={"limit": 1, "offset": 1}, headers=headers)
+    assert r2.json()["items"][0]["product_id"] == page["items"][1]["product_id"]
+    assert client.get("/api/products/low-stock").status_code == 401
+
+
+def test_product_listing_keyset_pages_and_field_projection():
+    signup_manager("m6@example.com", "m6", "M6", "secret12")
+    token = signin("m6@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(7):
+        r = client.post("/api/products", json={"barcode": f"222000000000{i}", "name": f"Page {i}", "cost_price": "1.00", "selling_price": f"{10 - i}.00"}, headers=headers)
+        assert r.status_code == 200
+
+    seen = []
+    params = {"limit": 3, "sort": "-selling_price", "fields": "name,selling_price"}
+    while True:
+        r = client.get("/api/products", params=params)
+        assert r.status_code == 200
+        page = r.json()
+        for row in page:
+            assert set(row) == {"product_id", "name", "selling_price"}
+        seen.extend(page)
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        params["after"] = cursor
+    prices = [Decimal(str(x["selling_price"])) for x in seen]
+    assert prices == sorted(prices, reverse=True)
+    assert len({x["product_id"] for x in seen}) == len(seen)
+    assert [x["name"] for x in seen if x["name"].startswith("Page")] == [f"Page {i}" for i in range(7)]
+
+    full = client.get("/api/products", params={"limit": 500}).json()
+    assert "cost_price" in full[0]
+    assert len(full) == len(seen)
+
+    assert client.get("/api/products", params={"fields": "nope"}).status_code == 400
+    assert client.get("/api/products", params={"sort": "brand"}).status_code == 400
+    assert client.get("/api/products", params={"after": "garbage"}).status_code == 400
+
+
+def test_suggest_prefix_index_tracks_writes():
+    signup_manager("m7@example.com", "m7", "M7", "secret12")
+    token = signin("m7@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+    created = {}
+    for barcode, name, brand in [("1110000000001", "Zesty Lemon Soda", "Fizzco"), ("1110000000002", "Zesty Lime", None), ("1110000000003", "Sparkling Water", "Zestwell")]:
+        r = client.post("/api/products", json={"barcode": barcode, "name": name, "brand": brand, "cost_price": "1.00", "selling_price": "2.00"}, headers=headers)
+        created[name] = r.json()["product_id"]
+
+    r = client.get("/api/products/suggest", params={"q": "zest"})
+    assert r.status_code == 200
+    assert [x["name"] for x in r.json()] == ["Zesty Lime", "Zesty Lemon Soda", "Sparkling Water"]
+    assert set(r.json()[0]) == {"product_id", "name", "brand"}
+
+    assert [x["name"] for x in client.get("/api/products/suggest", params={"q": "lemon"}).json()] == ["Zesty Lemon Soda"]
+    assert [x["name"] for x in client.get("/api/products/suggest", params={"q": "111000000000"}).json()] == ["Zesty Lime", "Sparkling Water", "Zesty Lemon Soda"]
+
+    client.patch(f"/api/products/{created['Zesty Lime']}", json={"name": "Key Lime"}, headers=headers)
+    client.delete(f"/api/products/{created['Sparkling Water']}", headers=headers)
+    assert [x["name"] for x in client.get("/api/products/suggest", params={"q": "zest"}).json()] == ["Zesty Lemon Soda"]
+    assert [x["product_id"] for x in client.get("/api/products/suggest", params={"q": "key"}).json()] == [created["Zesty Lime"]]
+
+    # The shortest name sorts after hundreds of longer matches and still ranks first.
+    rows = "".join(f"55500000{i:05d},Quince Preserve {i:03d},,,1.00,2.00\n" for i in range(300))
+    rows += "5550000099999,Quinz,,,1.00,2.00\n"
+    r = client.post("/api/products/import", content="barcode,name,brand,category,cost_price,selling_price\n" + rows, headers={**headers, "Content-Type": "text/csv"})
+    assert r.json()["inserted"] == 301
+    names = [x["name"] for x in client.get("/api/products/suggest", params={"q": "quin", "limit": 3}).json()]
+    assert names == ["Quinz", "Quince Preserve 000", "Quince Preserve 001"]
+
+
+def test_bulk_reprice_and_promotion_assignment():
+    signup_manager("m8@example.com", "m8", "M8", "secret12")
+    token = signin("m8@example.com", "secret12")
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = []
+    for i, (cost, price) in enumerate([("1.00", "2.00"), ("3.00", "4.10"), ("5.00", "9.50")]):
+        r = client.post("/api/products", json={"barcode": f"444000000000{i}", "name": f"Bulk {i}", "category": "BulkCat", "cost_price": cost, "selling_price": price, "stock_quantity": 1}, headers=headers)
+        ids.append(r.json()["product_id"])
+
+    def listed(field):
+        rows = {p["product_id"]: p for p in client.get("/api/products", params={"limit": 500}, headers=headers).json()}
+        return [rows[pid][field] for pid in ids]
+
+    def prices():
+        return [Decimal(str(v)) for v in listed("selling_price")]
+
+    body = {"selector": {"category": "BulkCat"}, "mode": "percent", "value": "10", "rounding": "up", "step": "0.50"}
+    r = client.post("/api/products/bulk/reprice", json=body, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["matched"] == 3 and r.json()["updated"] == 3
+    assert prices() == [Decimal("2.50"), Decimal("5.00"), Decimal("10.50")]
+
+    r = client.post("/api/products/bulk/reprice", json={"selector": {"product_ids": ids[:2]}, "mode": "absolute", "value": "3.40", "ending": "0.99"}, headers=headers)
+    assert r.status_code == 200 and r.json()["updated"] == 2
+    assert prices() == [Decimal("3.99"), Decimal("3.99"), Decimal("10.50")]
+
+    # One product would drop below cost: nothing changes.
+    r = client.post("/api/products/bulk/reprice", json={"selector": {"category": "BulkCat"}, "mode": "percent", "value": "-40", "rounding": "down", "step": "1"}, headers=headers)
+    assert r.status_code == 400
+    assert prices() == [Decimal("3.99"), Decimal("3.99"), Decimal("10.50")]
+    r = client.post("/api/products/bulk/reprice", json={"selector": {"category": "BulkCat"}, "mode": "percent", "value": "-40", "dry_run": True}, headers=headers)
+    assert r.json()["violations"] == 1 and r.json()["violating_product_ids"] == [ids[1]]
+    assert client.post("/api/products/bulk/reprice", json={"selector": {}, "mode": "absolute", "value": "1"}, headers=headers).status_code == 422
+
+    promo = client.post("/api/promotions", json={"promotion_name": "Bulk promo", "discount_type": "PERCENTAGE", "discount_value": "5", "start_date": "2020-01-01", "end_date": "2099-12-31"}, headers=headers).json()
+    r = client.post("/api/products/bulk/promotion", json={"selector": {"category": "BulkCat", "product_ids": ids[1:]}, "promotion_id": promo["promotion_id"]}, headers=headers)
+    assert r.status_code == 200 and r.json()["updated"] == 2
+    assert listed("promotion_id") == [None, promo["promotion_id"], promo["promotion_id"]]
+    assert client.post("/api/products/bulk/promotion", json={"selector": {"category": "BulkCat"}, "promotion_id": 999999}, headers=headers).status_code == 400
+
+    assert client.delete(f"/api/promotions/{promo['promotion_id']}", headers=headers).status_code == 200
+    assert listed("promotion_id") == [None, None, None]
@@ -0,0 +1,153 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine, Session, select
+import app.db as db
+from app.main import app
+from app.models.transaction_item import TransactionItem
+
+
+def setup_module(module):
+    db.engine = create_engine("sqlite:///test_promotion_rules.db", echo=False, connect_args={"check_same_thread": False})
+    SQLModel.metadata.drop_all(db.engine)
+    SQLModel.metadata.create_all(db.engine)
+
+
+client = TestClient(app)
+
+
+def signup(email: str, username: str, name: str, role: str, password: str):
+    payload = {"email": email, "password": password, "username": username, "name": name, "role": role}
+    if role == "manager":
+        payload["manager_secret"] = "ef276129"
+    r = client.post("/api/users/signup", json=payload)
+    assert r.status_code == 200
+
+
+def signin(email: str, password: str):
+    r = client.post("/api/users/signin", json={"identifier": email, "password": password})
+    assert r.status_code == 200
+    return r.json()["access_token"]
+
+
+def test_rules_pick_best_combination_and_allocate_to_lines():
+    signup("rules@example.com", "rulesmgr", "Rules Mgr", "manager", "secret12")
+    signup("rulesc@example.com", "rulescashier", "Rules Cashier", "cashier", "secret12")
+    mh = {"Authorization": f"Bearer {signin('rules@example.com', 'secret12')}"}
+    ch = {"Authorization": f"Bearer {signin('rulesc@example.com', 'secret12')}"}
+    today = str(date.today())
+    later = str(date.today() + timedelta(days=7))
+
+    prices = {"A": "10.00", "B": "6.00", "C": "4.00", "D": "20.00"}
+    pid = {}
+    for i, (name, price) in enumerate(prices.items()):
+        r = client.post("/api/products", json={"barcode": f"666000000000{i}", "name": name, "cost_price": "1.00", "selling_price": price, "stock_quantity": 50}, headers=mh)
+        pid[name] = r.json()["product_id"]
+    promo = client.post("/api/promotions", json={"promotion_name": "D 10%", "discount_type": "PERCENTAGE", "discount_value": "10", "start_date": today, "end_date": later}, headers=mh).json()
+    client.patch(f"/api/products/{pid['D']}", json={"promotion_id": promo["promotion_id"]}, headers=mh)
+
+    def create(body):
+        r = client.post("/api/promotion-rules", json={"start_date": today, "end_date": later, **body}, headers=mh)
+        assert r.status_code == 201, r.text
+        return r.json()["rule_id"]
+
+    multi = create({"name": "3 for 2", "rule_type": "MULTI_BUY", "buy_quantity": 3, "pay_quantity": 2, "products": [{"product_id": pid[n]} for n in "ABC"]})
+    bundle = create({"name": "C+D", "rule_type": "BUNDLE", "bundle_price": "20.00", "products": [{"product_id": pid["C"]}, {"product_id": pid["D"]}]})
+    basket = create({"name": "5% over 30", "rule_type": "BASKET", "min_basket": "30.00", "discount_type": "PERCENTAGE", "discount_value": "5"})
+    create({"name": "1 off over 10", "rule_type": "BASKET", "min_basket": "10.00", "discount_type": "FIXED", "discount_value": "1.00"})
+    create({"name": "Big basket", "rule_type": "BASKET", "min_basket": "1000.00", "discount_type": "PERCENTAGE", "discount_value": "50"})
+
+    cart = {"items": [{"product_id": pid["A"], "quantity": 2}, {"product_id": pid["B"], "quantity": 1}, {"product_id": pid["C"], "quantity": 1}, {"product_id": pid["D"], "quantity": 1}]}
+    rq = client.post("/api/transactions/quote", json=cart, headers=ch)
+    assert rq.status_code == 200
+    quote = rq.json()
+    assert [r["rule_id"] for r in quote["applied_rules"]] == [multi, bundle, basket]
+    discounts = {line["product_id"]: Decimal(str(line["discount_amount"])) for line in quote["items"]}
+    # B is free in the 3-for-2; C+D bundle saves 4.00 (split 0.67/3.33) instead of D's 2.00 promotion;
+    # the 5% basket deal (2.00) is spread over the remaining line totals.
+    assert discounts == {pid["A"]: Decimal("1.00"), pid["B"]: Decimal("6.00"), pid["C"]: Decimal("0.84"), pid["D"]: Decimal("4.16")}
+    assert Decimal(str(quote["product_discount"])) == Decimal("12.00")
+    assert Decimal(str(quote["total_amount"])) == Decimal("38.00")
+
+    rtx = client.post("/api/transactions", json={**cart, "payment_method": "Cash"}, headers=ch)
+    assert rtx.status_code == 200
+    assert Decimal(str(rtx.json()["total_amount"])) == Decimal("38.00")
+    with Session(db.engine) as s:
+        items = s.exec(select(TransactionItem).where(TransactionItem.transaction_id == rtx.json()["transaction_id"])).all()
+        assert all(i.line_total == i.quantity * i.unit_price - i.discount_amount for i in items)
+
+    # Deactivating the bundle lets D keep its own promotion; the multi-buy still wins for A/B.
+    assert client.patch(f"/api/promotion-rules/{bundle}", json={"is_active": False}, headers=mh).status_code == 200
+    quote = client.post("/api/transactions/quote", json=cart, headers=ch).json()
+    assert [r["rule_id"] for r in quote["applied_rules"]] == [multi, basket]
+    d_line = next(line for line in quote["items"] if line["product_id"] == pid["D"])
+    assert Decimal(str(d_line["discount_amount"])) > Decimal("2.00")
+
+
+def test_rule_validation_and_permissions():
+    mh = {"Authorization": f"Bearer {signin('rules@example.com', 'secret12')}"}
+    ch = {"Authorization": f"Bearer {signin('rulesc@example.com', 'secret12')}"}
+    base = {"start_date": str(date.today()), "end_date": str(date.today())}
+    bad = [
+        {"name": "x", "rule_type": "MULTI_BUY", "buy_quantity": 2, "pay_quantity": 2, "products": [{"product_id": 1}]},
+        {"name": "x", "rule_type": "MULTI_BUY", "buy_quantity": 3, "pay_quantity": 2},
+        {"name": "x", "rule_type": "BUNDLE", "products": [{"product_id": 1}, {"product_id": 2}]},
+        {"name": "x", "rule_type": "BASKET", "min_basket": "10.00", "discount_type": "PERCENTAGE", "discount_value": "150"},
+        {"name": "x", "rule_type": "BUNDLE", "bundle_price": "1.00", "products": [{"product_id": 1}, {"product_id": 999999}]},
+        {"name": "x", "rule_type": "COUPON"},
+    ]
+    for body in bad:
+        assert client.post("/api/promotion-rules", json={**base, **body}, headers=mh).status_code == 400
+    assert client.post("/api/promotion-rules", json={**base, "name": "x", "rule_type": "BASKET", "min_basket": "1", "discount_type": "FIXED", "discount_value": "1"}, headers=ch).status_code == 403
+    rules = client.get("/api/promotion-rules", params={"active_only": True}, headers=ch).json()
+    assert rules and all(r["is_active"] for r in rules)
+    rid = rules[0]["rule_id"]
+    assert client.delete(f"/api/promotion-rules/{rid}", headers=mh).status_code == 200
+    assert client.get(f"/api/promotion-rules/{rid}", headers=mh).status_code == 404
+
+
+def test_rule_changes_committed_by_another_worker_reach_pricing(monkeypatch):
+    from datetime import datetime, timezone
+    from sqlalchemy import insert, update
+    from app.models.catalog_change_log import CatalogChangeLog
+    from app.models.promotion_rule import PromotionRule
+    from app.config.settings import settings
+    monkeypatch.setattr(settings, "catalog_poll_interval_seconds", 0)
+
+    mh = {"Authorization": f"Bearer {signin('rules@example.com', 'secret12')}"}
+    pid = client.post("/api/products", json={"barcode": "6660000000099", "name": "Elsewhere", "cost_price": "1.00", "selling_price": "5.00", "stock_quantity": 50}, headers=mh).json()["product_id"]
+    rule = client.post("/api/promotion-rules", json={"name": "2 for 1", "rule_type": "MULTI_BUY", "buy_quantity": 2, "pay_quantity": 1, "start_date": str(date.today()), "end_date": str(date.today()), "products": [{"product_id": pid}]}, headers=mh).json()["rule_id"]
+    cart = {"items": [{"product_id": pid, "quantity": 2}]}
+    def applied():
+        return [r["rule_id"] for r in client.post("/api/transactions/quote", json=cart, headers=mh).json()["applied_rules"]]
+
+    assert rule in applied()
+
+    # A plain connection commit fires no after-commit hook here, like a write made by another worker.
+    with db.engine.begin() as conn:
+        conn.execute(update(PromotionRule.__table__).where(PromotionRule.__table__.c.rule_id == rule).values(is_active=False))
+        conn.execute(insert(CatalogChangeLog.__table__).values(entity="rule", entity_id=rule, changed_at=datetime.now(timezone.utc)))
+    assert rule not in applied()
+
+
+def test_cart_evaluation_plans_each_rule_at_most_twice(monkeypatch):
+    from app.handlers import promotion_rule_handler as handler
+    from app.handlers.promotion_rule_handler import CartLine, evaluate_cart
+    from app.utils.promotion_rule_index import CompiledRule
+
+    today = date.today()
+    cart = [CartLine(product_id=pid, quantity=6, unit_price=Decimal("10.00")) for pid in range(20)]
+    rules = [
+        CompiledRule(rule_id=i, name=f"3 for 2 #{i}", rule_type="MULTI_BUY", products={i % 20: 1}, start_date=today, end_date=today, buy_quantity=3, pay_quantity=2)
+        for i in range(1, 500)
+    ]
+    rules.append(CompiledRule(rule_id=500, name="2 for 1", rule_type="MULTI_BUY", products={0: 1}, start_date=today, end_date=today, buy_quantity=2, pay_quantity=1))
+    calls = []
+    planner = handler._PLANNERS["MULTI_BUY"]
+    monkeypatch.setitem(handler._PLANNERS, "MULTI_BUY", lambda *args: calls.append(1) or planner(*args))
+
+    pricing = evaluate_cart(cart, rules, [])
+    assert len(calls) <= 2 * len(rules)
+    assert pricing.applied[0].rule_id == 500
+    assert pricing.discounts[0] == Decimal("30.00")
+    assert all(pricing.discounts[pid] == Decimal("20.00") for pid in range(1, 20))
@@ -216,3 +216,26 @@ def test_transaction_applies_promotion_discounts():
     assert Decimal(str(tx2["membership_discount"])) == Decimal("0.00")
     assert Decimal(str(tx2["subtotal"])) == Decimal("135.00")
     assert Decimal(str(tx2["total_amount"])) == Decimal("135.00")
+
+
+def test_promotion_edits_committed_by_another_worker_reach_pricing(monkeypatch):
+    from datetime import datetime, timezone
+    from sqlalchemy import insert, update
+    from app.models.catalog_change_log import CatalogChangeLog
+    from app.models.promotion import Promotion
+    from app.config.settings import settings
+    monkeypatch.setattr(settings, "catalog_poll_interval_seconds", 0)
+
+    signup_manager("mgr5@example.com", "mgr5", "Manager5", "secret12")
+    mh = {"Authorization": f"Bearer {signin('mgr5@example.com', 'secret12')}"}
+    pid = client.post("/api/products", json={"barcode": "1234500000009", "name": "Shared", "cost_price": "10.00", "selling_price": "100.00", "stock_quantity": 10}, headers=mh).json()["product_id"]
+    promo_id = client.post("/api/promotions", json={"promotion_name": "Ten", "discount_type": "PERCENTAGE", "discount_value": "10.00", "start_date": str(date.today()), "end_date": str(date.today() + timedelta(days=1))}, headers=mh).json()["promotion_id"]
+    client.patch(f"/api/products/{pid}", json={"promotion_id": promo_id}, headers=mh)
+    cart = {"items": [{"product_id": pid, "quantity": 1}]}
+    assert Decimal(str(client.post("/api/transactions/quote", json=cart, headers=mh).json()["product_discount"])) == Decimal("10.00")
+
+    # A plain connection commit fires no after-commit hook here, like a write made by another worker.
+    with db.engine.begin() as conn:
+        conn.execute(update(Promotion.__table__).where(Promotion.__table__.c.promotion_id == promo_id).values(discount_value=Decimal("25.00")))
+        conn.execute(insert(CatalogChangeLog.__table__).values(entity="promotion", entity_id=promo_id, changed_at=datetime.now(timezone.utc)))
+    assert Decimal(str(client.post("/api/transactions/quote", json=cart, headers=mh).json()["product_discount"])) == Decimal("25.00")
@@ -0,0 +1,198 @@
+import anyio
+import anyio.to_thread
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import SQLModel, create_engine
+import app.db as db
+import app.main as main
+from app.main import app
+from app.utils import metrics
+
+
+def setup_module(module):
+    db.engine = create_engine("sqlite:///test_system.db", echo=False, connect_args={"check_same_thread": False}, poolclass=db.InstrumentedQueuePool, pool_size=2, max_overflow=1)
+    SQLModel.metadata.drop_all(db.engine)
+    SQLModel.metadata.create_all(db.engine)
+
+
+client = TestClient(app)
+
+
+def signin_manager() -> str:
+    payload = {"email": "sysmgr@example.com", "password": "secret12", "username": "sysmgr", "name": "Sys Manager", "role": "manager", "manager_secret": "ef276129"}
+    assert client.post("/api/users/signup", json=payload).status_code == 200
+    r = client.post("/api/users/signin", json={"identifier": payload["email"], "password": payload["password"]})
+    return r.json()["access_token"]
+
+
+def test_pool_metrics_and_threadpool_sizing(monkeypatch):
+    token = signin_manager()
+    waits = metrics.histogram("db_pool_wait_seconds").count
+    with db.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert metrics.snapshot()["db_pool_checked_out"]["value"] >= 1
+    assert metrics.histogram("db_pool_wait_seconds").count > waits
+    assert db.pool_capacity(db.engine) == 3
+
+    r = client.get("/api/system/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["db_pool_capacity"]["value"] == 3
+    assert body["db_pool_wait_seconds"]["count"] >= 1
+
+    monkeypatch.setattr(main, "engine", db.engine)
+
+    async def configure() -> float:
+        await main.configure_threadpool()
+        return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+    monkeypatch.setattr(main.settings, "threadpool_reserved_connections", 1)
+    assert anyio.run(configure) == 2
+    monkeypatch.setattr(main.settings, "threadpool_reserved_connections", 5)
+    assert anyio.run(configure) == 1
+    monkeypatch.setattr(main.settings, "threadpool_size", 7)
+    assert anyio.run(configure) == 7
+
+
+def test_query_metrics_classify_ctes_and_count_errors():
+    ctes = metrics.histogram("db_query_duration_seconds", labelnames=("statement",)).labels("WITH")
+    errors = metrics.counter("db_query_errors", labelnames=("statement",)).labels("SELECT")
+    ctes_before, errors_before = ctes.count, errors.value
+    with db.engine.connect() as conn:
+        conn.execute(text("WITH t AS (SELECT 1 AS x) SELECT x FROM t"))
+        try:
+            conn.execute(text("SELECT * FROM no_such_table"))
+        except Exception:
+            pass
+        else:
+            raise AssertionError("expected the query to fail")
+        assert not conn.info.get("query_started")
+    assert ctes.count == ctes_before + 1
+    assert errors.value == errors_before + 1
+
+
+def test_saturated_threadpool_never_waits_for_a_connection(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timedelta, timezone
+    import jwt as pyjwt
+    from sqlalchemy import event
+    from app.utils.jwt import revocations
+    token = client.post("/api/users/signin", json={"identifier": "sysmgr@example.com", "password": "secret12"}).json()["access_token"]
+    uid = pyjwt.decode(token, options={"verify_signature": False})["sub"]
+    # A token from before role claims: authorization falls back to loading the user.
+    legacy = pyjwt.encode({"sub": uid, "active": True, "iat": datetime.now(timezone.utc).timestamp(), "exp": datetime.now(timezone.utc) + timedelta(minutes=5)}, main.settings.jwt_secret, algorithm=main.settings.jwt_algorithm)
+    h = {"Authorization": f"Bearer {legacy}"}
+    # Every request reloads the revocation list.
+    monkeypatch.setattr(revocations, "refresh_seconds", 0)
+
+    lock = threading.Lock()
+    state = {"out": 0, "peak": 0, "checkouts": 0}
+
+    def on_checkout(*args):
+        with lock:
+            state["out"] += 1
+            state["checkouts"] += 1
+            state["peak"] = max(state["peak"], state["out"])
+
+    def on_checkin(*args):
+        with lock:
+            state["out"] -= 1
+
+    event.listen(db.engine.pool, "checkout", on_checkout)
+    event.listen(db.engine.pool, "checkin", on_checkin)
+    try:
+        # The revocation reload, then the request session for the role lookup and the route.
+        r = client.get("/api/products/low-stock", headers=h)
+        assert r.status_code == 200
+        assert state["checkouts"] == 2
+
+        monkeypatch.setattr(main, "engine", db.engine)
+        monkeypatch.setattr(main.settings, "scheduler_enabled", False)
+        monkeypatch.setattr(main.settings, "threadpool_reserved_connections", 2)
+        timeouts = metrics.counter("db_pool_timeouts").labels().value
+        # A background job holds one reserved connection and the revocation reload takes the
+        # other, while requests fill every thread.
+        with TestClient(app) as c, db.engine.connect() as held:
+            held.execute(text("SELECT 1"))
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                codes = list(pool.map(lambda _: c.get("/api/products/low-stock", headers=h).status_code, range(40)))
+        assert codes == [200] * 40
+        assert state["peak"] <= db.pool_capacity(db.engine)
+        assert metrics.counter("db_pool_timeouts").labels().value == timeouts
+    finally:
+        event.remove(db.engine.pool, "checkout", on_checkout)
+        event.remove(db.engine.pool, "checkin", on_checkin)
+
+
+def test_prometheus_endpoint_aggregates_workers(tmp_path, monkeypatch):
+    import json
+    import os
+    from app.config.settings import settings
+    token = client.post("/api/users/signin", json={"identifier": "sysmgr@example.com", "password": "secret12"}).json()["access_token"]
+    h = {"Authorization": f"Bearer {token}"}
+    def sample(body: str, series: str) -> float:
+        line = next((l for l in body.splitlines() if l.startswith(series + " ")), None)
+        return float(line.rsplit(" ", 1)[1]) if line else 0.0
+
+    not_found = 'http_requests_total{method="GET",route="/api/members/{member_id}",status="404"}'
+    lookups = 'http_request_duration_seconds_bucket{method="GET",route="/api/members/lookup",le="+Inf"}'
+    before = client.get("/metrics").text
+    assert client.get("/api/members/12345", headers=h).status_code == 404
+    assert client.get("/api/members/lookup", params={"q": "081"}, headers=h).status_code == 200
+    assert client.get("/api/members/lookup", params={"q": "081"}, headers=h).status_code == 200
+
+    body = client.get("/metrics").text
+    assert sample(body, not_found) == sample(before, not_found) + 1
+    assert sample(body, lookups) == sample(before, lookups) + 2
+    assert "# TYPE db_query_duration_seconds histogram" in body
+    assert "# TYPE cache_hits_total counter" in body and "# TYPE cache_hit_ratio gauge" in body
+
+    # Another live worker's gauges count; an exited worker only contributes its counters.
+    def worker_file(pid: int, requests: int, in_progress: int):
+        data = {
+            "http_requests_total": {"kind": "counter", "help": "", "labelnames": ["method", "route", "status"], "series": [[["GET", "/api/other", "200"], {"value": requests}]]},
+            "http_requests_in_progress": {"kind": "gauge", "help": "", "labelnames": ["method"], "series": [[["PATCH"], {"value": in_progress}]]},
+        }
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(data))
+    worker_file(os.getppid(), 3, 2)
+    worker_file(2 ** 22 + 12345, 4, 5)
+    monkeypatch.setattr(settings, "metrics_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "metrics_token", "scrape-token")
+    assert client.get("/metrics").status_code == 401
+    body = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"}).text
+    assert 'http_requests_total{method="GET",route="/api/other",status="200"} 7' in body
+    assert 'http_requests_in_progress{method="PATCH"} 2' in body
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_exclusive_jobs_run_once_per_period_across_workers():
+    from datetime import datetime, time, timedelta, timezone
+    from app.scheduler import Scheduler
+
+    calls = []
+    workers = [Scheduler(), Scheduler()]
+    for worker in workers:
+        worker.daily(time(1, 0), lambda session: calls.append("daily"), name="test_daily")
+    slot = datetime(2030, 1, 1, 1, 0, tzinfo=timezone.utc)
+    for day in range(2):
+        for offset, worker in enumerate(workers):
+            worker.jobs[0].next_run = slot + timedelta(days=day)
+            worker.run_pending(slot + timedelta(days=day, seconds=10 + offset * 20))
+    assert calls == ["daily", "daily"]
+
+    calls.clear()
+    workers = [Scheduler(), Scheduler()]
+    for worker in workers:
+        worker.every(timedelta(minutes=10), lambda session: calls.append("interval"), name="test_interval")
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    # The second worker started three minutes later, so its due times are offset.
+    for minute in range(0, 40):
+        now = start + timedelta(minutes=minute)
+        if minute == 0:
+            workers[0].jobs[0].next_run = now
+        if minute == 3:
+            workers[1].jobs[0].next_run = now
+        for worker in workers:
+            worker.run_pending(now)
+    assert len(calls) == 4
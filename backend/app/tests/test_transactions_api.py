@@ -89,6 +89,9 @@ def test_transaction_checkout_flow():
     assert Decimal(str(tx["subtotal"])) == subtotal
     assert Decimal(str(tx["membership_discount"])) == discount
     assert Decimal(str(tx["total_amount"])) == subtotal - discount
+    statement = client.get(f"/api/members/{member_id}/points", headers={"Authorization": f"Bearer {ctoken}"}).json()
+    assert statement["balance"] == 252
+    assert statement["entries"][0]["entry_type"] == "EARN" and statement["entries"][0]["transaction_id"] == tx["transaction_id"]
 
     rbad = client.post("/api/transactions", json={"items": [{"product_id": prod2, "quantity": 99}], "payment_method": "Cash"}, headers={"Authorization": f"Bearer {ctoken}"})
     assert rbad.status_code == 400
@@ -144,3 +147,136 @@ def test_transaction_checkout_with_member_phone():
     assert Decimal(str(tx["membership_discount"])) == discount
     assert Decimal(str(tx["total_amount"])) == subtotal - discount
     assert tx["member_id"] == mid
+
+
+def test_transaction_detail_and_bulk_lookup():
+    from sqlalchemy import event
+
+    signup("manager3@example.com", "manager3", "Manager3", "manager", "secret12")
+    mtoken = signin("manager3@example.com", "secret12")
+    signup("cashier3@example.com", "cashier3", "Cashier3", "cashier", "secret12")
+    ctoken = signin("cashier3@example.com", "secret12")
+
+    pids = []
+    for i, barcode in enumerate(["4444444444441", "4444444444442", "4444444444443"]):
+        p = {"barcode": barcode, "name": f"Detail{i}", "cost_price": "10.00", "selling_price": "20.00", "stock_quantity": 50, "min_stock": 2}
+        rp = client.post("/api/products", json=p, headers={"Authorization": f"Bearer {mtoken}"})
+        assert rp.status_code == 200
+        pids.append(rp.json()["product_id"])
+
+    tx_ids = []
+    for lines in ([(pids[0], 1)], [(pids[0], 2), (pids[1], 1), (pids[2], 3)]):
+        payload = {"items": [{"product_id": pid, "quantity": q} for pid, q in lines], "payment_method": "Card"}
+        rtx = client.post("/api/transactions", json=payload, headers={"Authorization": f"Bearer {ctoken}"})
+        assert rtx.status_code == 200
+        tx_ids.append(rtx.json()["transaction_id"])
+
+    rone = client.get(f"/api/transactions/{tx_ids[1]}", headers={"Authorization": f"Bearer {ctoken}"})
+    assert rone.status_code == 200
+    detail = rone.json()
+    assert [i["product_name"] for i in detail["items"]] == ["Detail0", "Detail1", "Detail2"]
+    assert sum(Decimal(str(i["line_total"])) for i in detail["items"]) == Decimal(str(detail["subtotal"]))
+
+    rmissing = client.get("/api/transactions/999999", headers={"Authorization": f"Bearer {ctoken}"})
+    assert rmissing.status_code == 404
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        client.get("/api/transactions/details", params={"ids": [tx_ids[0]]}, headers={"Authorization": f"Bearer {ctoken}"})
+        single = len(statements)
+        statements.clear()
+        rbulk = client.get("/api/transactions/details", params={"ids": [tx_ids[1], tx_ids[0], 999999]}, headers={"Authorization": f"Bearer {ctoken}"})
+        bulk = len(statements)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+    assert rbulk.status_code == 200
+    assert [t["transaction_id"] for t in rbulk.json()] == [tx_ids[1], tx_ids[0]]
+    assert bulk == single
+
+
+def test_quote_uses_promotions_in_effect_today():
+    from datetime import date, timedelta
+    signup("quote@example.com", "quotemgr", "Quote Mgr", "manager", "secret12")
+    h = {"Authorization": f"Bearer {signin('quote@example.com', 'secret12')}"}
+    today = date.today()
+    pids = []
+    for i in range(3):
+        r = client.post("/api/products", json={"barcode": f"555000000000{i}", "name": f"Quote {i}", "cost_price": "5.00", "selling_price": "10.00", "stock_quantity": 20}, headers=h)
+        pids.append(r.json()["product_id"])
+    current = client.post("/api/promotions", json={"promotion_name": "Now", "discount_type": "PERCENTAGE", "discount_value": "10", "start_date": str(today), "end_date": str(today + timedelta(days=5))}, headers=h).json()
+    future = client.post("/api/promotions", json={"promotion_name": "Later", "discount_type": "FIXED", "discount_value": "1", "start_date": str(today + timedelta(days=1)), "end_date": str(today + timedelta(days=5))}, headers=h).json()
+    client.patch(f"/api/products/{pids[0]}", json={"promotion_id": current["promotion_id"]}, headers=h)
+    client.patch(f"/api/products/{pids[1]}", json={"promotion_id": future["promotion_id"]}, headers=h)
+
+    cart = {"items": [{"product_id": pid, "quantity": 2} for pid in pids]}
+    rq = client.post("/api/transactions/quote", json=cart, headers=h)
+    assert rq.status_code == 200
+    quote = rq.json()
+    assert [line["promotion_id"] for line in quote["items"]] == [current["promotion_id"], None, None]
+    assert Decimal(str(quote["product_discount"])) == Decimal("2.00")
+    assert Decimal(str(quote["total_amount"])) == Decimal("58.00")
+
+    # Promotion edits take effect on the next quote.
+    client.patch(f"/api/promotions/{future['promotion_id']}", json={"start_date": str(today)}, headers=h)
+    client.patch(f"/api/promotions/{current['promotion_id']}", json={"is_active": False}, headers=h)
+    quote = client.post("/api/transactions/quote", json=cart, headers=h).json()
+    assert [line["promotion_id"] for line in quote["items"]] == [None, future["promotion_id"], None]
+    assert Decimal(str(quote["product_discount"])) == Decimal("2.00")
+
+    rtx = client.post("/api/transactions", json={**cart, "payment_method": "Card"}, headers=h)
+    assert rtx.status_code == 200
+    assert Decimal(str(rtx.json()["total_amount"])) == Decimal(str(quote["total_amount"]))
+    assert client.post("/api/transactions/quote", json={"items": [{"product_id": 999999, "quantity": 1}]}, headers=h).status_code == 404
+
+
+def test_promotion_simulation_runs_in_background():
+    import time
+    from datetime import datetime, timezone
+    from sqlalchemy import insert
+    from app.models.simulation_job import SimulationJob
+    signup("sim@example.com", "simmgr", "Sim Mgr", "manager", "secret12")
+    h = {"Authorization": f"Bearer {signin('sim@example.com', 'secret12')}"}
+    pids = []
+    for i, (category, price) in enumerate([("SimA", "10.00"), ("SimA", "3.00"), ("SimB", "8.00")]):
+        r = client.post("/api/products", json={"barcode": f"777000000000{i}", "name": f"Sim {i}", "category": category, "cost_price": "2.00", "selling_price": price, "stock_quantity": 100}, headers=h)
+        pids.append(r.json()["product_id"])
+    for qty in (1, 4):
+        cart = {"items": [{"product_id": pid, "quantity": qty} for pid in pids], "payment_method": "Cash"}
+        assert client.post("/api/transactions", json=cart, headers=h).status_code == 200
+
+    # Sales are stamped in UTC, and so is the simulation window.
+    today = str(datetime.now(timezone.utc).date())
+    body = {"discount_type": "FIXED", "discount_value": "5.00", "start_date": today, "end_date": today, "selector": {"category": "SimA"}}
+    r = client.post("/api/transactions/analytics/promotion-simulations", json=body, headers=h)
+    assert r.status_code == 202
+    job_id = r.json()["job_id"]
+    for _ in range(100):
+        job = client.get(f"/api/transactions/analytics/promotion-simulations/{job_id}", headers=h).json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done", job
+    report = job["result"]
+    assert report["lines_replayed"] == 4
+    by_product = {p["product_id"]: p for p in report["products"]}
+    assert set(by_product) == set(pids[:2])
+    # 5.00 off per unit, capped at the 3.00 unit price for the cheaper product
+    assert Decimal(str(by_product[pids[0]]["projected_discount"])) == Decimal("25.00")
+    assert Decimal(str(by_product[pids[1]]["projected_discount"])) == Decimal("15.00")
+    assert Decimal(str(report["totals"]["projected_revenue"])) == Decimal("25.00")
+    assert Decimal(str(report["totals"]["margin_impact"])) == Decimal("-40.00")
+    assert [c["category"] for c in report["categories"]] == ["SimA"]
+
+    assert client.post("/api/transactions/analytics/promotion-simulations", json={**body, "discount_type": "PERCENTAGE", "discount_value": "150"}, headers=h).status_code == 422
+    assert client.get("/api/transactions/analytics/promotion-simulations/nope", headers=h).status_code == 404
+
+    # A job submitted through another worker is visible to this one's poll.
+    with db.engine.begin() as conn:
+        conn.execute(insert(SimulationJob), {"job_id": "elsewhere", "scenario": body, "status": "running", "progress": 0.5, "created_at": datetime.now(timezone.utc)})
+    job = client.get("/api/transactions/analytics/promotion-simulations/elsewhere", headers=h).json()
+    assert (job["status"], job["progress"]) == ("running", 0.5)
@@ -0,0 +1,105 @@
+from array import array
+from dataclasses import dataclass
+from decimal import Decimal
+from sqlmodel import Session, select
+from ..models.product import Product
+from .catalog import ProductIndex
+from .promotion_index import promotion_index
+from .sql import chunked
+
+
+CENT = Decimal("0.01")
+
+
+@dataclass(slots=True)
+class ScanResult:
+    product_id: int
+    barcode: str
+    name: str
+    selling_price: Decimal
+    stock_quantity: int
+    promotion_id: int | None = None
+    promotion_name: str | None = None
+    discount_type: str | None = None
+    discount_value: Decimal | None = None
+
+
+class BarcodeIndex(ProductIndex):
+    """Barcode -> price lookup held in parallel arrays.
+
+    Each product occupies one slot; prices are stored as integer cents. Freed slots are
+    reused so the arrays stay dense under churn. Promotions come from the promotion index.
+    Stock changes with every sale on any worker, so it is read from the database per scan.
+    """
+
+    columns = (Product.product_id, Product.barcode, Product.name, Product.selling_price)
+
+    def _clear(self) -> None:
+        self._slot_of: dict[str, int] = {}
+        self._slot_of_id: dict[int, int] = {}
+        self._ids = array("q")
+        self._price_cents = array("q")
+        self._barcodes: list[str | None] = []
+        self._names: list[str] = []
+        self._free: list[int] = []
+
+    def _add(self, row) -> None:
+        pid, barcode, name, price = row
+        values = (pid, int((Decimal(price) * 100).to_integral_value()))
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot], self._price_cents[slot] = values
+            self._barcodes[slot] = barcode
+            self._names[slot] = name
+        else:
+            slot = len(self._ids)
+            for arr, value in zip((self._ids, self._price_cents), values):
+                arr.append(value)
+            self._barcodes.append(barcode)
+            self._names.append(name)
+        self._slot_of[barcode] = slot
+        self._slot_of_id[pid] = slot
+
+    def _remove(self, product_id: int) -> None:
+        slot = self._slot_of_id.pop(product_id, None)
+        if slot is None:
+            return
+        self._slot_of.pop(self._barcodes[slot], None)
+        self._barcodes[slot] = None
+        self._names[slot] = ""
+        self._free.append(slot)
+
+    def lookup_many(self, session: Session, barcodes: list[str]) -> tuple[list[ScanResult], list[str]]:
+        self.sync(session)
+        found: list[ScanResult] = []
+        missing: list[str] = []
+        with self._lock:
+            for barcode in barcodes:
+                slot = self._slot_of.get(barcode)
+                if slot is None:
+                    missing.append(barcode)
+                    continue
+                found.append(ScanResult(
+                    product_id=self._ids[slot],
+                    barcode=barcode,
+                    name=self._names[slot],
+                    selling_price=(Decimal(self._price_cents[slot]) * CENT),
+                    stock_quantity=0,
+                ))
+        ids = [r.product_id for r in found]
+        stock: dict[int, int] = {}
+        for chunk in chunked(sorted(set(ids))):
+            stock.update(session.exec(select(Product.product_id, Product.stock_quantity).where(Product.product_id.in_(chunk))).all())
+        promos = promotion_index.get_many(session, ids)
+        for result in found:
+            result.stock_quantity = stock.get(result.product_id, 0)
+            promo = promos.get(result.product_id)
+            if promo is not None:
+                result.promotion_id = promo.promotion_id
+                result.promotion_name = promo.promotion_name
+                result.discount_type = promo.discount_type
+                result.discount_value = promo.discount_value
+        return found, missing
+
+
+barcode_index = BarcodeIndex()
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable
+from . import metrics
+
+
+_MISSING = object()
+
+
+named_caches: dict[str, "LRUCache"] = {}
+
+
+class LRUCache:
+    """Small thread-safe LRU cache with an optional per-entry TTL (seconds).
+
+    Caches given a ``name`` report hits, misses and size in the metrics.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None, name: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        if name:
+            named_caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires = monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _per_cache(read):
+    return lambda: {name: read(cache) for name, cache in list(named_caches.items())}
+
+
+metrics.gauge("cache_hits_total", _per_cache(lambda c: c.hits), "Lookups served from an in-process cache", ("cache",), kind="counter")
+metrics.gauge("cache_misses_total", _per_cache(lambda c: c.misses), "Lookups that missed an in-process cache", ("cache",), kind="counter")
+metrics.gauge("cache_entries", _per_cache(len), "Entries held by an in-process cache", ("cache",))
@@ -0,0 +1,228 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from threading import RLock
+from time import monotonic
+from typing import Callable, Iterable
+from sqlalchemy import delete, event, func, insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+from ..config.settings import settings
+from ..models.product import Product
+from ..models.catalog_change_log import CatalogChangeLog
+from .sql import chunked
+
+
+# Versions are allocated at insert time but become visible at commit time, so readers of the
+# log re-read a few versions below the last one they saw to cover out-of-order commits.
+DELTA_OVERLAP = 50
+
+
+@dataclass
+class CatalogChange:
+    """Ids touched by a committed write; ``None`` means "everything of that kind"."""
+    products: set[int] | None = field(default_factory=set)
+    promotions: set[int] | None = field(default_factory=set)
+    rules: set[int] | None = field(default_factory=set)
+
+
+_listeners: list[Callable[[CatalogChange], None]] = []
+
+
+def subscribe(listener: Callable[[CatalogChange], None]) -> Callable[[CatalogChange], None]:
+    _listeners.append(listener)
+    return listener
+
+
+def _merge(current: set[int] | None, ids: Iterable[int] | None) -> set[int] | None:
+    if current is None or ids is None:
+        return None
+    current.update(int(i) for i in ids)
+    return current
+
+
+def catalog_changed(session: Session, products: Iterable[int] | None = (), promotions: Iterable[int] | None = (), rules: Iterable[int] | None = ()) -> None:
+    """Record catalog writes made in ``session``; listeners are notified once it commits.
+
+    Changes also append to the catalog change log, which bumps the catalog version used by
+    POS delta sync and lets other workers' indexes follow the write. Rules are server-side
+    only, so delta sync skips their log entries. Stock is not part of the catalog: it moves
+    on every sale, so in-process indexes never hold it and read it from the database.
+    """
+    products, promotions, rules = (None if ids is None else [int(i) for i in ids] for ids in (products, promotions, rules))
+    now = datetime.now(timezone.utc)
+    rows = []
+    for entity, ids in (("product", products), ("promotion", promotions), ("rule", rules)):
+        if ids is None:
+            rows.append({"entity": entity, "entity_id": None, "changed_at": now})
+        else:
+            rows.extend({"entity": entity, "entity_id": i, "changed_at": now} for i in ids)
+    if rows:
+        session.execute(insert(CatalogChangeLog), rows)
+    pending: CatalogChange = session.info.setdefault("catalog_change", CatalogChange())
+    pending.products = _merge(pending.products, products)
+    pending.promotions = _merge(pending.promotions, promotions)
+    pending.rules = _merge(pending.rules, rules)
+
+
+def current_version(session: Session) -> int:
+    return session.exec(select(func.coalesce(func.max(CatalogChangeLog.version), 0))).one()
+
+
+def prune_change_log(session: Session, retention_days: int = 30) -> int:
+    """Drop change-log rows older than the retention window, always keeping the latest.
+
+    Terminals whose version predates the oldest remaining row are told to resync fully.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    latest = current_version(session)
+    result = session.execute(delete(CatalogChangeLog).where(CatalogChangeLog.changed_at < cutoff, CatalogChangeLog.version < latest))
+    session.commit()
+    return result.rowcount or 0
+
+
+def notify(change: CatalogChange) -> None:
+    for listener in list(_listeners):
+        listener(change)
+
+
+class ChangeLogFollower:
+    """Replays change-log entries to the listeners, so indexes see other workers' writes.
+
+    This worker's own writes reach the listeners through the after-commit hook; writes
+    committed by other processes only show up in the log. ``poll`` is one query for the
+    entries above the newest version seen, overlapping the last ``DELTA_OVERLAP`` versions,
+    and skips entries it has already replayed. Polls within
+    ``settings.catalog_poll_interval_seconds`` of the previous one are skipped, so other
+    workers' writes show up after at most that delay.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._bind = None
+        self._version = 0
+        self._seen: set[int] = set()
+        self._polled_at = 0.0
+
+    def poll(self, session: Session) -> None:
+        bind = session.get_bind()
+        now = monotonic()
+        with self._lock:
+            first = bind is not self._bind
+            if not first and now - self._polled_at < settings.catalog_poll_interval_seconds:
+                return
+            self._polled_at = now
+            if first:
+                low = select(func.coalesce(func.max(CatalogChangeLog.version), 0) - DELTA_OVERLAP).scalar_subquery()
+            else:
+                low = max(self._version - DELTA_OVERLAP, 0)
+            rows = session.exec(
+                select(CatalogChangeLog.version, CatalogChangeLog.entity, CatalogChangeLog.entity_id).where(CatalogChangeLog.version > low)
+            ).all()
+            if first:
+                # Indexes load from this engine after the first poll, so these are already reflected.
+                self._bind = bind
+                self._version = 0
+                self._seen = set()
+                fresh = []
+            else:
+                fresh = [row for row in rows if row[0] not in self._seen]
+            self._seen.update(version for version, _, _ in rows)
+            self._version = max(self._seen, default=self._version)
+            self._seen = {v for v in self._seen if v > self._version - DELTA_OVERLAP}
+        if not fresh:
+            return
+        change = CatalogChange()
+        for _, entity, entity_id in fresh:
+            ids = None if entity_id is None else [entity_id]
+            if entity == "product":
+                change.products = _merge(change.products, ids)
+            elif entity == "promotion":
+                change.promotions = _merge(change.promotions, ids)
+            elif entity == "rule":
+                change.rules = _merge(change.rules, ids)
+        # Outside the lock: listeners take their own index locks.
+        notify(change)
+
+
+change_log = ChangeLogFollower()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _after_commit(session):
+    change = session.info.pop("catalog_change", None)
+    if change is not None:
+        notify(change)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("catalog_change", None)
+
+
+class ProductIndex(ABC):
+    """Base for in-process indexes over the product table.
+
+    The index is loaded lazily from the session's database on first use, and rows named in
+    a catalog change are reloaded on the next ``sync`` instead of rebuilding everything.
+    An index is tied to the engine it was loaded from and reloads if that changes.
+    """
+
+    columns: tuple = (Product.product_id, Product.name)
+
+    def __init__(self):
+        self._lock = RLock()
+        self._bind = None
+        self._loaded = False
+        self._stale: set[int] = set()
+        subscribe(self._on_catalog_change)
+
+    def _on_catalog_change(self, change: CatalogChange) -> None:
+        changed = change.products
+        with self._lock:
+            if changed is None:
+                self._loaded = False
+            else:
+                self._stale |= changed
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._stale = set()
+
+    def sync(self, session: Session) -> None:
+        change_log.poll(session)
+        bind = session.get_bind()
+        with self._lock:
+            if not self._loaded or bind is not self._bind:
+                self._stale = set()
+                self._clear()
+                for row in session.exec(select(*self.columns)).all():
+                    self._add(row)
+                self._after_full_load()
+                self._bind = bind
+                self._loaded = True
+                return
+            if not self._stale:
+                return
+            stale, self._stale = self._stale, set()
+            for pid in stale:
+                self._remove(pid)
+            for chunk in chunked(list(stale)):
+                for row in session.exec(select(*self.columns).where(Product.product_id.in_(chunk))).all():
+                    self._add(row)
+
+    @abstractmethod
+    def _clear(self) -> None:
+        ...
+
+    def _after_full_load(self) -> None:
+        pass
+
+    @abstractmethod
+    def _add(self, row) -> None:
+        ...
+
+    @abstractmethod
+    def _remove(self, product_id: int) -> None:
+        ...
@@ -1,15 +1,38 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import monotonic
 from fastapi import Depends, HTTPException, status, Request
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Connection
 from sqlmodel import Session, select
 import jwt
+from .. import db
 from ..config.settings import settings
 from ..models.user import User
+from ..models.token_revocation import TokenRevocation
 from ..db import get_session
+from .cache import LRUCache
+from .sql import dialect_insert
 
 
-def create_access_token(user_uid: str) -> str:
-    exp = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
-    payload = {"sub": user_uid, "exp": exp}
+# Column values of authenticated users by uid. Changes made in this worker evict
+# immediately; other workers pick them up when the entry expires.
+user_cache = LRUCache(maxsize=4096, ttl=settings.user_cache_ttl_seconds, name="user")
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The caller as described by their token, for routes that only need uid and role."""
+    uid: str
+    role: str
+
+
+def create_access_token(user_uid: str, role: str, is_active: bool = True) -> str:
+    now = datetime.now(timezone.utc)
+    exp = now + timedelta(minutes=settings.access_token_expire_minutes)
+    # Sub-second iat so a token issued right after a revocation is not caught by it.
+    payload = {"sub": user_uid, "role": role, "active": is_active, "iat": now.timestamp(), "exp": exp}
     token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
     return token
 
@@ -18,20 +41,133 @@ def decode_access_token(token: str) -> dict:
     return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
 
 
-def get_current_user(request: Request, session: Session = Depends(get_session)) -> User:
+class RevocationList:
+    """Per-user revocation cutoffs held in memory and reloaded every ``refresh_seconds``.
+
+    The table has one row per user whose tokens were ever revoked, so the whole list is
+    small enough to keep; revocations made in this worker apply immediately.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._cutoffs: dict[str, float] = {}
+        self._loaded_at: float | None = None
+        self._engine = None
+        self._lock = Lock()
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if self._loaded_at is not None and self._engine is db.engine and monotonic() - self._loaded_at < self.refresh_seconds:
+                return
+            # Outside any request session, one per worker at a time under the lock;
+            # ``threadpool_reserved_connections`` counts its connection.
+            with Session(db.engine) as session:
+                rows = session.exec(select(TokenRevocation.uid, TokenRevocation.revoked_at)).all()
+            self._cutoffs = {uid: _timestamp(at) for uid, at in rows}
+            self._engine = db.engine
+            self._loaded_at = monotonic()
+
+    def cutoff(self, uid: str) -> float | None:
+        self._refresh()
+        return self._cutoffs.get(uid)
+
+    def add(self, uid: str, revoked_at: datetime) -> None:
+        with self._lock:
+            self._cutoffs[uid] = _timestamp(revoked_at)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+
+revocations = RevocationList(settings.token_revocation_refresh_seconds)
+
+
+def _timestamp(value: datetime) -> float:
+    return (value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value).timestamp()
+
+
+def revoke_tokens(bind: Session | Connection, uid: str) -> None:
+    """Invalidate every token issued to ``uid`` so far. Does not commit."""
+    now = datetime.now(timezone.utc)
+    table = TokenRevocation.__table__
+    stmt = dialect_insert(bind)(table).values(uid=uid, revoked_at=now)
+    bind.execute(stmt.on_conflict_do_update(index_elements=[table.c.uid], set_={"revoked_at": stmt.excluded.revoked_at}))
+    revocations.add(uid, now)
+
+
+def _token_claims(request: Request) -> dict | None:
+    state = request.scope.get("state", {})
+    if "token_claims" in state:
+        return state["token_claims"]
+    # Not behind AuthMiddleware: decode here.
     auth = request.headers.get("Authorization")
     if not auth or not auth.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    token = auth.split(" ", 1)[1]
+        return None
     try:
-        payload = decode_access_token(token)
+        return decode_access_token(auth.split(" ", 1)[1])
     except Exception:
+        return None
+
+
+def _verified_claims(request: Request) -> dict:
+    auth = request.headers.get("Authorization")
+    if not auth or not auth.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    claims = _token_claims(request)
+    if not claims or claims.get("sub") is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    sub = payload.get("sub")
-    if sub is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    statement = select(User).where(User.uid == sub)
-    user = session.exec(statement).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    return user
+    if claims.get("active") is False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
+    cutoff = revocations.cutoff(claims["sub"])
+    if cutoff is not None and claims.get("iat", 0) < cutoff:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    return claims
+
+
+def _load_user(session: Session, uid: str) -> User:
+    fields = user_cache.get(uid)
+    if fields is None:
+        user = session.exec(select(User).where(User.uid == uid)).first()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        user_cache.set(uid, user.model_dump())
+        return user
+    # A fresh detached instance per request, so cached state is never shared or mutated.
+    return User.model_validate(fields)
+
+
+def get_principal(request: Request, session: Session = Depends(get_session)) -> Principal:
+    """Authorize from token claims alone: no user query.
+
+    Tokens issued before role claims existed fall back to loading the user through the
+    request's own session, so the request never holds a second connection.
+    """
+    claims = _verified_claims(request)
+    role = claims.get("role")
+    if role is None:
+        role = _load_user(session, claims["sub"]).role
+    return Principal(uid=claims["sub"], role=role)
+
+
+def get_current_user(request: Request, session: Session = Depends(get_session)) -> User:
+    """The full ``User`` row, for endpoints that need more than uid and role."""
+    return _load_user(session, _verified_claims(request)["sub"])
+
+
+def forget_user(uid: str) -> None:
+    user_cache.pop(uid)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_user(mapper, connection, target: User) -> None:
+    forget_user(target.uid)
+
+
+@event.listens_for(User, "after_update")
+def _revoke_on_claim_change(mapper, connection, target: User) -> None:
+    """Tokens carry role and active status; changing either invalidates outstanding tokens."""
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        revoke_tokens(connection, target.uid)
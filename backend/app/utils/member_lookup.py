@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable
+from sqlalchemy import func, or_, text
+from sqlmodel import Session, select
+from ..models.member import Member
+from .cache import LRUCache
+
+
+LOOKUP_LIMIT = 10
+MIN_PARTIAL_DIGITS = 3
+
+# Pattern-ops indexes make LIKE 'prefix%' indexable on Postgres; the reversed phone turns
+# suffix searches ("last four digits") into prefix searches.
+LOOKUP_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_member_phone_prefix ON member (phone varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_member_phone_suffix ON member (reverse(phone) varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_member_name_prefix ON member (lower(name) varchar_pattern_ops)",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class MemberBrief:
+    member_id: int
+    name: str
+    phone: str
+    membership_rank: str
+    discount_rate: Decimal
+
+
+# Recently seen members by phone and by id, for the lane lookup. Entries expire so tier
+# changes made by other workers show up within a few minutes; this worker's own changes call
+# ``forget``. Pricing never reads it: the discount rate charged must be the current one.
+member_cache = LRUCache(maxsize=20000, ttl=300, name="member")
+
+
+def ensure_member_indexes(engine) -> None:
+    """Create the lookup indexes that the ORM metadata cannot express (Postgres only)."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for ddl in LOOKUP_DDL:
+            conn.execute(text(ddl))
+
+
+def _brief(m: Member) -> MemberBrief:
+    return MemberBrief(m.member_id, m.name, m.phone, m.membership_rank, Decimal(m.discount_rate))
+
+
+def _remember(brief: MemberBrief) -> MemberBrief:
+    member_cache.set(("phone", brief.phone), brief)
+    member_cache.set(("id", brief.member_id), brief)
+    return brief
+
+
+def forget(members: Iterable[MemberBrief | Member]) -> None:
+    for m in members:
+        member_cache.pop(("phone", m.phone))
+        member_cache.pop(("id", m.member_id))
+
+
+def resolve_member(session: Session, member_id: int | None = None, phone: str | None = None, cached: bool = True) -> MemberBrief | None:
+    """Find a member by id or exact phone, from the cache when possible.
+
+    ``cached=False`` always reads the row (a primary-key or unique-index hit) and refreshes
+    the cache with it.
+    """
+    key = ("id", member_id) if member_id is not None else ("phone", phone)
+    brief = member_cache.get(key) if cached else None
+    if brief is not None:
+        return brief
+    cond = Member.member_id == member_id if member_id is not None else Member.phone == phone
+    m = session.exec(select(Member).where(cond)).first()
+    return _remember(_brief(m)) if m is not None else None
+
+
+def _prefix_pattern(value: str) -> str:
+    # A literal pattern (rather than ``startswith``'s ``:p || '%'``) lets Postgres use the
+    # pattern-ops indexes.
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def lookup_members(session: Session, q: str, limit: int = LOOKUP_LIMIT) -> list[MemberBrief]:
+    """Identify a member at the lane.
+
+    A full phone number is an exact (cached) match; at least three digits match phone
+    prefixes or suffixes; anything else matches the start of the name.
+    """
+    q = q.strip()
+    if q.isdigit() and len(q) == 10:
+        brief = resolve_member(session, phone=q)
+        return [brief] if brief is not None else []
+    if q.isdigit():
+        if len(q) < MIN_PARTIAL_DIGITS:
+            return []
+        if session.get_bind().dialect.name == "postgresql":
+            suffix = func.reverse(Member.phone).like(q[::-1] + "%")
+        else:
+            suffix = Member.phone.like("%" + q)
+        cond = or_(Member.phone.like(q + "%"), suffix)
+    else:
+        cond = func.lower(Member.name).like(_prefix_pattern(q.lower()), escape="\\")
+    members = session.exec(select(Member).where(cond).order_by(Member.name, Member.member_id).limit(limit)).all()
+    return [_remember(_brief(m)) for m in members]
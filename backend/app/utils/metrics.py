@@ -0,0 +1,380 @@
+"""In-process counters, gauges and histograms, optionally labelled.
+
+Each worker keeps its own values in memory. With ``metrics_dir`` configured, workers also
+flush them to a per-process file there, and ``render_prometheus`` merges every worker's
+file so whichever worker answers a scrape reports totals for all of them. Counters and
+histograms of exited workers keep counting toward the totals; their gauges are dropped.
+"""
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Iterable
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def state(self) -> dict:
+        return {"value": self.value}
+
+
+class _GaugeValue(_CounterValue):
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class _HistogramValue:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def state(self) -> dict:
+        with self._lock:
+            return {"counts": list(self.counts), "count": self.count, "sum": self.sum, "max": self.max}
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str = "", labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = Lock()
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def labels(self, *values) -> object:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def series(self) -> dict[tuple[str, ...], dict]:
+        return {key: child.state() for key, child in list(self._children.items())}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Histogram(_Metric):
+    """Latency (seconds) or size distribution over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS, help: str = "", labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    @property
+    def count(self) -> int:
+        return sum(s["count"] for s in self.series().values())
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; either set directly or read on demand via ``read``.
+
+    ``read`` returns a number, or a mapping of label values to numbers for labelled gauges.
+    ``kind`` may be "counter" for totals kept elsewhere (such as cache hit counts).
+    """
+
+    def __init__(self, name: str, read: Callable[[], object] | None = None, help: str = "", labelnames: tuple[str, ...] = (), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.read = read
+        self.kind = kind
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def series(self) -> dict[tuple[str, ...], dict]:
+        if self.read is None:
+            return super().series()
+        value = self.read()
+        if isinstance(value, dict):
+            return {tuple(str(v) for v in (k if isinstance(k, tuple) else (k,))): {"value": v} for k, v in value.items()}
+        return {(): {"value": value}}
+
+
+_registry: dict[str, _Metric] = {}
+_registry_lock = Lock()
+
+
+def _register(name: str, factory: Callable[[], _Metric]) -> _Metric:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = factory()
+        return metric
+
+
+def counter(name: str, help: str = "", labelnames: tuple[str, ...] = ()) -> Counter:
+    return _register(name, lambda: Counter(name, help, labelnames))
+
+
+def histogram(name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS, help: str = "", labelnames: tuple[str, ...] = ()) -> Histogram:
+    return _register(name, lambda: Histogram(name, buckets, help, labelnames))
+
+
+def gauge(name: str, read: Callable[[], object] | None = None, help: str = "", labelnames: tuple[str, ...] = (), kind: str = "gauge") -> Gauge:
+    """Register a gauge; registering a ``read`` callback again replaces the previous one."""
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is None or read is not None:
+            _registry[name] = Gauge(name, read, help, labelnames, kind)
+        return _registry[name]
+
+
+# --- Per-worker JSON view ---
+
+def _quantile(bounds: tuple[float, ...], state: dict, q: float) -> float | None:
+    """Upper bound of the bucket holding the ``q`` quantile."""
+    if not state["count"]:
+        return None
+    target = q * state["count"]
+    seen = 0
+    for bound, n in zip(bounds, state["counts"]):
+        seen += n
+        if seen >= target:
+            return bound
+    return state["max"]
+
+
+def _summary(metric: _Metric, state: dict) -> dict:
+    if metric.kind != "histogram":
+        return {"value": state["value"]}
+    count = state["count"]
+    return {
+        "count": count,
+        "avg": state["sum"] / count if count else None,
+        "p50": _quantile(metric.buckets, state, 0.5),
+        "p95": _quantile(metric.buckets, state, 0.95),
+        "max": state["max"],
+    }
+
+
+def snapshot() -> dict[str, dict]:
+    """This worker's metrics; unlabelled ones as a single summary, labelled ones as series."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    out: dict[str, dict] = {}
+    for metric in metrics:
+        series = metric.series()
+        if not metric.labelnames:
+            state = series.get(())
+            if state is None:
+                state = {"counts": [0] * (len(metric.buckets) + 1), "count": 0, "sum": 0.0, "max": 0.0} if metric.kind == "histogram" else {"value": 0}
+            out[metric.name] = _summary(metric, state)
+        else:
+            out[metric.name] = {"series": [{"labels": dict(zip(metric.labelnames, key)), **_summary(metric, state)} for key, state in series.items()]}
+    return out
+
+
+# --- Cross-worker export ---
+
+def export() -> dict:
+    """This worker's metrics in the file format merged by ``render_prometheus``."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    out = {}
+    for metric in metrics:
+        entry = {"kind": metric.kind, "help": metric.help, "labelnames": list(metric.labelnames), "series": [[list(k), s] for k, s in metric.series().items()]}
+        if metric.kind == "histogram":
+            entry["buckets"] = list(metric.buckets)
+        out[metric.name] = entry
+    return out
+
+
+def _metrics_file(directory: str, pid: int) -> Path:
+    return Path(directory) / f"metrics-{pid}.json"
+
+
+def flush(directory: str) -> None:
+    path = _metrics_file(directory, os.getpid())
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(export()))
+    os.replace(tmp, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_exports(directory: str | None) -> Iterable[tuple[dict, bool]]:
+    """(export, alive) for every worker; this worker's values are taken live."""
+    yield export(), True
+    if not directory:
+        return
+    for path in Path(directory).glob("metrics-*.json"):
+        pid = int(path.stem.split("-", 1)[1])
+        if pid == os.getpid():
+            continue
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        yield data, _alive(pid)
+
+
+def collect(directory: str | None = None) -> dict:
+    """Sum every worker's series; gauges count only for live workers."""
+    merged: dict[str, dict] = {}
+    for data, alive in _worker_exports(directory):
+        for name, entry in data.items():
+            if entry["kind"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**entry, "series": {}})
+            for key, state in entry["series"]:
+                key = tuple(key)
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = {k: (list(v) if isinstance(v, list) else v) for k, v in state.items()}
+                elif entry["kind"] == "histogram":
+                    current["counts"] = [a + b for a, b in zip(current["counts"], state["counts"])]
+                    current["count"] += state["count"]
+                    current["sum"] += state["sum"]
+                    current["max"] = max(current["max"], state["max"])
+                elif state["value"] is not None:
+                    current["value"] = (current["value"] or 0) + state["value"]
+    hits, misses = merged.get("cache_hits_total"), merged.get("cache_misses_total")
+    if hits and misses:
+        ratios = {}
+        for key, state in hits["series"].items():
+            looked_up = (state["value"] or 0) + (misses["series"].get(key, {}).get("value") or 0)
+            ratios[key] = {"value": (state["value"] or 0) / looked_up if looked_up else None}
+        merged["cache_hit_ratio"] = {"kind": "gauge", "help": "Share of cache lookups that hit, across workers", "labelnames": hits["labelnames"], "series": ratios}
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: list[str], values: tuple, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_prometheus(directory: str | None = None) -> str:
+    """All workers' metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for name, entry in sorted(collect(directory).items()):
+        kind, names = entry["kind"], entry["labelnames"]
+        if entry["help"]:
+            lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, state in sorted(entry["series"].items()):
+            if kind == "histogram":
+                cumulative = 0
+                for bound, n in zip([*entry["buckets"], float("inf")], state["counts"]):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(names, key, (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, key)} {_number(state['sum'])}")
+                lines.append(f"{name}_count{_labels(names, key)} {state['count']}")
+            elif state["value"] is not None:
+                lines.append(f"{name}{_labels(names, key)} {_number(state['value'])}")
+    return "\n".join(lines) + "\n"
+
+
+class Exporter:
+    """Flushes this worker's metrics to ``directory`` every ``interval`` seconds."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.directory: str | None = None
+
+    def start(self, directory: str, interval: float) -> None:
+        if self._thread is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        flush(self.directory)
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                flush(self.directory)
+            except OSError:
+                pass
+
+
+exporter = Exporter()
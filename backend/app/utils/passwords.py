@@ -0,0 +1,84 @@
+"""Password hashing in a dedicated, bounded process pool.
+
+pbkdf2 holds the GIL for its whole run, so hashing on the request threadpool stalls every
+other request on the worker during a login burst. Hashes run in separate processes
+instead; once ``password_hash_queue_limit`` calls are in flight new ones are refused with
+503 rather than queueing behind the storm.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from ..config.settings import settings
+from . import metrics
+
+
+@lru_cache(maxsize=4)
+def _context(rounds: int) -> CryptContext:
+    # Hashes made with any other round count are reported as needing an update.
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+        pbkdf2_sha256__max_rounds=rounds,
+    )
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> tuple[bool, str | None]:
+    return _context(rounds).verify_and_update(password, hashed)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = Lock()
+_slots = BoundedSemaphore(settings.password_hash_queue_limit)
+_latency = metrics.histogram("password_hash_seconds")
+_rejected = metrics.counter("password_hash_rejected")
+
+
+def _executor() -> ProcessPoolExecutor | None:
+    global _pool
+    if settings.password_hash_workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the server process has live threads and connections.
+            _pool = ProcessPoolExecutor(max_workers=settings.password_hash_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _run(func, *args):
+    if not _slots.acquire(blocking=False):
+        _rejected.inc()
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many sign-in attempts, retry shortly", headers={"Retry-After": "1"})
+    started = perf_counter()
+    try:
+        pool = _executor()
+        return func(*args) if pool is None else pool.submit(func, *args).result()
+    finally:
+        _slots.release()
+        _latency.observe(perf_counter() - started)
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password, settings.password_hash_rounds)
+
+
+def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """Check ``password``; the second value is a replacement hash when the stored one uses other rounds."""
+    return _run(_verify_and_update, password, hashed, settings.password_hash_rounds)
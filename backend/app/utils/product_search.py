@@ -0,0 +1,189 @@
+import logging
+import unicodedata
+from collections import Counter
+from sqlalchemy import case, func, literal, or_, text
+from sqlmodel import Session, select
+from ..models.product import Product
+from .cache import LRUCache
+from .catalog import CatalogChange, ProductIndex, change_log, subscribe
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LIMIT = 50
+MIN_SCORE = 0.3
+
+TRGM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_product_brand_trgm ON product USING gin (brand gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_product_category_trgm ON product USING gin (category gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_product_barcode_prefix ON product (barcode varchar_pattern_ops)",
+)
+
+_trgm_available = False
+
+
+def ensure_search_indexes(engine) -> None:
+    """Create the pg_trgm extension and GIN indexes used by product search (Postgres only)."""
+    global _trgm_available
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            for ddl in TRGM_DDL:
+                conn.execute(text(ddl))
+        _trgm_available = True
+    except Exception:
+        _trgm_available = False
+        logger.warning("pg_trgm unavailable; product search falls back to ILIKE", exc_info=True)
+
+
+def normalize(value: str | None) -> str:
+    if not value:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", value).casefold().split())
+
+
+def trigrams(value: str) -> set[str]:
+    """Word trigrams padded the way pg_trgm pads them, so both backends rank alike."""
+    grams: set[str] = set()
+    for word in value.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NGramIndex(ProductIndex):
+    """Trigram inverted index over product name, brand and category (SQLite fallback)."""
+
+    columns = (Product.product_id, Product.barcode, Product.name, Product.brand, Product.category)
+
+    def _clear(self) -> None:
+        self._postings: dict[str, set[int]] = {}
+        self._docs: dict[int, tuple[str, str, str]] = {}
+
+    def _add(self, row) -> None:
+        pid, barcode, name, brand, category = row
+        name_n = normalize(name)
+        text_n = " ".join(x for x in (name_n, normalize(brand), normalize(category)) if x)
+        self._docs[pid] = (barcode, name_n, text_n)
+        for gram in trigrams(text_n):
+            self._postings.setdefault(gram, set()).add(pid)
+
+    def _remove(self, product_id: int) -> None:
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        for gram in trigrams(doc[2]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, session: Session, q: str, limit: int) -> list[int]:
+        self.sync(session)
+        qn = normalize(q)
+        grams = trigrams(qn)
+        with self._lock:
+            hits: Counter = Counter()
+            for gram in grams:
+                hits.update(self._postings.get(gram, ()))
+            scored: list[tuple[float, str, int]] = []
+            floor = len(grams) * MIN_SCORE
+            candidates = {pid for pid, n in hits.items() if n >= floor}
+            if any(ch.isdigit() for ch in q):
+                candidates.update(pid for pid, doc in self._docs.items() if doc[0].startswith(q))
+            for pid in candidates:
+                barcode, name_n, text_n = self._docs[pid]
+                score = hits[pid] / len(grams) if grams else 0.0
+                if barcode == q:
+                    score += 3.0
+                elif barcode.startswith(q):
+                    score += 2.0
+                if name_n.startswith(qn):
+                    score += 1.0
+                elif qn in text_n:
+                    score += 0.5
+                if score >= MIN_SCORE:
+                    scored.append((-score, name_n, pid))
+        scored.sort()
+        return [pid for _, _, pid in scored[:limit]]
+
+
+_ngram_index = NGramIndex()
+_query_cache = LRUCache(maxsize=2048, name="product_search")
+
+
+@subscribe
+def _drop_cached_queries(change: CatalogChange) -> None:
+    if change.products is None or change.products:
+        _query_cache.clear()
+
+
+def _search_postgres(session: Session, q: str, limit: int) -> list[int]:
+    if not _trgm_available:
+        pattern = f"%{q}%"
+        stmt = select(Product.product_id, Product.name).where(
+            or_(
+                Product.name.ilike(pattern),
+                Product.brand.ilike(pattern),
+                Product.category.ilike(pattern),
+                Product.barcode.ilike(pattern),
+            )
+        ).order_by(Product.name).limit(limit)
+        return [row[0] for row in session.exec(stmt).all()]
+    term = literal(q)
+    score = func.greatest(
+        func.word_similarity(term, Product.name),
+        func.word_similarity(term, func.coalesce(Product.brand, "")),
+        func.word_similarity(term, func.coalesce(Product.category, "")),
+    )
+    barcode_rank = case((Product.barcode == q, 2), (Product.barcode.like(f"{q}%"), 1), else_=0)
+    stmt = (
+        select(Product.product_id, score.label("score"))
+        .where(
+            or_(
+                term.op("<%")(Product.name),
+                term.op("<%")(Product.brand),
+                term.op("<%")(Product.category),
+                Product.name.ilike(f"%{q}%"),
+                Product.barcode.like(f"{q}%"),
+            )
+        )
+        .order_by(barcode_rank.desc(), score.desc(), Product.name)
+        .limit(limit)
+    )
+    return [row[0] for row in session.exec(stmt).all()]
+
+
+def search_product_ids(session: Session, q: str, limit: int = SEARCH_LIMIT) -> list[int]:
+    """Return product ids matching ``q`` ranked by relevance; tolerant of small typos.
+
+    Results are cached per query until a catalog change drops the cache; the change-log poll
+    runs first so other workers' edits drop it too.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    change_log.poll(session)
+    bind = session.get_bind()
+    key = (id(bind), normalize(q), q, limit)
+    ids = _query_cache.get(key)
+    if ids is None:
+        if bind.dialect.name == "postgresql":
+            ids = _search_postgres(session, q, limit)
+        else:
+            ids = _ngram_index.search(session, q, limit)
+        _query_cache.set(key, ids)
+    return ids
+
+
+def search_products(session: Session, q: str, limit: int = SEARCH_LIMIT) -> list[Product]:
+    ids = search_product_ids(session, q, limit)
+    if not ids:
+        return []
+    rows = session.exec(select(Product).where(Product.product_id.in_(ids))).all()
+    by_id = {p.product_id: p for p in rows}
+    return [by_id[pid] for pid in ids if pid in by_id]
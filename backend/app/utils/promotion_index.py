@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+from sqlmodel import Session, select
+from ..models.product import Product
+from ..models.promotion import Promotion
+from .catalog import CatalogChange, ProductIndex
+
+
+@dataclass(frozen=True, slots=True)
+class ActivePromotion:
+    promotion_id: int
+    promotion_name: str
+    discount_type: str
+    discount_value: Decimal
+
+
+class PromotionIndex(ProductIndex):
+    """Product id -> promotion in effect today.
+
+    Product assignments are kept in sync like the other product indexes; promotions are
+    reloaded whenever any of them changes, in this worker or (through the change log) another. The effective map is recomputed when either
+    side changes or the local date rolls over, so a lookup is a dictionary hit with no
+    date checks or queries.
+    """
+
+    columns = (Product.product_id, Product.promotion_id)
+
+    def _clear(self) -> None:
+        self._assigned: dict[int, int] = {}
+        self._effective: dict[int, ActivePromotion] = {}
+        self._promotions: dict[int, tuple[ActivePromotion, date, date, bool]] = {}
+        self._active: dict[int, ActivePromotion] = {}
+        self._promos_loaded = False
+        self._day: date | None = None
+
+    def _add(self, row) -> None:
+        pid, promo_id = row
+        if promo_id is None:
+            return
+        self._assigned[pid] = promo_id
+        active = self._active.get(promo_id)
+        if active is not None:
+            self._effective[pid] = active
+
+    def _remove(self, product_id: int) -> None:
+        self._assigned.pop(product_id, None)
+        self._effective.pop(product_id, None)
+
+    def _on_catalog_change(self, change: CatalogChange) -> None:
+        super()._on_catalog_change(change)
+        if change.promotions is None or change.promotions:
+            with self._lock:
+                self._promos_loaded = False
+
+    def sync(self, session: Session) -> None:
+        super().sync(session)
+        with self._lock:
+            if not self._promos_loaded:
+                self._promotions = {
+                    p.promotion_id: (
+                        ActivePromotion(p.promotion_id, p.promotion_name, p.discount_type, p.discount_value),
+                        p.start_date,
+                        p.end_date,
+                        p.is_active,
+                    )
+                    for p in session.exec(select(Promotion)).all()
+                }
+                self._promos_loaded = True
+                self._day = None
+            today = date.today()
+            if self._day != today:
+                self._active = {
+                    promo_id: promo
+                    for promo_id, (promo, start, end, is_active) in self._promotions.items()
+                    if is_active and start <= today <= end
+                }
+                self._effective = {
+                    pid: self._active[promo_id]
+                    for pid, promo_id in self._assigned.items()
+                    if promo_id in self._active
+                }
+                self._day = today
+
+    def get(self, session: Session, product_id: int) -> ActivePromotion | None:
+        self.sync(session)
+        return self._effective.get(product_id)
+
+    def get_many(self, session: Session, product_ids: Iterable[int]) -> dict[int, ActivePromotion]:
+        """Effective promotions for the given products; products without one are omitted."""
+        self.sync(session)
+        with self._lock:
+            return {pid: self._effective[pid] for pid in product_ids if pid in self._effective}
+
+
+promotion_index = PromotionIndex()
@@ -0,0 +1,109 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from threading import RLock
+from typing import Iterable
+from sqlmodel import Session, select
+from ..models.promotion_rule import PromotionRule, PromotionRuleProduct
+from .catalog import CatalogChange, change_log, subscribe
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRule:
+    rule_id: int
+    name: str
+    rule_type: str
+    products: dict[int, int]
+    start_date: date
+    end_date: date
+    buy_quantity: int | None = None
+    pay_quantity: int | None = None
+    bundle_price: Decimal | None = None
+    min_basket: Decimal | None = None
+    discount_type: str | None = None
+    discount_value: Decimal | None = None
+
+
+class PromotionRuleIndex:
+    """Active promotion rules compiled for cart evaluation.
+
+    Item rules (multi-buy, bundle) are indexed by product, so a cart only looks at rules
+    that mention its products; basket rules are kept sorted by threshold. Rules reload on
+    any rule change, including other workers' changes picked up from the catalog change
+    log, and the active set is recomputed when the local date rolls over.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._bind = None
+        self._loaded = False
+        self._day: date | None = None
+        self._rules: list[CompiledRule] = []
+        self._by_product: dict[int, list[CompiledRule]] = {}
+        self._basket: list[CompiledRule] = []
+        self._basket_mins: list[Decimal] = []
+        subscribe(self._on_catalog_change)
+
+    def _on_catalog_change(self, change: CatalogChange) -> None:
+        if change.rules is None or change.rules:
+            with self._lock:
+                self._loaded = False
+
+    def sync(self, session: Session) -> None:
+        change_log.poll(session)
+        bind = session.get_bind()
+        today = date.today()
+        with self._lock:
+            if not self._loaded or bind is not self._bind:
+                rules = session.exec(select(PromotionRule).where(PromotionRule.is_active == True, PromotionRule.end_date >= today)).all()
+                links: dict[int, dict[int, int]] = {r.rule_id: {} for r in rules}
+                if links:
+                    for rule_id, pid, qty in session.exec(
+                        select(PromotionRuleProduct.rule_id, PromotionRuleProduct.product_id, PromotionRuleProduct.quantity)
+                        .where(PromotionRuleProduct.rule_id.in_(list(links)))
+                    ).all():
+                        links[rule_id][pid] = qty
+                self._rules = [
+                    CompiledRule(
+                        rule_id=r.rule_id, name=r.name, rule_type=r.rule_type, products=links[r.rule_id],
+                        start_date=r.start_date, end_date=r.end_date,
+                        buy_quantity=r.buy_quantity, pay_quantity=r.pay_quantity, bundle_price=r.bundle_price,
+                        min_basket=r.min_basket, discount_type=r.discount_type, discount_value=r.discount_value,
+                    )
+                    for r in rules
+                ]
+                self._bind = bind
+                self._loaded = True
+                self._day = None
+            if self._day == today:
+                return
+            by_product: dict[int, list[CompiledRule]] = {}
+            basket: list[CompiledRule] = []
+            for rule in self._rules:
+                if not rule.start_date <= today <= rule.end_date:
+                    continue
+                if rule.rule_type == "BASKET":
+                    basket.append(rule)
+                    continue
+                for pid in rule.products:
+                    by_product.setdefault(pid, []).append(rule)
+            basket.sort(key=lambda r: r.min_basket)
+            self._by_product = by_product
+            self._basket = basket
+            self._basket_mins = [r.min_basket for r in basket]
+            self._day = today
+
+    def candidates(self, session: Session, product_ids: Iterable[int], basket_total: Decimal | None = None) -> tuple[list[CompiledRule], list[CompiledRule]]:
+        """Item rules touching ``product_ids`` and basket rules reachable at ``basket_total``."""
+        self.sync(session)
+        with self._lock:
+            seen: dict[int, CompiledRule] = {}
+            for pid in product_ids:
+                for rule in self._by_product.get(pid, ()):
+                    seen.setdefault(rule.rule_id, rule)
+            reachable = len(self._basket) if basket_total is None else bisect_right(self._basket_mins, basket_total)
+            return list(seen.values()), self._basket[:reachable]
+
+
+promotion_rule_index = PromotionRuleIndex()
@@ -0,0 +1,26 @@
+from typing import Iterator, Sequence, TypeVar
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+
+T = TypeVar("T")
+
+# Keeps IN lists and multi-row statements under driver parameter limits.
+CHUNK_SIZE = 500
+
+
+def chunked(items: Sequence[T], size: int = CHUNK_SIZE) -> Iterator[Sequence[T]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def dialect_insert(session: Session | Connection):
+    """Return the dialect's ``insert`` construct, which supports ON CONFLICT upserts."""
+    dialect = session.dialect.name if isinstance(session, Connection) else session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Upserts are not supported on {dialect}")
+    return insert
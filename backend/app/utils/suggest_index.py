@@ -0,0 +1,90 @@
+import heapq
+from bisect import bisect_left, insort
+from sqlmodel import Session
+from ..models.product import Product
+from .catalog import ProductIndex
+from .product_search import normalize
+
+
+# Match kinds, best first: whole-name prefix, later word in the name, brand, barcode.
+NAME, WORD, BRAND, BARCODE = KINDS = range(4)
+
+
+class PrefixIndex(ProductIndex):
+    """Sorted arrays of (normalized key, product_id), one per match kind, answering prefix
+    queries by bisection."""
+
+    columns = (Product.product_id, Product.barcode, Product.name, Product.brand)
+
+    def _clear(self) -> None:
+        self._entries: dict[int, list[tuple[str, int]]] = {kind: [] for kind in KINDS}
+        self._keys_of: dict[int, list[tuple[str, int, int]]] = {}
+        self._labels: dict[int, tuple[str, str | None]] = {}
+        self._building = True
+
+    @staticmethod
+    def _keys(pid: int, barcode: str, name: str, brand: str | None) -> list[tuple[str, int, int]]:
+        name_n = normalize(name)
+        keys = [(name_n, NAME, pid)]
+        words = name_n.split(" ")
+        keys.extend((" ".join(words[i:]), WORD, pid) for i in range(1, len(words)))
+        if brand:
+            keys.append((normalize(brand), BRAND, pid))
+        if barcode:
+            keys.append((barcode, BARCODE, pid))
+        return keys
+
+    def _add(self, row) -> None:
+        pid, barcode, name, brand = row
+        keys = self._keys(pid, barcode, name, brand)
+        self._keys_of[pid] = keys
+        self._labels[pid] = (name, brand)
+        for key, kind, _ in keys:
+            if self._building:
+                self._entries[kind].append((key, pid))
+            else:
+                insort(self._entries[kind], (key, pid))
+
+    def _after_full_load(self) -> None:
+        for entries in self._entries.values():
+            entries.sort()
+        self._building = False
+
+    def _remove(self, product_id: int) -> None:
+        self._labels.pop(product_id, None)
+        for key, kind, _ in self._keys_of.pop(product_id, ()):
+            entries = self._entries[kind]
+            i = bisect_left(entries, (key, product_id))
+            if i < len(entries) and entries[i] == (key, product_id):
+                del entries[i]
+
+    def _matches(self, kind: int, qn: str):
+        entries = self._entries[kind]
+        for i in range(bisect_left(entries, (qn,)), len(entries)):
+            key, pid = entries[i]
+            if not key.startswith(qn):
+                return
+            yield pid
+
+    def suggest(self, session: Session, q: str, limit: int = 10) -> list[tuple[int, str, str | None]]:
+        self.sync(session)
+        qn = normalize(q)
+        if not qn:
+            return []
+        with self._lock:
+            # A product ranks by its best kind, so kinds are taken best first and a worse
+            # kind is only read while the better ones have not filled the limit. Within a
+            # kind every match is ranked, shortest name first.
+            ranked: list[int] = []
+            seen: set[int] = set()
+            for kind in KINDS:
+                fresh = {pid for pid in self._matches(kind, qn) if pid not in seen}
+                best = heapq.nsmallest(limit - len(ranked), fresh, key=lambda pid: (len(self._labels[pid][0]), self._labels[pid][0], pid))
+                ranked.extend(best)
+                if len(ranked) >= limit:
+                    break
+                seen.update(fresh)
+            return [(pid, *self._labels[pid]) for pid in ranked]
+
+
+suggest_index = PrefixIndex()
@@ -0,0 +1,44 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from decimal import Decimal
+from sqlmodel import Session, select
+from ..models.membership_tier import MembershipTier
+from .cache import LRUCache
+
+
+@dataclass(frozen=True, slots=True)
+class TierInfo:
+    rank_name: str
+    min_spent: Decimal
+    max_spent: Decimal | None
+    discount_rate: Decimal
+
+
+# Tiers are a handful of rows edited by hand; a short TTL is enough to pick up changes.
+_cache = LRUCache(maxsize=1, ttl=60, name="tiers")
+
+
+def load_tiers(session: Session) -> list[TierInfo]:
+    """Membership tiers ordered by ``min_spent``, cached briefly."""
+    tiers = _cache.get("tiers")
+    if tiers is None:
+        tiers = [
+            TierInfo(t.rank_name, Decimal(t.min_spent), None if t.max_spent is None else Decimal(t.max_spent), Decimal(t.discount_rate))
+            for t in session.exec(select(MembershipTier).order_by(MembershipTier.min_spent)).all()
+        ]
+        _cache.set("tiers", tiers)
+    return tiers
+
+
+def invalidate_tiers() -> None:
+    _cache.clear()
+
+
+def resolve_tier(tiers: list[TierInfo], spent: Decimal) -> TierInfo | None:
+    """The tier whose [min_spent, max_spent] range holds ``spent``; the lowest tier otherwise."""
+    if not tiers:
+        return None
+    i = bisect_right([t.min_spent for t in tiers], spent) - 1
+    if i >= 0 and (tiers[i].max_spent is None or spent <= tiers[i].max_spent):
+        return tiers[i]
+    return tiers[0]
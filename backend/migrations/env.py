@@ -13,6 +13,18 @@ from app.models import transaction as transaction_model
 from app.models import transaction_item as transaction_item_model
 from app.models import cashier as cashier_model
 from app.models import manager as manager_model
+from app.models import catalog_change_log as catalog_change_log_model
+from app.models import stock_movement as stock_movement_model
+from app.models import stocktake as stocktake_model
+from app.models import stock_snapshot as stock_snapshot_model
+from app.models import promotion_rule as promotion_rule_model
+from app.models import member_spend as member_spend_model
+from app.models import member_tier_change as member_tier_change_model
+from app.models import points_ledger as points_ledger_model
+from app.models import member_stats as member_stats_model
+from app.models import token_revocation as token_revocation_model
+from app.models import job_run as job_run_model
+from app.models import simulation_job as simulation_job_model
 
 
 config = context.config
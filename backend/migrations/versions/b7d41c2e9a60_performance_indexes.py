@@ -0,0 +1,51 @@
+"""performance indexes
+
+Revision ID: b7d41c2e9a60
+Revises: 79b98888e4fe
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b7d41c2e9a60'
+down_revision = '79b98888e4fe'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, options). ix_transaction_member_date leads with member_id, so it
+# also serves plain member_id lookups and no separate member_id index is added.
+INDEXES = [
+    ("ix_transaction_date", "transaction", ["transaction_date"], {"postgresql_using": "brin"}),
+    ("ix_transaction_employee_id", "transaction", ["employee_id"], {}),
+    ("ix_transaction_member_date", "transaction", ["member_id", "transaction_date", "transaction_id"], {"postgresql_include": ["total_amount", "payment_method"]}),
+    ("ix_transactionitem_product_id", "transactionitem", ["product_id"], {}),
+    ("ix_product_promotion_id", "product", ["promotion_id"], {}),
+    ("ix_product_category", "product", ["category"], {}),
+]
+
+
+def upgrade():
+    # Existing databases were created by create_all, which may already have some of these.
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY keeps the tables writable while the indexes build; it cannot run
+        # inside a transaction.
+        with op.get_context().autocommit_block():
+            for name, table, columns, options in INDEXES:
+                op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options)
+    else:
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    if concurrently:
+        with op.get_context().autocommit_block():
+            for name, table, _, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    else:
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
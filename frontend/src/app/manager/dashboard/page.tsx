@@ -40,11 +40,9 @@ type ProfitData = {
   profit_margin: number
 }
 
-type Product = {
-  product_id: number
-  name: string
-  stock_quantity: number
-  min_stock: number
+type LowStockSummary = {
+  total: number
+  out_of_stock: number
 }
 
 const formatCurrency = (amount: number): string => `฿${amount.toFixed(2)}`
@@ -56,7 +54,7 @@ export default function ManagerDashboardPage() {
   const [paymentMethods, setPaymentMethods] = useState<PaymentMethod[]>([])
   const [categorySales, setCategorySales] = useState<CategorySales[]>([])
   const [profitData, setProfitData] = useState<ProfitData | null>(null)
-  const [products, setProducts] = useState<Product[]>([])
+  const [lowStock, setLowStock] = useState<LowStockSummary>({ total: 0, out_of_stock: 0 })
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
 
@@ -69,13 +67,13 @@ export default function ManagerDashboardPage() {
     try {
       const headers = { Authorization: `Bearer ${token}` }
       
-      const [productSalesData, dailySalesData, paymentData, categoryData, profitDataRes, productsData] = await Promise.all([
+      const [productSalesData, dailySalesData, paymentData, categoryData, profitDataRes, lowStockData] = await Promise.all([
         api.get("/api/transactions/analytics/product-sales", { headers }) as Promise<ProductSales[]>,
         api.get("/api/transactions/analytics/daily-sales?days=30", { headers }) as Promise<DailySales[]>,
         api.get("/api/transactions/analytics/payment-methods", { headers }) as Promise<PaymentMethod[]>,
         api.get("/api/transactions/analytics/category-sales", { headers }) as Promise<CategorySales[]>,
         api.get("/api/transactions/analytics/profit", { headers }) as Promise<ProfitData>,
-        api.get("/api/products") as Promise<any[]>
+        api.get("/api/products/low-stock?limit=1", { headers }) as Promise<LowStockSummary>
       ])
 
       setProductSales(productSalesData)
@@ -83,12 +81,7 @@ export default function ManagerDashboardPage() {
       setPaymentMethods(paymentData)
       setCategorySales(categoryData)
       setProfitData(profitDataRes)
-      setProducts(productsData.map(p => ({
-        product_id: p.product_id,
-        name: p.name,
-        stock_quantity: Number(p.stock_quantity),
-        min_stock: Number(p.min_stock),
-      })))
+      setLowStock({ total: lowStockData.total, out_of_stock: lowStockData.out_of_stock })
 
     } catch (e: any) {
       setError(e?.message || "Failed to load dashboard data")
@@ -102,7 +95,7 @@ export default function ManagerDashboardPage() {
   const analytics = useMemo(() => {
     const totalSales = productSales.reduce((sum, p) => sum + p.total_revenue, 0)
     const totalTransactions = dailySales.reduce((sum, d) => sum + d.transaction_count, 0)
-    const lowStockCount = products.filter(p => p.stock_quantity < p.min_stock).length
+    const lowStockCount = lowStock.total
     const avgDailySales = dailySales.length > 0 
       ? dailySales.reduce((sum, d) => sum + d.total_sales, 0) / dailySales.length 
       : 0
@@ -126,7 +119,7 @@ export default function ManagerDashboardPage() {
       maxDailySales,
       totalPaymentAmount
     }
-  }, [productSales, dailySales, products, paymentMethods])
+  }, [productSales, dailySales, lowStock, paymentMethods])
 
   if (loading) return (
     <div className="text-sm text-gray-600">Loading analytics...</div>
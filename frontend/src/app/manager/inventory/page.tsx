@@ -1,28 +1,14 @@
 "use client"
 
-import { useEffect, useState, useCallback, useMemo } from "react"
+import { useEffect, useState, useCallback } from "react"
 import { api } from "../../../lib/api"
 import { useAuth } from "../../../hooks/useAuth"
 
-type Product = { product_id: number; name: string; barcode: string; brand?: string | null; category?: string | null; selling_price: string | number; stock_quantity: number; min_stock: number }
-
-// Custom sorting function:
-// 1. Low stock items (stock_quantity < min_stock) come first.
-// 2. Then sort by difference (current stock - min threshold) ascending.
-function sortInventory(a: Product, b: Product): number {
-    const isLowA = a.stock_quantity < a.min_stock
-    const isLowB = b.stock_quantity < b.min_stock
-    
-    // Low stock items come first
-    if (isLowA && !isLowB) return -1; // A is low, B is OK, A comes first
-    if (!isLowA && isLowB) return 1;  // A is OK, B is low, B comes first
-
-    // If they have the same low/ok status, sort by difference (current stock - min threshold) ascending
-    const diffA = a.stock_quantity - a.min_stock
-    const diffB = b.stock_quantity - b.min_stock
-    
-    return diffA - diffB
-}
+type Product = { product_id: number; name: string; barcode: string; brand?: string | null; category?: string | null; stock_quantity: number; min_stock: number }
+
+type LowStockPage = { total: number; out_of_stock: number; items: Product[] }
+
+const PAGE_SIZE = 50
 
 export default function ManagerInventoryPage() {
   const { token } = useAuth()
@@ -34,22 +20,34 @@ export default function ManagerInventoryPage() {
   const [editStockId, setEditStockId] = useState<number | null>(null)
   const [newStock, setNewStock] = useState<number | null>(null)
   const [savingId, setSavingId] = useState<number | null>(null)
-
+  const [offset, setOffset] = useState(0)
+  const [lowStock, setLowStock] = useState({ total: 0, out_of_stock: 0 })
 
   const load = useCallback(async () => {
     setLoading(true)
     setErr(null)
     setOkMsg(null)
     try {
-      const path = q.trim() ? `/api/products?q=${encodeURIComponent(q.trim())}` : "/api/products"
-      const data = await api.get(path)
-      setItems((data as any[]).map((p) => ({
+      let rows: any[]
+      if (q.trim()) {
+        // Searching reaches any product, so stock can be corrected before it runs low.
+        rows = await api.get(`/api/products?q=${encodeURIComponent(q.trim())}`) as any[]
+      } else {
+        // The server filters and orders by shortfall from its low-stock index.
+        const page = await api.get(`/api/products/low-stock?limit=${PAGE_SIZE}&offset=${offset}`, {
+          headers: { Authorization: `Bearer ${token}` },
+        }) as LowStockPage
+        setLowStock({ total: page.total, out_of_stock: page.out_of_stock })
+        // Restocked products leave the list, which can empty the last page.
+        if (page.items.length === 0 && offset > 0) setOffset(Math.max(offset - PAGE_SIZE, 0))
+        rows = page.items
+      }
+      setItems(rows.map((p) => ({
         product_id: p.product_id,
         name: p.name,
         barcode: p.barcode,
         brand: p.brand,
         category: p.category,
-        selling_price: p.selling_price,
         stock_quantity: Number(p.stock_quantity),
         min_stock: Number(p.min_stock),
       })))
@@ -59,19 +57,15 @@ export default function ManagerInventoryPage() {
     } finally {
       setLoading(false)
     }
-  }, [q])
+  }, [q, offset, token])
 
   useEffect(() => {
+    if (!token) return
     const t = setTimeout(load, 250)
     return () => clearTimeout(t)
-  }, [q, load])
-
-  // Apply the custom sorting logic to the fetched items
-  const sortedItems = useMemo(() => {
-    if (items.length === 0) return items
-    return [...items].sort(sortInventory)
-  }, [items])
+  }, [q, load, token])
 
+  useEffect(() => { setOffset(0) }, [q])
 
   function startEditStock(p: Product) {
     setEditStockId(p.product_id)
@@ -122,6 +116,12 @@ export default function ManagerInventoryPage() {
         </div>
       </div>
 
+      {!q.trim() && (
+        <div className="text-sm text-gray-600">
+          {lowStock.total} products below minimum stock, {lowStock.out_of_stock} out of stock. Search to update any other product.
+        </div>
+      )}
+
       {err && <div className="text-sm text-red-600">{err}</div>}
       {okMsg && <div className="text-sm text-green-700">{okMsg}</div>}
 
@@ -129,7 +129,7 @@ export default function ManagerInventoryPage() {
         {loading ? (
           <div className="p-3 text-sm text-gray-600">Loading…</div>
         ) : items.length === 0 ? (
-          <div className="p-3 text-sm text-gray-600">No products</div>
+          <div className="p-3 text-sm text-gray-600">{q.trim() ? "No products" : "No low stock products"}</div>
         ) : (
           <table className="w-full text-sm">
             <thead>
@@ -144,13 +144,12 @@ export default function ManagerInventoryPage() {
               </tr>
             </thead>
             <tbody>
-              {/* Use sortedItems here */}
-              {sortedItems.map((p, index) => {
+              {items.map((p, index) => {
                 const low = p.stock_quantity < p.min_stock
                 const isEditing = p.product_id === editStockId
                 return (
                   <tr key={p.product_id} className={`border-t ${low ? "bg-red-50" : ""}`}>
-                    <td className="p-2">{index + 1}</td>
+                    <td className="p-2">{(q.trim() ? 0 : offset) + index + 1}</td>
                     <td className="p-2">{p.name}</td>
                     <td className="p-2">{p.barcode}</td>
                     <td className="p-2">
@@ -203,6 +202,14 @@ export default function ManagerInventoryPage() {
           </table>
         )}
       </div>
+
+      {!q.trim() && lowStock.total > PAGE_SIZE && (
+        <div className="flex items-center justify-end gap-2 text-sm">
+          <span className="text-gray-600">{offset + 1}–{Math.min(offset + PAGE_SIZE, lowStock.total)} of {lowStock.total}</span>
+          <button className="px-3 py-1 rounded border" onClick={() => setOffset(Math.max(offset - PAGE_SIZE, 0))} disabled={loading || offset === 0}>Previous</button>
+          <button className="px-3 py-1 rounded border" onClick={() => setOffset(offset + PAGE_SIZE)} disabled={loading || offset + PAGE_SIZE >= lowStock.total}>Next</button>
+        </div>
+      )}
     </div>
   )
 }
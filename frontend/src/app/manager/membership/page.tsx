@@ -17,28 +17,53 @@ type MemberSummary = {
   current_discount_rate: string | number
 }
 
+const PAGE_SIZE = 100
+
 export default function ManagerMembershipPage() {
   const { token } = useAuth()
   const [items, setItems] = useState<MemberSummary[]>([])
   const [loading, setLoading] = useState(false)
   const [err, setErr] = useState<string | null>(null)
   const [q, setQ] = useState("")
+  const [hasMore, setHasMore] = useState(false)
+
+  const fetchPage = useCallback(async (after?: number) => {
+    if (!token) throw new Error("Not signed in")
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) })
+    if (q.trim()) params.set("q", q.trim())
+    if (after !== undefined) params.set("after", String(after))
+    const data = (await api.get(`/api/members?${params}`, { headers: { Authorization: `Bearer ${token}` } })) as MemberSummary[]
+    setHasMore(data.length === PAGE_SIZE)
+    return data
+  }, [token, q])
 
   const load = useCallback(async () => {
     setLoading(true)
     setErr(null)
     try {
-      if (!token) throw new Error("Not signed in")
-      const url = q.trim() ? `/api/members?q=${encodeURIComponent(q.trim())}` : `/api/members`
-      const data = await api.get(url, { headers: { Authorization: `Bearer ${token}` } })
-      setItems(data as MemberSummary[])
+      setItems(await fetchPage())
     } catch (e: any) {
       setErr(e?.message || "Failed to load members")
       setItems([])
+      setHasMore(false)
     } finally {
       setLoading(false)
     }
-  }, [token, q])
+  }, [fetchPage])
+
+  const loadMore = useCallback(async () => {
+    if (items.length === 0) return
+    setLoading(true)
+    setErr(null)
+    try {
+      const next = await fetchPage(items[items.length - 1].member_id)
+      setItems((prev) => [...prev, ...next])
+    } catch (e: any) {
+      setErr(e?.message || "Failed to load members")
+    } finally {
+      setLoading(false)
+    }
+  }, [fetchPage, items])
 
   useEffect(() => { load() }, [load])
 
@@ -55,7 +80,7 @@ export default function ManagerMembershipPage() {
         <button className="px-3 py-2 rounded bg-black text-white" onClick={load} disabled={loading}>Refresh</button>
       </div>
       <div className="text-sm text-gray-600">
-        {loading ? "Loading…" : `Members: ${totals.count} · Rolling-year total: ฿${totals.totalRolling.toFixed(2)}`}
+        {loading ? "Loading…" : `Members shown: ${totals.count}${hasMore ? "+" : ""} · Rolling-year total: ฿${totals.totalRolling.toFixed(2)}`}
       </div>
       <div className="border rounded overflow-auto">
         {items.length === 0 ? (
@@ -91,6 +116,9 @@ export default function ManagerMembershipPage() {
           </table>
         )}
       </div>
+      {hasMore && (
+        <button className="px-3 py-2 rounded border" onClick={loadMore} disabled={loading}>Load more</button>
+      )}
       {err && <div className="text-sm text-red-600">{err}</div>}
     </div>
   )
@@ -27,6 +27,10 @@ type Product = {
   promotion_id?: number | null;
 }
 
+const PAGE_SIZE = 100
+// Only the columns the table, sort and edit form use.
+const LIST_FIELDS = 'barcode,name,brand,category,cost_price,selling_price,stock_quantity,min_stock,promotion_id'
+
 // Editable type
 type EditableProduct = Omit<Product, 'product_id' | 'barcode' | 'stock_quantity' | 'min_stock'> & { barcode: string }
 
@@ -49,6 +53,8 @@ export default function ManagerProductPage() {
   const [items, setItems] = useState<Product[]>([])
   const [promotions, setPromotions] = useState<Promotion[]>([])
   const [loading, setLoading] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [err, setErr] = useState<string | null>(null)
   const [okMsg, setOkMsg] = useState<string | null>(null)
 
@@ -78,9 +84,13 @@ export default function ManagerProductPage() {
     setErr(null)
     setOkMsg(null)
     try {
-      const path = q.trim() ? `/api/products?q=${encodeURIComponent(q.trim())}` : "/api/products"
-      const data = await api.get(path) 
-      setItems(data as Product[])
+      // Search returns its best matches in one response; the catalog is paged by cursor.
+      const path = q.trim()
+        ? `/api/products?q=${encodeURIComponent(q.trim())}&fields=${LIST_FIELDS}`
+        : `/api/products?limit=${PAGE_SIZE}&fields=${LIST_FIELDS}`
+      const page = await api.getPage(path)
+      setItems(page.data as Product[])
+      setNextCursor(q.trim() ? null : page.next)
       
       // Fetch Promotions
       const promoData = await api.get('/api/promotions', { headers: { Authorization: `Bearer ${token}` } })
@@ -93,6 +103,21 @@ export default function ManagerProductPage() {
     }
   }
 
+  async function loadMore() {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    setErr(null)
+    try {
+      const page = await api.getPage(`/api/products?limit=${PAGE_SIZE}&fields=${LIST_FIELDS}&after=${encodeURIComponent(nextCursor)}`)
+      setItems(prev => [...prev, ...(page.data as Product[])])
+      setNextCursor(page.next)
+    } catch (e: any) {
+      setErr(e?.message || 'Failed to load more products')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => { 
     const t = setTimeout(() => {
         if (token) load()
@@ -401,6 +426,13 @@ export default function ManagerProductPage() {
             </tbody>
           </table>
         )}
+        {!loading && nextCursor && (
+          <div className="flex justify-center pt-3">
+            <button className="px-3 py-1 rounded border" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading…' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
 
     </div>
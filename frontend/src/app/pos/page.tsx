@@ -25,6 +25,8 @@ type Product = {
   promotion_id?: number | null
 }
 
+type Suggestion = { product_id: number; name: string; brand?: string | null }
+
 type CartItem = { product: Product; quantity: number }
 
 export default function PosPage() {
@@ -32,6 +34,8 @@ export default function PosPage() {
   const [q, setQ] = useState('')
   const [barcode, setBarcode] = useState('')
   const [results, setResults] = useState<Product[]>([])
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([])
+  const [searched, setSearched] = useState('')
   const [cart, setCart] = useState<CartItem[]>([])
   const [paymentMethod, setPaymentMethod] = useState<'Cash' | 'Card' | 'QR Code'>('Cash')
   const [memberPhone, setMemberPhone] = useState<string>('')
@@ -67,22 +71,13 @@ export default function PosPage() {
       }
       
       try {
-        const members = await api.get(`/api/members?q=${encodeURIComponent(phone)}`, { 
+        const members = await api.get(`/api/members/lookup?q=${encodeURIComponent(phone)}`, { 
           headers: { Authorization: `Bearer ${token}` } 
         }) as any[]
         
-        if (members && members.length > 0) {
-          const member = members.find((m: any) => m.phone === phone)
-          if (member) {
-            // Use current_discount_rate which reflects the rolling-year tier
-            const rate = Number(member.current_discount_rate || member.discount_rate) || 0
-            setMemberDiscountRate(rate)
-          } else {
-            setMemberDiscountRate(0)
-          }
-        } else {
-          setMemberDiscountRate(0)
-        }
+        const member = members?.find((m: any) => m.phone === phone)
+        // discount_rate is what checkout applies for this member
+        setMemberDiscountRate(member ? Number(member.discount_rate) || 0 : 0)
       } catch (e) {
         console.error('Failed to fetch member:', e)
         setMemberDiscountRate(0)
@@ -93,31 +88,49 @@ export default function PosPage() {
     return () => clearTimeout(timer)
   }, [memberPhone, token])
 
+  // Keystrokes only hit the in-memory suggest index; the full search runs on submit.
   useEffect(() => {
     let cancelled = false
     const run = async () => {
-      if (!q.trim()) { setResults([]); return }
+      if (!q.trim()) { setSuggestions([]); return }
       try {
-        const data = await api.get(`/api/products?q=${encodeURIComponent(q.trim())}`)
-        if (!cancelled) setResults(data as Product[])
+        const data = await api.get(`/api/products/suggest?q=${encodeURIComponent(q.trim())}&limit=8`)
+        if (!cancelled) setSuggestions(data as Suggestion[])
       } catch (e: any) {
-        if (!cancelled) setResults([])
+        if (!cancelled) setSuggestions([])
       }
     }
-    const t = setTimeout(run, 250)
+    const t = setTimeout(run, 150)
     return () => { cancelled = true; clearTimeout(t) }
   }, [q])
 
+  async function search(term: string = q) {
+    const text = term.trim()
+    setSearched(text)
+    setSuggestions([])
+    if (!text) { setResults([]); return }
+    try {
+      const data = await api.get(`/api/products?q=${encodeURIComponent(text)}`)
+      setResults(data as Product[])
+    } catch (e: any) {
+      setResults([])
+    }
+  }
+
+  function pickSuggestion(s: Suggestion) {
+    setQ(s.name)
+    search(s.name)
+  }
+
   async function addBarcode() {
     setErr(null)
     setOkMsg(null)
     const code = barcode.trim()
     if (!code) return
     try {
-      const data = await api.get(`/api/products?barcode=${encodeURIComponent(code)}`)
-      const list = (data as Product[])
-      if (list.length === 0) throw new Error('Product not found')
-      addToCart(list[0])
+      const data = await api.post('/api/products/scan', { barcodes: [code] }) as { items: Product[] }
+      if (data.items.length === 0) throw new Error('Product not found')
+      addToCart(data.items[0])
       setBarcode('')
     } catch (e: any) {
       setErr(e?.message || 'Product lookup failed')
@@ -237,6 +250,7 @@ export default function PosPage() {
 
       setCart([])
       setQ('')
+      setSearched('')
       setResults([])
       setMemberPhone('')
       fetchPromotions()
@@ -276,13 +290,39 @@ export default function PosPage() {
         {/* Search Box */}
         <div className="bg-white border rounded-lg p-4 shadow-sm">
           <label className="text-sm font-semibold text-gray-700 block mb-2">🔍 Search Products</label>
-          <input 
-            className="w-full border-2 border-gray-300 rounded-lg px-4 py-2.5 focus:border-blue-500 focus:outline-none" 
-            type="text" 
-            value={q} 
-            onChange={(e) => setQ(e.target.value)} 
-            placeholder="Name, brand, category..." 
-          />
+          <div className="relative">
+            <div className="flex gap-2">
+              <input 
+                className="flex-1 border-2 border-gray-300 rounded-lg px-4 py-2.5 focus:border-blue-500 focus:outline-none" 
+                type="text" 
+                value={q} 
+                onChange={(e) => setQ(e.target.value)} 
+                onKeyDown={(e) => { if (e.key === 'Enter') search() }} 
+                placeholder="Name, brand, category..." 
+              />
+              <button 
+                className="px-4 py-2.5 rounded-lg bg-blue-600 text-white font-medium hover:bg-blue-700 transition-colors" 
+                onClick={() => search()}
+              >
+                Search
+              </button>
+            </div>
+            {suggestions.length > 0 && q.trim() !== searched && (
+              <ul className="absolute z-10 left-0 right-0 mt-1 bg-white border rounded-lg shadow-lg max-h-64 overflow-y-auto">
+                {suggestions.map((s) => (
+                  <li key={s.product_id}>
+                    <button 
+                      className="w-full text-left px-4 py-2 hover:bg-blue-50" 
+                      onClick={() => pickSuggestion(s)}
+                    >
+                      <span className="text-gray-900">{s.name}</span>
+                      {s.brand && <span className="text-xs text-gray-500 ml-2">{s.brand}</span>}
+                    </button>
+                  </li>
+                ))}
+              </ul>
+            )}
+          </div>
         </div>
 
         {/* Barcode Scanner */}
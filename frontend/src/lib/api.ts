@@ -1,6 +1,6 @@
 import { API_BASE_URL } from '../config/env'
 
-async function request(path: string, options?: RequestInit) {
+async function send(path: string, options?: RequestInit): Promise<Response> {
   let res: Response
   try {
     res = await fetch(`${API_BASE_URL}${path}`, {
@@ -26,11 +26,22 @@ async function request(path: string, options?: RequestInit) {
     }
     throw new Error(await res.text())
   }
-  return res.json()
+  return res
+}
+
+async function request(path: string, options?: RequestInit) {
+  return (await send(path, options)).json()
+}
+
+// Keyset-paged lists return the cursor for the next page in X-Next-Cursor.
+async function requestPage(path: string, options?: RequestInit) {
+  const res = await send(path, options)
+  return { data: await res.json(), next: res.headers.get('X-Next-Cursor') }
 }
 
 export const api = {
   get: (path: string, options?: RequestInit) => request(path, options),
+  getPage: (path: string, options?: RequestInit) => requestPage(path, options),
   post: (path: string, body: unknown, options?: RequestInit) => request(path, { method: 'POST', body: JSON.stringify(body), ...(options || {}) }),
   patch: (path: string, body: unknown, options?: RequestInit) => request(path, { method: 'PATCH', body: JSON.stringify(body), ...(options || {}) }),
   delete: (path: string, options?: RequestInit) => request(path, { method: 'DELETE', ...(options || {}) }),